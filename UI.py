@@ -1,8 +1,45 @@
 import sys
 from PyQt5 import QtWidgets, QtCore, QtGui
-from main import Analisis_Gromacs
 import os
 import shutil
+import threading
+import time
+
+from result_cache import link_or_copy
+import session
+import settings
+
+
+# NOTE: `main` (matplotlib, numpy, the Qt5Agg backend) is deliberately not
+# imported here. The folder picker only needs Qt, so the plotting stack is
+# loaded on first use or pre-warmed in the background after the window shows.
+def load_analysis_widget():
+    """Import and return the Analisis_Gromacs class (blocks if a pre-warm is running)"""
+    from main import Analisis_Gromacs
+    return Analisis_Gromacs
+
+
+def prewarm_analysis_modules():
+    """Import the plotting stack in a daemon thread so the first analysis window opens quickly"""
+    def _import():
+        try:
+            load_analysis_widget()
+        except Exception as e:
+            print(f"Error pre-warming analysis modules: {e}")
+
+    thread = threading.Thread(target=_import, name="prewarm-main", daemon=True)
+    thread.start()
+    return thread
+
+
+class AnalysisWindow(QtWidgets.QMainWindow):
+    """Top-level window of an analysis widget; reports when it is being closed"""
+    closing = QtCore.pyqtSignal()
+
+    def closeEvent(self, event):
+        self.closing.emit()
+        super().closeEvent(event)
+
 
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
@@ -10,6 +47,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("GROMACS Analysis Tool | Copyright (c) Titan Digitalsoft 2025")
         self.setMinimumSize(900, 700)
         self.folders = []  # List to store selected folders
+        self.project_path = None  # Project file the session is saved to
+        self.analysis_widget = None
         
         # Set window icon if available
         icon_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "icon.png")
@@ -67,8 +106,19 @@ class MainWindow(QtWidgets.QMainWindow):
         remove_button.clicked.connect(self.remove_selected_folders)
         clear_button = QtWidgets.QPushButton("Clear All")
         clear_button.clicked.connect(self.clear_folders)
+        analyse_all_button = QtWidgets.QPushButton("Run gmx on All Folders")
+        analyse_all_button.setToolTip("Run the GROMACS analysis for every folder (locally or as batch jobs)")
+        analyse_all_button.clicked.connect(self.analyse_all_folders)
+        open_project_button = QtWidgets.QPushButton("Open Project...")
+        open_project_button.clicked.connect(self.open_project)
+        save_project_button = QtWidgets.QPushButton("Save Project...")
+        save_project_button.setToolTip("Save folders, styles, sample selection and the current view")
+        save_project_button.clicked.connect(self.save_project_as)
         list_buttons_layout.addWidget(remove_button)
         list_buttons_layout.addWidget(clear_button)
+        list_buttons_layout.addWidget(analyse_all_button)
+        list_buttons_layout.addWidget(open_project_button)
+        list_buttons_layout.addWidget(save_project_button)
         main_layout.addLayout(list_buttons_layout)
         
         # Start analysis button
@@ -78,7 +128,7 @@ class MainWindow(QtWidgets.QMainWindow):
         button_font.setPointSize(12)
         button_font.setBold(True)
         start_button.setFont(button_font)
-        start_button.clicked.connect(self.start_analysis)
+        start_button.clicked.connect(lambda: self.start_analysis())
         main_layout.addWidget(start_button)
         
         # Status label
@@ -113,7 +163,8 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Error", "Please select a folder first")
             return
             
-        if not os.path.exists(folder):
+        # With the batch executor a folder may live on a compute node's scratch disk
+        if not os.path.exists(folder) and settings.get("executor") != "batch":
             QtWidgets.QMessageBox.warning(self, "Error", "Selected folder does not exist")
             return
             
@@ -123,17 +174,74 @@ class MainWindow(QtWidgets.QMainWindow):
                 QtWidgets.QMessageBox.warning(self, "Error", "This folder is already in the list")
                 return
                 
-        # Add folder to list
-        item = QtWidgets.QListWidgetItem(os.path.basename(folder))
-        item.setData(QtCore.Qt.UserRole, folder)  # Store full path as user data
-        self.folder_list.addItem(item)
-        self.folders.append(folder)
+        self.add_folder_item(folder)
         self.folder_edit.clear()
         
         # Update status
         self.status_label.setText(f"Added folder: {os.path.basename(folder)}")
         self.status_label.setStyleSheet("color: green")
     
+    def add_folder_item(self, folder):
+        item = QtWidgets.QListWidgetItem(os.path.basename(folder))
+        item.setData(QtCore.Qt.UserRole, folder)  # Store full path as user data
+        self.folder_list.addItem(item)
+        self.folders.append(folder)
+
+    def open_project(self):
+        path = QtWidgets.QFileDialog.getOpenFileName(self, "Open Project", "", session.PROJECT_FILTER)[0]
+        if not path:
+            return
+        try:
+            project = session.load_project(path)
+        except (OSError, ValueError) as e:
+            QtWidgets.QMessageBox.warning(self, "Error", f"Cannot open project: {e}")
+            return
+
+        self.project_path = path
+        self.folder_list.clear()
+        self.folders = []
+        for folder in project.get("folders", []):
+            self.add_folder_item(folder)
+
+        changed = session.changed_sources(project)
+        if changed:
+            self.status_label.setText(f"Opened {os.path.basename(path)}: {len(changed)} data file(s) changed since it was saved")
+            self.status_label.setStyleSheet("color: orange")
+        else:
+            self.status_label.setText(f"Opened {os.path.basename(path)}")
+            self.status_label.setStyleSheet("color: green")
+        if self.folders:
+            # The saved figure is only shown while it still matches the data
+            self.start_analysis(project.get("state"), None if changed else session.figure_png(project))
+
+    def save_project_as(self):
+        path = QtWidgets.QFileDialog.getSaveFileName(self, "Save Project", self.project_path or "",
+                                                     session.PROJECT_FILTER)[0]
+        if not path:
+            return
+        if not path.endswith(".gaproj"):
+            path += ".gaproj"
+        self.project_path = path
+        self.save_session()
+        self.status_label.setText(f"Project saved to {os.path.basename(path)}")
+        self.status_label.setStyleSheet("color: green")
+
+    def save_session(self):
+        """Write the folders and the open analysis window (if any) to the project file"""
+        if not self.project_path:
+            return
+        state = figure = None
+        try:
+            if self.analysis_widget is not None:
+                state = self.analysis_widget.session_state()
+                figure = self.analysis_widget.render_png()
+        except RuntimeError:
+            pass  # The window was already destroyed
+        try:
+            session.save_project(self.project_path, self.folders, state, figure)
+        except OSError as e:
+            print(f"Error saving project {self.project_path}: {e}")
+
     def remove_selected_folders(self):
         selected_items = self.folder_list.selectedItems()
         if not selected_items:
@@ -161,6 +269,76 @@ class MainWindow(QtWidgets.QMainWindow):
             self.folders = []
             self.status_label.setText("All folders cleared")
     
+    def analyse_all_folders(self):
+        """Run the gmx pipeline for every folder through the configured executor
+
+        Folders that are not reachable from this machine (batch jobs on other
+        nodes) are replaced in the list by their collected .xvg results.
+        """
+        if not self.folders:
+            QtWidgets.QMessageBox.warning(self, "Error", "Please add at least one folder for analysis")
+            return
+
+        from executors import collect, make_executor
+        code_dir = os.path.dirname(os.path.realpath(__file__))
+        path_gmx = f'{code_dir}/gromacs/bin/gmx'
+        executor = make_executor(path_gmx)
+        futures = {}
+        for folder in self.folders:
+            try:
+                futures[executor.submit(folder)] = folder
+            except Exception as e:
+                print(f"Error submitting {folder}: {e}")
+
+        progress = QtWidgets.QProgressDialog("Running GROMACS analysis...", "Cancel", 0, len(futures), self)
+        progress.setWindowTitle("Analysing Folders")
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.show()
+        while not all(future.done() for future in futures):
+            if progress.wasCanceled():
+                # Queued local folders are dropped; submitted batch jobs keep running
+                for future in futures:
+                    future.cancel()
+                break
+            progress.setValue(sum(future.done() for future in futures))
+            QtWidgets.QApplication.processEvents()
+            time.sleep(0.05)
+        progress.close()
+        executor.shutdown(wait=False)
+
+        failed = []
+        for future, folder in futures.items():
+            if not future.done() or future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error analysing {folder}: {e}")
+                failed.append(folder)
+                continue
+            if not result["ok"]:
+                failed.append(folder)
+            if not os.path.exists(folder) and result["results"]:
+                local = collect(result, os.path.join(code_dir, "collected"))
+                self.replace_folder(folder, local)
+
+        if failed:
+            self.status_label.setText(f"Analysis failed for {len(failed)} folder(s): "
+                                      + ", ".join(os.path.basename(f) for f in failed))
+            self.status_label.setStyleSheet("color: red")
+        else:
+            self.status_label.setText(f"Analysis finished for {len(futures)} folder(s)")
+            self.status_label.setStyleSheet("color: green")
+
+    def replace_folder(self, old, new):
+        """Point a list entry at another path (e.g. collected batch results)"""
+        self.folders[self.folders.index(old)] = new
+        for i in range(self.folder_list.count()):
+            item = self.folder_list.item(i)
+            if item.data(QtCore.Qt.UserRole) == old:
+                item.setData(QtCore.Qt.UserRole, new)
+                item.setToolTip(new)
+    
     def prepare_comparison_folder(self):
         """Create a temporary folder with organized data for comparison"""
         # Create a temporary comparison folder
@@ -183,6 +361,7 @@ class MainWindow(QtWidgets.QMainWindow):
             os.makedirs(os.path.join(temp_dir, "rmsd_pro_lig"))
             os.makedirs(os.path.join(temp_dir, "rmsf_atom"))
             os.makedirs(os.path.join(temp_dir, "rmsf_rec"))
+            os.makedirs(os.path.join(temp_dir, "structure"))
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "Error", f"Failed to create temporary directory: {e}")
             return None
@@ -216,51 +395,97 @@ class MainWindow(QtWidgets.QMainWindow):
                 if os.path.exists(src_path):
                     dst_path = os.path.join(temp_dir, data_type, f"{folder_name}.xvg")
                     try:
-                        shutil.copy2(src_path, dst_path)
+                        # Link instead of copying so re-preparing a comparison is instant
+                        link_or_copy(src_path, dst_path, allow_symlink=True)
                     except Exception as e:
-                        print(f"Error copying {src_path}: {e}")
+                        print(f"Error linking {src_path}: {e}")
+
+            # Structure for grouping the per-atom RMSF of this sample
+            src_path = os.path.join(folder, "structure", "structure.pdb")
+            if os.path.exists(src_path):
+                try:
+                    link_or_copy(src_path, os.path.join(temp_dir, "structure", f"{folder_name}.pdb"), allow_symlink=True)
+                except Exception as e:
+                    print(f"Error linking {src_path}: {e}")
         
         progress.setValue(len(self.folders))
         return temp_dir
     
-    def start_analysis(self):
+    def show_preview(self, figure_png):
+        """Open the analysis window showing a saved figure until the live view is ready"""
+        window = AnalysisWindow()
+        label = QtWidgets.QLabel()
+        pixmap = QtGui.QPixmap()
+        pixmap.loadFromData(figure_png, "PNG")
+        label.setPixmap(pixmap)
+        label.setAlignment(QtCore.Qt.AlignCenter)
+        window.setCentralWidget(label)
+        window.setWindowTitle("GROMACS Analysis - loading...")
+        window.resize(900, 700)
+        window.show()
+        QtWidgets.QApplication.processEvents()
+        return window
+
+    def open_analysis_window(self, Analisis_Gromacs, folder, title, state=None, preview=None):
+        self.analysis_widget = Analisis_Gromacs(folder, session=state)
+        analysis_window = preview or AnalysisWindow()
+        analysis_window.setWindowTitle(title)
+        widget = self.analysis_widget
+        if preview is not None and widget.is_loading():
+            # Keep the saved figure up until every sample has been loaded
+            def show_live_view():
+                if analysis_window.centralWidget() is not widget:
+                    analysis_window.setCentralWidget(widget)
+            widget.view_ready.connect(show_live_view)
+        else:
+            analysis_window.setCentralWidget(widget)
+        analysis_window.closing.connect(self.save_session)
+        analysis_window.resize(900, 700)
+        analysis_window.show()
+        
+        # Keep a reference to prevent garbage collection
+        self.analysis_window = analysis_window
+
+    def start_analysis(self, state=None, figure_png=None):
         if len(self.folders) == 0:
             QtWidgets.QMessageBox.warning(self, "Error", "Please add at least one folder for analysis")
             return
         
+        # A reopened project shows its saved figure before anything is loaded
+        preview = self.show_preview(figure_png) if figure_png else None
+        
+        # Load the plotting stack now (instant if the background pre-warm finished)
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        try:
+            Analisis_Gromacs = load_analysis_widget()
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        
         # If only one folder, use it directly
         if len(self.folders) == 1:
             folder = self.folders[0]
             if not os.path.exists(os.path.join(folder, "step5_1.tpr")) or not os.path.exists(os.path.join(folder, "step5_1.xtc")):
                 QtWidgets.QMessageBox.warning(self, "Error", f"Folder '{os.path.basename(folder)}' does not contain required GROMACS files")
+                if preview is not None:
+                    preview.close()
                 return
                 
             # Create and show the analysis window for single folder
-            self.analysis_widget = Analisis_Gromacs(folder)
-            analysis_window = QtWidgets.QMainWindow()
-            analysis_window.setWindowTitle(f"GROMACS Analysis - {os.path.basename(folder)} | Copyright (c) Titan Digitalsoft 2025")
-            analysis_window.setCentralWidget(self.analysis_widget)
-            analysis_window.resize(900, 700)
-            analysis_window.show()
-            
-            # Keep a reference to prevent garbage collection
-            self.analysis_window = analysis_window
+            self.open_analysis_window(Analisis_Gromacs, folder,
+                                      f"GROMACS Analysis - {os.path.basename(folder)} | Copyright (c) Titan Digitalsoft 2025",
+                                      state, preview)
         else:
             # For multiple folders, prepare a comparison folder
             comparison_folder = self.prepare_comparison_folder()
             if not comparison_folder:
+                if preview is not None:
+                    preview.close()
                 return
                 
             # Create and show the analysis window for comparison
-            self.analysis_widget = Analisis_Gromacs(comparison_folder)
-            analysis_window = QtWidgets.QMainWindow()
-            analysis_window.setWindowTitle(f"GROMACS Comparison Analysis - {len(self.folders)} folders")
-            analysis_window.setCentralWidget(self.analysis_widget)
-            analysis_window.resize(900, 700)
-            analysis_window.show()
-            
-            # Keep a reference to prevent garbage collection
-            self.analysis_window = analysis_window
+            self.open_analysis_window(Analisis_Gromacs, comparison_folder,
+                                      f"GROMACS Comparison Analysis - {len(self.folders)} folders",
+                                      state, preview)
 
 if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
@@ -289,4 +514,7 @@ if __name__ == "__main__":
     
     window = MainWindow()
     window.show()
+    
+    # Warm up matplotlib/numpy once the event loop is running
+    QtCore.QTimer.singleShot(0, prewarm_analysis_modules)
     sys.exit(app.exec_())
@@ -0,0 +1,172 @@
+"""Performance benchmarks for Gromacs-Analysis.
+
+Run from the repository root:
+
+    python benchmark.py startup
+    python benchmark.py loading [--dir /network/share/tmp] [--latency 0.02]
+
+Each benchmark prints its timings and exits with a non-zero status when a
+regression budget is exceeded, so it can be used as a simple CI gate.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.realpath(__file__))
+
+# Modules that must NOT be loaded before the first analysis window opens
+HEAVY_MODULES = ["matplotlib", "numpy", "pandas", "cycler", "main"]
+
+# Measured in a fresh interpreter so nothing is already cached in sys.modules
+STARTUP_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from PyQt5 import QtWidgets
+import UI
+t_import = time.perf_counter() - t0
+app = QtWidgets.QApplication(sys.argv[:1])
+window = UI.MainWindow()
+window.show()
+app.processEvents()
+t_window = time.perf_counter() - t0
+print(json.dumps({
+    "import": t_import,
+    "window": t_window,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def run_startup(repeat):
+    """Time `import UI` + showing MainWindow in fresh interpreters"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    script = STARTUP_SCRIPT % (HEAVY_MODULES,)
+
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def bench_startup(args):
+    results = run_startup(args.repeat)
+    best_window = min(r["window"] for r in results)
+    best_import = min(r["import"] for r in results)
+    loaded = sorted(set(m for r in results for m in r["loaded"]))
+
+    print(f"startup: import UI {best_import * 1000:.1f} ms, "
+          f"window shown {best_window * 1000:.1f} ms (best of {args.repeat})")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if best_window > args.max_startup:
+        print(f"FAIL: startup {best_window:.3f} s exceeds budget {args.max_startup:.3f} s")
+        failed = True
+    return 1 if failed else 0
+
+
+def write_samples(folder, files, rows):
+    """Synthetic RMSD .xvg files shaped like gmx output"""
+    import numpy as np
+
+    header = '# rmsd.xvg\n@    title "RMSD"\n@    xaxis  label "Time (ns)"\n@    yaxis  label "RMSD (nm)"\n'
+    x = np.arange(rows) * 0.01
+    paths = []
+    for i in range(files):
+        path = os.path.join(folder, f"sample{i:03d}.xvg")
+        with open(path, "w") as f:
+            f.write(header)
+            np.savetxt(f, np.column_stack((x, np.random.rand(rows))), fmt="%12.7f")
+        paths.append(path)
+    return paths
+
+
+def time_loading(paths, concurrent, workers):
+    import xvg
+
+    xvg.clear_cache()
+    t0 = time.perf_counter()
+    if concurrent:
+        for _ in xvg.load_concurrently(paths, workers):
+            pass
+    else:
+        for path in paths:
+            xvg.load_xvg(path)
+    return time.perf_counter() - t0
+
+
+def bench_loading(args):
+    import settings
+    import xvg
+
+    if args.latency:
+        # Every open waits like a round trip to a network filesystem
+        def slow_open(*a, **kw):
+            time.sleep(args.latency)
+            return open(*a, **kw)
+        xvg.open = slow_open
+
+    folder = tempfile.mkdtemp(prefix="xvg-bench-", dir=args.dir)
+    os.environ["GROMACS_ANALYSIS_PARSED_CACHE_DIR"] = os.path.join(folder, "parsed_cache")
+    try:
+        paths = write_samples(folder, args.files, args.rows)
+        os.environ["GROMACS_ANALYSIS_PARSED_CACHE"] = "0"
+        settings.reload()
+        serial = min(time_loading(paths, False, args.workers) for _ in range(args.repeat))
+        concurrent = min(time_loading(paths, True, args.workers) for _ in range(args.repeat))
+        # Reopening: the parse cache is filled once, the in-memory cache is empty
+        os.environ["GROMACS_ANALYSIS_PARSED_CACHE"] = "1"
+        settings.reload()
+        time_loading(paths, True, args.workers)
+        reopen = min(time_loading(paths, True, args.workers) for _ in range(args.repeat))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print(f"loading: {args.files} files x {args.rows} rows, latency {args.latency * 1000:.0f} ms: "
+          f"serial {serial * 1000:.0f} ms, concurrent {concurrent * 1000:.0f} ms "
+          f"({serial / concurrent:.1f}x), reopen from parse cache {reopen * 1000:.0f} ms "
+          f"(best of {args.repeat})")
+    if args.max_load and concurrent > args.max_load:
+        print(f"FAIL: concurrent loading {concurrent:.3f} s exceeds budget {args.max_load:.3f} s")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gromacs-Analysis benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    startup = sub.add_parser("startup", help="cold start of the folder picker window")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--max-startup", type=float, default=1.5,
+                         help="budget in seconds for the main window to appear")
+    startup.set_defaults(func=bench_startup)
+
+    loading = sub.add_parser("loading", help="serial vs concurrent loading of many sample files")
+    loading.add_argument("--files", type=int, default=100)
+    loading.add_argument("--rows", type=int, default=20000)
+    loading.add_argument("--dir", default=None, help="where to write the files (e.g. a network share)")
+    loading.add_argument("--latency", type=float, default=0.0,
+                         help="simulated seconds of latency per file open")
+    loading.add_argument("--workers", type=int, default=None)
+    loading.add_argument("--repeat", type=int, default=3)
+    loading.add_argument("--max-load", type=float, default=0.0,
+                         help="budget in seconds for concurrent loading (0 = no budget)")
+    loading.set_defaults(func=bench_loading)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Distributions of sample values: histograms and binned-FFT KDE.
+
+Values are taken from the cached xvg arrays, optionally after an
+equilibration cutoff (in ns; files in ps are converted, series that are not
+time series are never cut). All samples of one analysis type share one bin
+range, computed over every sample and not only the visible ones, so
+toggling samples or changing styles reuses the cached results.
+
+Histograms are a single np.bincount over precomputed bin indices. The KDE
+bins the data onto a fine grid the same way and convolves it with a
+Gaussian kernel by FFT (bandwidth from Silverman's rule, estimated from the
+binned counts), so its cost is one pass over the data plus an FFT of the
+grid, independent of the number of points.
+"""
+
+import numpy as np
+
+from xvg import LruCache, fingerprint, load_xvg, time_scale
+
+HISTOGRAM = "histogram"
+KDE = "kde"
+
+DEFAULT_BINS = 100
+KDE_GRID = 1024
+# The KDE grid extends this fraction of the range past both ends
+KDE_PADDING = 0.1
+
+MAX_CACHED = 256
+_cache = LruCache(MAX_CACHED)
+
+
+def sample_values(path, cutoff=None):
+    """y values of a sample from the equilibration cutoff (ns) on"""
+    data = load_xvg(path)
+    scale = time_scale(data)
+    if not cutoff or scale is None:
+        return data.y
+    return data.y[np.searchsorted(data.x, cutoff * scale):]
+
+
+def value_range(paths, cutoff=None):
+    """(low, high) over all given samples, or None if they hold no values"""
+    def sample_range(path):
+        values = sample_values(path, cutoff)
+        return (values.min(), values.max()) if len(values) else None
+
+    ranges = [_cache.get((fingerprint(path), "range", cutoff), lambda path=path: sample_range(path))
+              for path in paths]
+    ranges = [r for r in ranges if r is not None]
+    if not ranges:
+        return None
+    low = min(r[0] for r in ranges)
+    high = max(r[1] for r in ranges)
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+def bin_counts(values, bins, low, high):
+    """Counts of `values` in `bins` equal bins over [low, high]"""
+    idx = ((values - low) * (bins / (high - low))).astype(np.intp)
+    idx = idx[(idx >= 0) & (idx <= bins)]
+    counts = np.bincount(idx, minlength=bins + 1)
+    # Values equal to `high` belong to the last bin
+    counts[bins - 1] += counts[bins]
+    return counts[:bins]
+
+
+def histogram(values, bins, low, high):
+    """(edges, density) of the values"""
+    edges = np.linspace(low, high, bins + 1)
+    counts = bin_counts(values, bins, low, high)
+    total = counts.sum()
+    density = counts / (total * (edges[1] - edges[0])) if total else counts.astype(float)
+    return edges, density
+
+
+def silverman_bandwidth(centres, counts):
+    """Silverman's rule of thumb from binned data"""
+    n = counts.sum()
+    mean = np.dot(centres, counts) / n
+    std = np.sqrt(np.dot((centres - mean) ** 2, counts) / n)
+    cumulative = np.cumsum(counts) / n
+    q25, q75 = np.interp([0.25, 0.75], cumulative, centres)
+    spread = min(std, (q75 - q25) / 1.34) or std
+    return 0.9 * spread * n ** -0.2
+
+
+def kde(values, low, high, grid_size=KDE_GRID, bandwidth=None):
+    """(grid, density) of a Gaussian KDE computed on a binned grid by FFT"""
+    pad = (high - low) * KDE_PADDING
+    low, high = low - pad, high + pad
+    counts = bin_counts(values, grid_size, low, high).astype(float)
+    step = (high - low) / grid_size
+    grid = low + (np.arange(grid_size) + 0.5) * step
+    n = counts.sum()
+    if not n:
+        return grid, np.zeros(grid_size)
+    h = bandwidth or silverman_bandwidth(grid, counts)
+    if not h > 0:
+        h = step
+
+    # Kernel over every possible grid offset; zero-padded FFT gives the
+    # linear (not circular) convolution
+    offsets = np.arange(-grid_size, grid_size + 1) * step
+    kernel = np.exp(-0.5 * (offsets / h) ** 2) / (h * np.sqrt(2 * np.pi))
+    size = 1 << int(np.ceil(np.log2(3 * grid_size + 1)))
+    smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+    return grid, np.maximum(smoothed[grid_size:2 * grid_size], 0.0) / n
+
+
+def distribution(path, kind, bins, bin_range, cutoff=None):
+    """Cached (x, density) of one sample: histogram edges, or the KDE grid"""
+    key = (fingerprint(path), kind, bins, bin_range, cutoff)
+
+    def compute():
+        values = sample_values(path, cutoff)
+        if kind == KDE:
+            return kde(values, *bin_range)
+        return histogram(values, bins, *bin_range)
+
+    return _cache.get(key, compute)
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,140 @@
+"""Replica ensembles: group samples, align them on a common grid, summarise.
+
+Samples are grouped by a regular expression on their names (the first
+capture group is the group name, e.g. `^(.*?)[_-]?rep\\d+$`). Every group is
+interpolated onto one common grid in a single vectorized operation and
+reduced to a centre line and a band (mean ± std, or a percentile range)
+that is drawn with one fill_between per group. Aligned matrices are cached
+per analysis type, group and input files, so switching between analysis
+types or band modes does not realign.
+"""
+import re
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from xvg import LruCache, fingerprint, load_xvg
+
+DEFAULT_PATTERN = r"^(.*?)[_\-]?(?:rep|run|r)?\d+$"
+MAX_GRID_POINTS = 4000
+
+MEAN_STD = "mean_std"
+PERCENTILE = "percentile"
+
+MAX_CACHED_GROUPS = 64
+_aligned_cache = LruCache(MAX_CACHED_GROUPS)
+
+
+def group_samples(names, pattern=DEFAULT_PATTERN):
+    """{group name: [sample names]} in first-seen order
+
+    Names that do not match the pattern form a group of their own.
+    """
+    try:
+        regex = re.compile(pattern)
+    except re.error:
+        regex = None
+    groups = OrderedDict()
+    for name in names:
+        match = regex.match(name) if regex else None
+        if match:
+            key = match.group(1) if match.groups() and match.group(1) else match.group(0)
+        else:
+            key = name
+        groups.setdefault(key, []).append(name)
+    return groups
+
+
+def common_grid(xs_list, max_points=MAX_GRID_POINTS):
+    """Grid spanning all series, spaced like the finest one (capped at max_points)"""
+    start = min(x[0] for x in xs_list)
+    stop = max(x[-1] for x in xs_list)
+    steps = [np.median(np.diff(x)) for x in xs_list if len(x) > 1]
+    step = min(s for s in steps if s > 0) if any(s > 0 for s in steps) else 1.0
+    n_points = int(min(max_points, max(2, round((stop - start) / step) + 1)))
+    return np.linspace(start, stop, n_points)
+
+
+def interp_rows(grid, xs_list, ys_list):
+    """Linearly interpolate many series onto one grid in one vectorized pass
+
+    Returns an (n_series, len(grid)) matrix with NaN outside each series'
+    own x range.
+    """
+    n = len(xs_list)
+    lengths = np.array([len(x) for x in xs_list])
+    width = lengths.max()
+
+    # Pad every row with its last value so rows stay non-decreasing
+    X = np.empty((n, width))
+    Y = np.empty((n, width))
+    for row, (x, y) in enumerate(zip(xs_list, ys_list)):
+        X[row, :len(x)] = x
+        X[row, len(x):] = x[-1]
+        Y[row, :len(y)] = y
+        Y[row, len(y):] = y[-1]
+
+    # Shift each row into its own disjoint range so one searchsorted over the
+    # flattened matrix locates the grid points of every row at once
+    span = (max(X.max(), grid[-1]) - min(X.min(), grid[0])) + 1.0
+    base = min(X.min(), grid[0])
+    offsets = (np.arange(n) * span)[:, None]
+    flat = ((X - base) + offsets).ravel()
+    queries = ((grid[None, :] - base) + offsets)
+
+    idx = np.searchsorted(flat, queries.ravel(), side="right").reshape(n, -1) - 1
+    row_start = (np.arange(n) * width)[:, None]
+    row_last = row_start + np.maximum(lengths[:, None] - 2, 0)
+    idx = np.clip(idx, row_start, row_last)
+
+    x0 = X.ravel()[idx]
+    x1 = X.ravel()[np.minimum(idx + 1, row_start + lengths[:, None] - 1)]
+    y0 = Y.ravel()[idx]
+    y1 = Y.ravel()[np.minimum(idx + 1, row_start + lengths[:, None] - 1)]
+    dx = x1 - x0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(dx > 0, (grid[None, :] - x0) / dx, 0.0)
+    result = y0 + t * (y1 - y0)
+
+    first = np.array([x[0] for x in xs_list])[:, None]
+    last = np.array([x[-1] for x in xs_list])[:, None]
+    result[(grid[None, :] < first) | (grid[None, :] > last)] = np.nan
+    return result
+
+
+def series_for_alignment(data):
+    """x/y of one sample; series whose x is not increasing (per-chain RMSF) use the row index"""
+    x, y = data.x, data.y
+    if len(x) > 1 and np.any(np.diff(x) <= 0):
+        x = np.arange(len(y), dtype=float)
+    return x, y
+
+
+def aligned_group(paths, max_points=MAX_GRID_POINTS):
+    """(grid, matrix) for the given sample files, cached by their fingerprints"""
+    key = (tuple(fingerprint(path) for path in paths), max_points)
+
+    def compute():
+        series = [series_for_alignment(load_xvg(path)) for path in paths]
+        series = [(x, y) for x, y in series if len(x)]
+        if not series:
+            return np.empty(0), np.empty((0, 0))
+        xs_list, ys_list = zip(*series)
+        grid = common_grid(xs_list, max_points)
+        return grid, interp_rows(grid, xs_list, ys_list)
+
+    return _aligned_cache.get(key, compute)
+
+
+def band(matrix, mode=MEAN_STD, percentiles=(10, 90)):
+    """(centre, low, high) across the rows of an aligned matrix"""
+    with warnings.catch_warnings():
+        # Grid points no replica covers are all-NaN columns
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if mode == PERCENTILE:
+            low, centre, high = np.nanpercentile(matrix, [percentiles[0], 50, percentiles[1]], axis=0)
+            return centre, low, high
+        centre = np.nanmean(matrix, axis=0)
+        spread = np.nanstd(matrix, axis=0)
+        return centre, centre - spread, centre + spread
@@ -0,0 +1,245 @@
+"""Executors that fan the analysis pipeline out over many folders.
+
+Both backends take folders and return concurrent.futures.Future objects
+that resolve to a result dict ({"folder", "ok", "pending", "results"}):
+
+* LocalExecutor runs pipelines on this machine. gmx processes from all
+  folders draw from the same ThreadAllocator, so the machine's cores are
+  shared instead of oversubscribed.
+* BatchExecutor writes one job script per folder into a job directory on
+  shared storage, submits it with a batch command (sbatch, qsub, ...) and
+  polls the job directory for the result file. The job copies its .xvg
+  and structure outputs into the job directory so they can be collected for plotting
+  even when the folder itself lives on a compute node's scratch disk.
+  A job that exited without a result (crash) or did not finish within
+  `batch_timeout_hours` (killed, walltime) fails its future.
+
+`simulated_submit_command()` is a local stand-in for a batch queue: it
+"submits" a job by running its script in the background on this machine.
+
+The module is also the job entry point:
+
+    python executors.py run-folder <folder> --gmx <gmx> --job-dir <dir>
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import settings
+from pipeline import AnalysisPipeline, write_atomic
+
+CODE_DIR = os.path.dirname(os.path.realpath(__file__))
+RESULT_NAME = "result.json"
+# Exit code of the job runner, written by the job script when it ends
+EXIT_NAME = "exit_code"
+RESULTS_DIR = "results"
+# Step outputs copied back from a job: the .xvg data and the structure
+RESULT_EXTENSIONS = (".xvg", ".pdb")
+
+
+def run_folder(path_kerja, path_gmx, reduced=None, results_dir=None):
+    """Run the pipeline for one folder; optionally copy its results to `results_dir`"""
+    pipeline = AnalysisPipeline(path_kerja, path_gmx, reduced=reduced)
+    ok = pipeline.run()
+    results = {}
+    for step in pipeline.steps:
+        path = os.path.join(path_kerja, step.output)
+        if not step.output.endswith(RESULT_EXTENSIONS) or not os.path.exists(path):
+            continue
+        if results_dir is not None:
+            dst = os.path.join(results_dir, step.output)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(path, dst)
+            path = dst
+        results[step.output] = path
+    return {
+        "folder": path_kerja,
+        "ok": ok,
+        "pending": [step.name for step in pipeline.pending_steps()],
+        "results": results,
+    }
+
+
+def collect(result, dest_root):
+    """Copy a job's results into `dest_root/<folder name>/` (same layout as a folder)
+
+    Returns the local folder, which can be added to a comparison like any
+    analysed simulation folder.
+    """
+    local = os.path.join(dest_root, os.path.basename(os.path.normpath(result["folder"])))
+    for output, path in result["results"].items():
+        dst = os.path.join(local, output)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.abspath(path) != os.path.abspath(dst):
+            shutil.copy2(path, dst)
+    return local
+
+
+class LocalExecutor:
+    """Runs folders on this machine with a bounded number of pipelines at once"""
+
+    def __init__(self, path_gmx, max_workers=None, reduced=None):
+        self.path_gmx = path_gmx
+        self.reduced = reduced
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or settings.get("max_parallel_folders"))
+
+    def submit(self, path_kerja):
+        return self.pool.submit(run_folder, path_kerja, self.path_gmx, self.reduced)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+JOB_TEMPLATE = """#!/bin/sh
+# Gromacs-Analysis job for {folder}
+cd {code_dir}
+{python} executors.py run-folder {folder} --gmx {gmx}{reduced} --job-dir {job_dir}
+echo $? > {exit_path}
+"""
+
+
+class BatchExecutor:
+    """Submits one batch job per folder and polls the job directory for results"""
+
+    def __init__(self, path_gmx, job_dir=None, submit_command=None, poll_interval=None,
+                 reduced=None, python=None, timeout=None):
+        self.path_gmx = path_gmx
+        self.job_dir = job_dir or settings.get("batch_job_dir") or os.path.join(CODE_DIR, "jobs")
+        self.submit_command = submit_command or settings.get("batch_submit_command")
+        self.poll_interval = poll_interval or settings.get("batch_poll_seconds")
+        self.timeout = settings.get("batch_timeout_hours") * 3600.0 if timeout is None else timeout
+        self.reduced = reduced
+        self.python = python or sys.executable
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.poller = threading.Thread(target=self.poll, name="batch-poller", daemon=True)
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.poller.start()
+
+    def write_script(self, path_kerja, job_dir):
+        reduced = ""
+        if self.reduced is not None:
+            reduced = " --reduced" if self.reduced else " --full"
+        script = JOB_TEMPLATE.format(
+            folder=shlex.quote(path_kerja), code_dir=shlex.quote(CODE_DIR),
+            python=shlex.quote(self.python), gmx=shlex.quote(self.path_gmx),
+            reduced=reduced, job_dir=shlex.quote(job_dir),
+            exit_path=shlex.quote(os.path.join(job_dir, EXIT_NAME)))
+        path = os.path.join(job_dir, "job.sh")
+        write_atomic(path, script)
+        os.chmod(path, 0o755)
+        return path
+
+    def submit(self, path_kerja):
+        job_id = f"{os.path.basename(os.path.normpath(path_kerja))}-{uuid.uuid4().hex[:8]}"
+        job_dir = os.path.join(self.job_dir, job_id)
+        os.makedirs(job_dir)
+        script = self.write_script(path_kerja, job_dir)
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with open(os.path.join(job_dir, "submit.log"), "wb") as log:
+            submitted = subprocess.run(list(self.submit_command) + [script], cwd=job_dir,
+                                       stdout=log, stderr=subprocess.STDOUT)
+        if submitted.returncode != 0:
+            future.set_exception(RuntimeError(f"Submitting {script} failed (see {job_dir}/submit.log)"))
+            return future
+        with self.lock:
+            self.jobs[job_dir] = (future, time.time())
+        return future
+
+    def poll(self):
+        """Resolve futures whose job wrote its result file; fail jobs that ended without one"""
+        while not self.stopped.wait(self.poll_interval):
+            with self.lock:
+                jobs = list(self.jobs.items())
+            for job_dir, (future, submitted) in jobs:
+                # The exit code is written after the result, so check it first
+                exit_code = self.exit_code(job_dir)
+                result_path = os.path.join(job_dir, RESULT_NAME)
+                if os.path.exists(result_path):
+                    try:
+                        with open(result_path) as f:
+                            future.set_result(json.load(f))
+                    except (OSError, ValueError) as e:
+                        future.set_exception(e)
+                elif exit_code is not None:
+                    future.set_exception(RuntimeError(
+                        f"Job in {job_dir} exited with code {exit_code} without a result (see job logs)"))
+                elif self.timeout and time.time() - submitted > self.timeout:
+                    future.set_exception(TimeoutError(
+                        f"Job in {job_dir} wrote no result within {self.timeout / 3600:g} h"))
+                else:
+                    continue
+                with self.lock:
+                    del self.jobs[job_dir]
+
+    def exit_code(self, job_dir):
+        """Exit code the job script recorded, or None while it runs"""
+        try:
+            with open(os.path.join(job_dir, EXIT_NAME)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def shutdown(self, wait=True):
+        self.stopped.set()
+        if wait:
+            self.poller.join()
+
+
+def simulated_submit_command():
+    """Submit command for a local stand-in queue (runs each job script in the background)"""
+    return [sys.executable, os.path.join(CODE_DIR, "executors.py"), "queue-submit"]
+
+
+def make_executor(path_gmx, reduced=None):
+    """Executor selected by the `executor` setting ("local" or "batch")"""
+    if settings.get("executor") == "batch":
+        return BatchExecutor(path_gmx, reduced=reduced)
+    return LocalExecutor(path_gmx, reduced=reduced)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gromacs-Analysis job runner")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run-folder", help="run the analysis pipeline for one folder (batch job)")
+    run.add_argument("folder")
+    run.add_argument("--gmx", required=True)
+    run.add_argument("--job-dir", required=True)
+    mode = run.add_mutually_exclusive_group()
+    mode.add_argument("--reduced", dest="reduced", action="store_true", default=None)
+    mode.add_argument("--full", dest="reduced", action="store_false")
+
+    queue = sub.add_parser("queue-submit", help="simulated queue: start a job script in the background")
+    queue.add_argument("script")
+
+    args = parser.parse_args()
+    if args.command == "run-folder":
+        try:
+            result = run_folder(args.folder, args.gmx, args.reduced,
+                                os.path.join(args.job_dir, RESULTS_DIR))
+        except Exception as e:
+            result = {"folder": args.folder, "ok": False, "pending": [], "results": {}, "error": str(e)}
+        write_atomic(os.path.join(args.job_dir, RESULT_NAME), json.dumps(result, indent=2))
+        sys.exit(0 if result["ok"] else 1)
+    else:
+        job_dir = os.path.dirname(os.path.abspath(args.script))
+        with open(os.path.join(job_dir, "job.log"), "wb") as log:
+            process = subprocess.Popen(["sh", args.script], cwd=job_dir, stdout=log,
+                                       stderr=subprocess.STDOUT, start_new_session=True)
+        print(f"Submitted job {process.pid}")
+
+
+if __name__ == "__main__":
+    main()
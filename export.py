@@ -0,0 +1,237 @@
+"""Tabular export of every loaded sample across all analysis types.
+
+Reads the same parsed arrays as the plots (xvg.load_xvg) and writes them as
+
+* long CSV: one row per value, `analysis,sample,series,x,value`;
+* wide CSV: one file per analysis type, `x` (plus `segment` for per-chain
+  RMSF) followed by one column per sample and series;
+* Parquet (long layout, needs the optional `pyarrow` package).
+
+Series are the y columns of an .xvg file: `y` is the one that is plotted,
+further columns (the Rg axes, ...) are `y2`, `y3`, ... Output is produced in
+blocks of CHUNK_ROWS rows, each formatted by one C-level operation, so tens
+of millions of rows are written without holding the text (or a wide matrix)
+in memory.
+"""
+import csv
+import io
+import os
+
+import numpy as np
+
+from xvg import ANALYSIS_TYPES, dataset_files, load_xvg, sample_name, time_scale
+
+CHUNK_ROWS = 200_000
+
+LONG_CSV = "CSV (long)"
+WIDE_CSV = "CSV (wide, one file per analysis)"
+PARQUET = "Parquet (long)"
+EXPORT_FORMATS = [LONG_CSV, WIDE_CSV, PARQUET]
+
+LONG_COLUMNS = ["analysis", "sample", "series", "x", "value"]
+
+
+def collect_datasets(path_folder_kerja, visibility=None):
+    """[(analysis subfolder, sample, XvgData)] for every visible sample of every analysis type"""
+    visibility = visibility or {}
+    datasets = []
+    for _, subfolder, _ in ANALYSIS_TYPES:
+        for path in sorted(dataset_files(path_folder_kerja, subfolder)):
+            name = sample_name(path)
+            if not visibility.get(name, True):
+                continue
+            try:
+                datasets.append((subfolder, name, load_xvg(path)))
+            except (OSError, ValueError) as e:
+                print(f"Error reading {path}: {e}")
+    return datasets
+
+
+def series_names(data):
+    return ["y"] + [f"y{i}" for i in range(2, data.columns.shape[1])]
+
+
+def windowed(data, window):
+    """Rows of the data inside a (start, end) time window in ns; RMSF is never windowed"""
+    columns = data.columns
+    scale = time_scale(data)
+    if window is None or scale is None or not len(columns):
+        return columns
+    start, end = window
+    x = columns[:, 0]
+    return columns[(x >= start * scale) & (x <= end * scale)]
+
+
+def time_range(datasets):
+    """(start, end) in ns over all time series, or None"""
+    bounds = []
+    for _, _, data in datasets:
+        scale = time_scale(data)
+        if scale is not None and len(data.x):
+            bounds.append((data.x.min() / scale, data.x.max() / scale))
+    if not bounds:
+        return None
+    return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+
+def csv_field(text):
+    """A CSV field, quoted if needed"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow([text])
+    return buffer.getvalue()
+
+
+def format_rows(row_format, block):
+    """Format a 2-D float block with one string operation"""
+    return (row_format * len(block)) % tuple(block.ravel())
+
+
+def total_rows(datasets, window):
+    return sum(len(windowed(data, window)) * (data.columns.shape[1] - 1) for _, _, data in datasets)
+
+
+def long_blocks(datasets, window):
+    """(analysis, sample, series, x, values) blocks of at most CHUNK_ROWS rows"""
+    for subfolder, name, data in datasets:
+        columns = windowed(data, window)
+        for col, series in enumerate(series_names(data), start=1):
+            for start in range(0, len(columns), CHUNK_ROWS):
+                chunk = columns[start:start + CHUNK_ROWS]
+                yield subfolder, name, series, chunk[:, 0], chunk[:, col]
+
+
+def write_long_csv(datasets, path, window=None, progress=None):
+    written = 0
+    total = total_rows(datasets, window)
+    with open(path, "w", newline="") as f:
+        f.write(",".join(LONG_COLUMNS) + "\n")
+        for subfolder, name, series, x, values in long_blocks(datasets, window):
+            prefix = ",".join(csv_field(text) for text in (subfolder, name, series)).replace("%", "%%")
+            f.write(format_rows(prefix + ",%.10g,%.10g\n", np.column_stack((x, values))))
+            written += len(x)
+            if progress is not None and progress(written, total) is False:
+                return False
+    return True
+
+
+def row_keys(x):
+    """(segment, x) per row; the segment increases wherever x restarts (a new chain in RMSF)"""
+    segment = np.zeros(len(x), dtype=np.int64)
+    if len(x) > 1:
+        segment[1:] = np.cumsum(np.diff(x) <= 0)
+    return segment, x
+
+
+def union_keys(keys):
+    """Sorted, de-duplicated (segment, x) rows over all samples"""
+    segment = np.concatenate([k[0] for k in keys])
+    x = np.concatenate([k[1] for k in keys])
+    order = np.lexsort((x, segment))
+    segment, x = segment[order], x[order]
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = (np.diff(segment) != 0) | (np.diff(x) != 0)
+    return segment[keep], x[keep]
+
+
+def positions(union, key):
+    """Row of the union table for every row of one sample"""
+    u_segment, u_x = union
+    segment, x = key
+    result = np.empty(len(x), dtype=np.int64)
+    for seg in np.unique(segment):
+        lo, hi = np.searchsorted(u_segment, [seg, seg + 1])
+        rows = segment == seg
+        result[rows] = lo + np.searchsorted(u_x[lo:hi], x[rows])
+    return result
+
+
+def write_wide_table(group, path, window=None, progress=None, offset=0, total=0):
+    """One analysis type, samples side by side on the union of their x values"""
+    tables = [(name, data, windowed(data, window)) for name, data in group]
+    keys = [row_keys(columns[:, 0]) for _, _, columns in tables]
+    union = union_keys(keys)
+    segmented = union[0].any()
+    places = [positions(union, key) for key in keys]
+
+    header = (["segment"] if segmented else []) + ["x"]
+    for name, data, _ in tables:
+        for series in series_names(data):
+            header.append(name if series == "y" else f"{name}:{series}")
+    width = len(header)
+    row_format = ",".join(["%.10g"] * width) + "\n"
+
+    with open(path, "w", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerow(header)
+        for start in range(0, len(union[1]), CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, len(union[1]))
+            block = np.full((stop - start, width), np.nan)
+            col = 0
+            if segmented:
+                block[:, 0] = union[0][start:stop]
+                col = 1
+            block[:, col] = union[1][start:stop]
+            col += 1
+            for (_, _, columns), place in zip(tables, places):
+                lo, hi = np.searchsorted(place, [start, stop])
+                for source in range(1, columns.shape[1]):
+                    block[place[lo:hi] - start, col] = columns[lo:hi, source]
+                    col += 1
+            f.write(format_rows(row_format, block).replace("nan", ""))
+            if progress is not None and progress(offset + stop, total) is False:
+                return False
+    return True
+
+
+def write_wide_csv(datasets, path, window=None, progress=None):
+    """`<name>_<analysis>.csv` per analysis type; returns the files written"""
+    base, ext = os.path.splitext(path)
+    groups = {}
+    for subfolder, name, data in datasets:
+        groups.setdefault(subfolder, []).append((name, data))
+    written = []
+    offset = 0
+    total = sum(len(windowed(data, window)) for _, _, data in datasets)
+    for subfolder, group in groups.items():
+        out = f"{base}_{subfolder}{ext or '.csv'}"
+        if not write_wide_table(group, out, window, progress, offset, total):
+            return written
+        written.append(out)
+        offset += sum(len(windowed(data, window)) for _, data in group)
+    return written
+
+
+def write_parquet(datasets, path, window=None, progress=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([("analysis", pa.dictionary(pa.int32(), pa.string())),
+                        ("sample", pa.dictionary(pa.int32(), pa.string())),
+                        ("series", pa.dictionary(pa.int32(), pa.string())),
+                        ("x", pa.float64()), ("value", pa.float64())])
+    written = 0
+    total = total_rows(datasets, window)
+    with pq.ParquetWriter(path, schema) as writer:
+        for subfolder, name, series, x, values in long_blocks(datasets, window):
+            n = len(x)
+            labels = [pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([text]))
+                      for text in (subfolder, name, series)]
+            writer.write_table(pa.Table.from_arrays(labels + [pa.array(x), pa.array(values)], schema=schema))
+            written += n
+            if progress is not None and progress(written, total) is False:
+                return False
+    return True
+
+
+def export_data(datasets, path, fmt, window=None, progress=None):
+    """Write the datasets in one of EXPORT_FORMATS; returns the files written
+
+    `progress(rows written, total rows)` may return False to stop.
+    """
+    if fmt == WIDE_CSV:
+        return write_wide_csv(datasets, path, window, progress)
+    if fmt == PARQUET:
+        return [path] if write_parquet(datasets, path, window, progress) else []
+    return [path] if write_long_csv(datasets, path, window, progress) else []
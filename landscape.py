@@ -0,0 +1,130 @@
+"""2-D free-energy landscapes from RMSD and radius of gyration.
+
+RMSD (`RMSD/`, in ns) and Rg (`gyration/`, in ps) of the same trajectory
+are joined on time: every RMSD frame is matched to the nearest Rg frame and
+kept if they are less than a quarter frame apart. The joined frames are
+binned with one np.bincount over flattened (RMSD bin, Rg bin) indices and
+turned into a landscape with G = -kT ln(P / P_max), so the deepest basin is
+at 0 and empty bins are NaN.
+
+Joined frames and count grids are cached per sample (by file fingerprints,
+bins, ranges and cutoff). A pooled landscape is the sum of the per-sample
+count grids, so pooling many replicas only adds grids together.
+"""
+
+import numpy as np
+
+from xvg import LruCache, fingerprint, load_xvg, sample_name, time_scale
+
+# Boltzmann constant in kJ/(mol K)
+BOLTZMANN_KJ = 0.0083144626
+DEFAULT_BINS = 60
+
+MAX_CACHED = 512
+_cache = LruCache(MAX_CACHED)
+
+
+def pair_files(rmsd_files, gyration_files):
+    """[(sample, rmsd path, gyration path)] for samples present in both lists
+
+    In a single analysed folder the files are named after the analysis
+    (rmsd.xvg, gyration.xvg), so one file on each side is paired directly.
+    """
+    gyration = {sample_name(path): path for path in gyration_files}
+    pairs = [(sample_name(path), path, gyration[sample_name(path)])
+             for path in sorted(rmsd_files) if sample_name(path) in gyration]
+    if not pairs and len(rmsd_files) == 1 and len(gyration_files) == 1:
+        pairs = [(sample_name(rmsd_files[0]), rmsd_files[0], gyration_files[0])]
+    return pairs
+
+
+def time_ns(data):
+    scale = time_scale(data) or 1.0
+    return data.x / scale
+
+
+def join_on_time(t_a, t_b):
+    """Indices (ia, ib) of the frames of two sorted time axes that coincide"""
+    if not len(t_a) or not len(t_b):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    right = np.clip(np.searchsorted(t_b, t_a), 0, len(t_b) - 1)
+    left = np.maximum(right - 1, 0)
+    nearest = np.where(np.abs(t_b[left] - t_a) <= np.abs(t_b[right] - t_a), left, right)
+    spacing = np.median(np.diff(t_b)) if len(t_b) > 1 else np.inf
+    keep = np.abs(t_b[nearest] - t_a) <= 0.25 * spacing
+    return np.nonzero(keep)[0], nearest[keep]
+
+
+def joined_frames(rmsd_path, gyration_path, cutoff=None):
+    """(rmsd, rg) of the frames both files share, from the cutoff (ns) on"""
+    key = (fingerprint(rmsd_path), fingerprint(gyration_path), "frames", cutoff)
+
+    def compute():
+        rmsd = load_xvg(rmsd_path)
+        gyration = load_xvg(gyration_path)
+        t_rmsd = time_ns(rmsd)
+        ia, ib = join_on_time(t_rmsd, time_ns(gyration))
+        if cutoff:
+            keep = t_rmsd[ia] >= cutoff
+            ia, ib = ia[keep], ib[keep]
+        return rmsd.y[ia], gyration.y[ib]
+
+    return _cache.get(key, compute)
+
+
+def frame_ranges(pairs, cutoff=None):
+    """((rmsd low, high), (rg low, high)) over all pairs, or None without frames"""
+    bounds = []
+    for _, rmsd_path, gyration_path in pairs:
+        rmsd, rg = joined_frames(rmsd_path, gyration_path, cutoff)
+        if len(rmsd):
+            bounds.append((rmsd.min(), rmsd.max(), rg.min(), rg.max()))
+    if not bounds:
+        return None
+    bounds = np.array(bounds)
+
+    def span(low, high):
+        return (low, high) if high > low else (low - 0.5, high + 0.5)
+
+    return span(bounds[:, 0].min(), bounds[:, 1].max()), span(bounds[:, 2].min(), bounds[:, 3].max())
+
+
+def bin_index(values, bins, low, high):
+    idx = ((values - low) * (bins / (high - low))).astype(np.intp)
+    return np.clip(idx, 0, bins - 1)
+
+
+def counts(rmsd_path, gyration_path, bins, ranges, cutoff=None):
+    """Cached (bins x bins) frame counts; axis 0 is RMSD, axis 1 is Rg"""
+    key = (fingerprint(rmsd_path), fingerprint(gyration_path), "counts", bins, ranges, cutoff)
+
+    def compute():
+        rmsd, rg = joined_frames(rmsd_path, gyration_path, cutoff)
+        flat = bin_index(rmsd, bins, *ranges[0]) * bins + bin_index(rg, bins, *ranges[1])
+        return np.bincount(flat, minlength=bins * bins).reshape(bins, bins)
+
+    return _cache.get(key, compute)
+
+
+def pooled_counts(pairs, bins, ranges, cutoff=None):
+    total = np.zeros((bins, bins), dtype=np.int64)
+    for _, rmsd_path, gyration_path in pairs:
+        total += counts(rmsd_path, gyration_path, bins, ranges, cutoff)
+    return total
+
+
+def free_energy(grid, temperature=300.0):
+    """G = -kT ln(P / P_max) in kJ/mol; NaN where no frame was seen"""
+    with np.errstate(divide="ignore"):
+        g = BOLTZMANN_KJ * temperature * np.log(grid.max() / grid) if grid.max() else np.full(grid.shape, np.inf)
+    g[~np.isfinite(g)] = np.nan
+    return g
+
+
+def bin_centres(bins, low, high):
+    step = (high - low) / bins
+    return low + (np.arange(bins) + 0.5) * step
+
+
+def clear_cache():
+    _cache.clear()
@@ -2,22 +2,227 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
-import os, sys
-import pandas as pd
+import os, sys, re
+import io
+import threading
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 from matplotlib import cm
+from matplotlib.colors import ListedColormap
+from matplotlib.patches import Patch
 import subprocess
 import time
 import numpy as np
 from cycler import cycler
 
+from xvg import (ANALYSIS_TYPES, BackgroundLoader, dataset_files, is_loaded, load_xvg, sample_name,
+                 split_segments, subfolder_for, visible_points)
+from thumbnails import ThumbnailGridDialog
+from pipeline import AnalysisPipeline, failed_steps, journal_reduced, needs_resume
+from ensemble import DEFAULT_PATTERN, MEAN_STD, PERCENTILE, aligned_group, band, group_samples
+from distribution import DEFAULT_BINS, HISTOGRAM, KDE, distribution, value_range
+from landscape import bin_centres, frame_ranges, free_energy, pair_files, pooled_counts
+from export import EXPORT_FORMATS, PARQUET, collect_datasets, export_data, time_range
+from topology import (LEVELS, RESIDUE, SECONDARY_NAMES, aggregate, atom_secondary, read_structure,
+                      structure_file)
+import settings
+
+# Apply the plotting style once at import time instead of on every window.
+# This module is imported lazily by UI.py (or pre-warmed in the background),
+# so the cost never lands on the folder picker's startup path.
+plt.style.use('ggplot')
+
+VIEW_LINES = "Lines (all samples)"
+VIEW_ENSEMBLE_STD = "Ensemble (mean ± std)"
+VIEW_ENSEMBLE_PERCENTILE = "Ensemble (median, 10-90 percentile)"
+VIEW_HISTOGRAM = "Distribution (histogram)"
+VIEW_KDE = "Distribution (KDE)"
+VIEW_FEL_POOLED = "Free energy landscape RMSD × Rg (pooled)"
+VIEW_FEL_SAMPLES = "Free energy landscape RMSD × Rg (per sample)"
+VIEW_RMSF_GROUPS = "RMSF atoms by residue / secondary structure / chain"
+VIEW_DASHBOARD = "Dashboard (all analyses)"
+VIEW_MODES = [VIEW_LINES, VIEW_ENSEMBLE_STD, VIEW_ENSEMBLE_PERCENTILE, VIEW_HISTOGRAM, VIEW_KDE,
+              VIEW_FEL_POOLED, VIEW_FEL_SAMPLES, VIEW_RMSF_GROUPS, VIEW_DASHBOARD]
+ENSEMBLE_MODES = (VIEW_ENSEMBLE_STD, VIEW_ENSEMBLE_PERCENTILE)
+DISTRIBUTION_MODES = (VIEW_HISTOGRAM, VIEW_KDE)
+LANDSCAPE_MODES = (VIEW_FEL_POOLED, VIEW_FEL_SAMPLES)
+# Per-sample landscapes drawn at most (small multiples get unreadable beyond)
+MAX_LANDSCAPE_PANELS = 25
+# Per-atom RMSF track: points drawn per sample for the visible atom range
+# (min/max decimated beyond that), and the secondary structure strip colours
+TRACK_POINTS = 2000
+SECONDARY_COLORS = ['#d62728', '#1f77b4', '#cccccc', '#ffffff']
+
+
+def is_atom_rmsf(xvg_files):
+    """True for per-atom RMSF files (one row per atom)"""
+    return bool(xvg_files) and all(os.path.basename(os.path.dirname(xvg)) == "rmsf_atom" for xvg in xvg_files)
+
+class ComboBoxDelegate(QStyledItemDelegate):
+    """Edits a table cell with a combo box; the editor only exists while editing"""
+    def __init__(self, options, color_swatches=False, parent=None):
+        super().__init__(parent)
+        self.options = options
+        self.color_swatches = color_swatches
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        for value in self.options:
+            editor.addItem(value)
+            if self.color_swatches:
+                editor.setItemData(editor.count()-1, QColor(value), Qt.BackgroundRole)
+        # Commit as soon as a value is picked
+        editor.activated.connect(lambda _, e=editor: self.commitData.emit(e))
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+
+class StyleTableModel(QAbstractTableModel):
+    """One row per compound: name, line style, marker and colour"""
+    COLUMNS = ["Sample", "Line Style", "Marker", "Color"]
+    KEYS = [None, 'line_style', 'marker', 'color']
+
+    def __init__(self, compounds, styles, parent=None):
+        super().__init__(parent)
+        self.compounds = compounds
+        self.styles = styles
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.compounds)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        compound = self.compounds[index.row()]
+        key = self.KEYS[index.column()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return compound if key is None else self.styles[compound][key]
+        if role == Qt.DecorationRole and key == 'color':
+            return QColor(self.styles[compound]['color'])
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() > 0:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() == 0:
+            return False
+        self.styles[self.compounds[index.row()]][self.KEYS[index.column()]] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.DecorationRole])
+        return True
+
+    def apply_style(self, rows, style_type, value):
+        """Set one style attribute for many rows and notify the view once"""
+        if not rows:
+            return
+        for row in rows:
+            self.styles[self.compounds[row]][style_type] = value
+        column = self.KEYS.index(style_type)
+        self.dataChanged.emit(self.index(min(rows), column), self.index(max(rows), column))
+
+
+class SampleTableModel(QAbstractTableModel):
+    """One checkable row per sample"""
+    def __init__(self, samples, visibility, parent=None):
+        super().__init__(parent)
+        self.samples = samples
+        self.visibility = visibility
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.samples)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return "Sample"
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        sample = self.samples[index.row()]
+        if role == Qt.DisplayRole:
+            return sample
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.visibility[sample] else Qt.Unchecked
+        return None
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole:
+            return False
+        self.visibility[self.samples[index.row()]] = (value == Qt.Checked)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def set_checked(self, rows, checked):
+        """Check or uncheck many rows and notify the view once"""
+        if not rows:
+            return
+        for row in rows:
+            self.visibility[self.samples[row]] = checked
+        self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), 0), [Qt.CheckStateRole])
+
+
+def make_table_view(model, parent=None):
+    """QTableView over a filter proxy, tuned for thousands of rows"""
+    proxy = QSortFilterProxyModel(parent)
+    proxy.setSourceModel(model)
+    proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+    proxy.setFilterKeyColumn(0)
+
+    view = QTableView(parent)
+    view.setModel(proxy)
+    view.setSortingEnabled(True)
+    view.sortByColumn(-1, Qt.AscendingOrder)
+    view.setAlternatingRowColors(True)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+    view.horizontalHeader().setStretchLastSection(True)
+    # Fixed row heights let the view skip measuring rows it does not show
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+    view.verticalHeader().setDefaultSectionSize(24)
+    view.verticalHeader().hide()
+    return proxy, view
+
+
+def matching_rows(names, pattern):
+    """Rows whose name matches a regular expression (case-insensitive)"""
+    try:
+        regex = re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return []
+    return [row for row, name in enumerate(names) if regex.search(name)]
+
 
 class PlotStyleDialog(QDialog):
-    def __init__(self, compounds, parent=None):
+    def __init__(self, compounds, parent=None, styles=None):
         super().__init__(parent)
         self.setWindowTitle("Customize Plot Styles")
         self.setMinimumWidth(500)
+        self.resize(600, 600)
         
         # Available style options
         self.line_styles = ['-', '--', '-.', ':', 'None']
@@ -28,71 +233,70 @@ class PlotStyleDialog(QDialog):
         self.compounds = compounds
         self.styles = {}
         
-        # Initialize with default styles - solid lines and better colors
+        # Initialize with default styles - solid lines and better colors -
+        # keeping any style already chosen for a compound
+        styles = styles or {}
         for i, compound in enumerate(compounds):
-            self.styles[compound] = {
-                'line_style': '-',  # Default to solid line
-                'marker': self.markers[(i+1) % len(self.markers)],
-                'color': self.colors[i % len(self.colors)]
-            }
+            if compound in styles:
+                self.styles[compound] = dict(styles[compound])
+            else:
+                self.styles[compound] = {
+                    'line_style': '-',  # Default to solid line
+                    'marker': self.markers[(i+1) % len(self.markers)],
+                    'color': self.colors[i % len(self.colors)]
+                }
         
         # Create layout
         layout = QVBoxLayout()
         
         # Add instructions
-        instruction = QLabel("Customize the plot style for each compound:")
+        instruction = QLabel("Customize the plot style for each compound (double-click a cell to edit):")
         instruction.setStyleSheet("font-weight: bold;")
         layout.addWidget(instruction)
         
-        # Create a scroll area for many compounds
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll_content = QWidget()
-        scroll_layout = QVBoxLayout(scroll_content)
+        # Filter by regular expression
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filter (regex):"))
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("e.g. ^rep[0-9]+")
+        filter_layout.addWidget(self.filter_edit)
+        select_matching = QPushButton("Select Matching")
+        select_matching.clicked.connect(self.select_matching)
+        filter_layout.addWidget(select_matching)
+        layout.addLayout(filter_layout)
         
-        # Add a row for each compound
-        for compound in compounds:
-            group_box = QGroupBox(compound)
-            group_layout = QGridLayout()
-            
-            # Line style selector
-            group_layout.addWidget(QLabel("Line Style:"), 0, 0)
-            line_combo = QComboBox()
-            line_combo.addItems(self.line_styles)
-            line_combo.setCurrentText(self.styles[compound]['line_style'])
-            line_combo.currentTextChanged.connect(lambda text, c=compound: self.update_style(c, 'line_style', text))
-            group_layout.addWidget(line_combo, 0, 1)
-            
-            # Marker selector
-            group_layout.addWidget(QLabel("Marker:"), 1, 0)
-            marker_combo = QComboBox()
-            marker_combo.addItems(self.markers)
-            marker_combo.setCurrentText(self.styles[compound]['marker'])
-            marker_combo.currentTextChanged.connect(lambda text, c=compound: self.update_style(c, 'marker', text))
-            group_layout.addWidget(marker_combo, 1, 1)
-            
-            # Color selector
-            group_layout.addWidget(QLabel("Color:"), 2, 0)
-            color_combo = QComboBox()
-            for color in self.colors:
-                color_combo.addItem(color)
-                # Set the background color of the item
-                color_combo.setItemData(color_combo.count()-1, QColor(color), Qt.BackgroundRole)
-            color_combo.setCurrentText(self.styles[compound]['color'])
-            color_combo.currentTextChanged.connect(lambda text, c=compound: self.update_style(c, 'color', text))
-            group_layout.addWidget(color_combo, 2, 1)
-            
-            # Preview button
-            preview_button = QPushButton("Preview")
-            preview_button.clicked.connect(lambda _, c=compound: self.show_preview(c))
-            group_layout.addWidget(preview_button, 3, 0, 1, 2)
-            
-            group_box.setLayout(group_layout)
-            scroll_layout.addWidget(group_box)
+        # Table of compounds; only the visible rows are ever materialized
+        self.model = StyleTableModel(compounds, self.styles, self)
+        self.proxy, self.view = make_table_view(self.model, self)
+        self.view.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.SelectedClicked)
+        self.view.setItemDelegateForColumn(1, ComboBoxDelegate(self.line_styles, parent=self.view))
+        self.view.setItemDelegateForColumn(2, ComboBoxDelegate(self.markers, parent=self.view))
+        self.view.setItemDelegateForColumn(3, ComboBoxDelegate(self.colors, color_swatches=True, parent=self.view))
+        self.view.doubleClicked.connect(self.preview_index)
+        self.filter_edit.textChanged.connect(self.proxy.setFilterRegExp)
+        layout.addWidget(self.view)
         
-        scroll_content.setLayout(scroll_layout)
-        scroll.setWidget(scroll_content)
-        layout.addWidget(scroll)
+        # Apply a style to every selected row at once
+        bulk_box = QGroupBox("Apply to selected rows")
+        bulk_layout = QGridLayout()
+        self.bulk_combos = {}
+        for column, (title, key, options) in enumerate([("Line Style:", 'line_style', self.line_styles),
+                                                        ("Marker:", 'marker', self.markers),
+                                                        ("Color:", 'color', self.colors)]):
+            bulk_layout.addWidget(QLabel(title), 0, column * 2)
+            combo = QComboBox()
+            combo.addItem("(keep)")
+            combo.addItems(options)
+            bulk_layout.addWidget(combo, 0, column * 2 + 1)
+            self.bulk_combos[key] = combo
+        apply_button = QPushButton("Apply")
+        apply_button.clicked.connect(self.apply_to_selected)
+        bulk_layout.addWidget(apply_button, 0, 6)
+        preview_button = QPushButton("Preview")
+        preview_button.clicked.connect(lambda: self.preview_index(self.view.currentIndex()))
+        bulk_layout.addWidget(preview_button, 0, 7)
+        bulk_box.setLayout(bulk_layout)
+        layout.addWidget(bulk_box)
         
         # Add buttons
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -102,8 +306,31 @@ class PlotStyleDialog(QDialog):
         
         self.setLayout(layout)
     
-    def update_style(self, compound, style_type, value):
-        self.styles[compound][style_type] = value
+    def selected_rows(self):
+        return sorted({self.proxy.mapToSource(index).row() for index in self.view.selectionModel().selectedRows()})
+    
+    def select_matching(self):
+        """Select every row (visible through the filter) whose name matches the regex"""
+        self.view.clearSelection()
+        selection = QItemSelection()
+        for row in matching_rows(self.compounds, self.filter_edit.text()):
+            index = self.proxy.mapFromSource(self.model.index(row, 0))
+            if index.isValid():
+                selection.select(index, index)
+        self.view.selectionModel().select(selection, QItemSelectionModel.Select | QItemSelectionModel.Rows)
+    
+    def apply_to_selected(self):
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "No Selection", "Select one or more rows first")
+            return
+        for key, combo in self.bulk_combos.items():
+            if combo.currentIndex() > 0:
+                self.model.apply_style(rows, key, combo.currentText())
+    
+    def preview_index(self, index):
+        if index.isValid() and index.column() == 0:
+            self.show_preview(self.compounds[self.proxy.mapToSource(index).row()])
     
     def show_preview(self, compound):
         style = self.styles[compound]
@@ -115,7 +342,7 @@ class PlotStyleDialog(QDialog):
         
         layout = QVBoxLayout()
         
-        fig = plt.figure(figsize=(4, 3))
+        fig = Figure(figsize=(4, 3))
         ax = fig.add_subplot(111)
         
         # Create sample data
@@ -157,14 +384,16 @@ class PlotStyleDialog(QDialog):
 
 
 class SampleSelectionDialog(QDialog):
-    def __init__(self, samples, parent=None):
+    def __init__(self, samples, parent=None, visibility=None):
         super().__init__(parent)
         self.setWindowTitle("Select Samples to Display")
         self.setMinimumWidth(400)
+        self.resize(450, 600)
         
-        # Store samples and their visibility
+        # Store samples and their visibility (all visible by default)
         self.samples = samples
-        self.visibility = {sample: True for sample in samples}  # All visible by default
+        visibility = visibility or {}
+        self.visibility = {sample: visibility.get(sample, True) for sample in samples}
         
         # Create layout
         layout = QVBoxLayout()
@@ -174,32 +403,35 @@ class SampleSelectionDialog(QDialog):
         instruction.setStyleSheet("font-weight: bold;")
         layout.addWidget(instruction)
         
-        # Create a scroll area for many samples
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll_content = QWidget()
-        scroll_layout = QVBoxLayout(scroll_content)
+        # Filter by regular expression
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filter (regex):"))
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("e.g. ^rep[0-9]+")
+        filter_layout.addWidget(self.filter_edit)
+        layout.addLayout(filter_layout)
         
-        # Add a checkbox for each sample
-        for sample in samples:
-            checkbox = QCheckBox(sample)
-            checkbox.setChecked(True)
-            checkbox.stateChanged.connect(lambda state, s=sample: self.update_visibility(s, state))
-            scroll_layout.addWidget(checkbox)
+        # Checkable table; only the visible rows are ever materialized
+        self.model = SampleTableModel(samples, self.visibility, self)
+        self.proxy, self.view = make_table_view(self.model, self)
+        self.filter_edit.textChanged.connect(self.proxy.setFilterRegExp)
+        layout.addWidget(self.view)
         
-        # Add select/deselect all buttons
+        # Add select/deselect buttons (all samples, or those matching the filter)
         buttons_layout = QHBoxLayout()
         select_all = QPushButton("Select All")
         select_all.clicked.connect(self.select_all)
         deselect_all = QPushButton("Deselect All")
         deselect_all.clicked.connect(self.deselect_all)
+        select_matching = QPushButton("Select Matching")
+        select_matching.clicked.connect(lambda: self.set_matching(True))
+        deselect_matching = QPushButton("Deselect Matching")
+        deselect_matching.clicked.connect(lambda: self.set_matching(False))
         buttons_layout.addWidget(select_all)
         buttons_layout.addWidget(deselect_all)
-        scroll_layout.addLayout(buttons_layout)
-        
-        scroll_content.setLayout(scroll_layout)
-        scroll.setWidget(scroll_content)
-        layout.addWidget(scroll)
+        buttons_layout.addWidget(select_matching)
+        buttons_layout.addWidget(deselect_matching)
+        layout.addLayout(buttons_layout)
         
         # Add buttons
         button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -209,42 +441,82 @@ class SampleSelectionDialog(QDialog):
         
         self.setLayout(layout)
     
-    def update_visibility(self, sample, state):
-        self.visibility[sample] = (state == Qt.Checked)
-    
     def select_all(self):
-        for sample in self.samples:
-            self.visibility[sample] = True
-        # Update all checkboxes
-        for i in range(self.layout().itemAt(1).widget().widget().layout().count() - 1):  # -1 for the buttons layout
-            item = self.layout().itemAt(1).widget().widget().layout().itemAt(i)
-            if isinstance(item.widget(), QCheckBox):
-                item.widget().setChecked(True)
+        self.model.set_checked(range(len(self.samples)), True)
     
     def deselect_all(self):
-        for sample in self.samples:
-            self.visibility[sample] = False
-        # Update all checkboxes
-        for i in range(self.layout().itemAt(1).widget().widget().layout().count() - 1):  # -1 for the buttons layout
-            item = self.layout().itemAt(1).widget().widget().layout().itemAt(i)
-            if isinstance(item.widget(), QCheckBox):
-                item.widget().setChecked(False)
+        self.model.set_checked(range(len(self.samples)), False)
+    
+    def set_matching(self, checked):
+        self.model.set_checked(matching_rows(self.samples, self.filter_edit.text()), checked)
     
     def get_visibility(self):
         return self.visibility
 
 
+class ExportDataDialog(QDialog):
+    """Format and time window for the data export"""
+
+    def __init__(self, sample_count, window, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Data")
+        self.setMinimumWidth(400)
+        
+        layout = QVBoxLayout()
+        instruction = QLabel(f"Export {sample_count} visible sample file(s) of all analysis types:")
+        instruction.setStyleSheet("font-weight: bold;")
+        layout.addWidget(instruction)
+        
+        form = QFormLayout()
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(EXPORT_FORMATS)
+        form.addRow("Format:", self.format_combo)
+        
+        # Time window in ns; RMSF (per atom/residue) is always exported in full
+        start, end = window or (0.0, 0.0)
+        self.window_checkbox = QCheckBox("Limit time series to a time window (ns)")
+        self.window_checkbox.setEnabled(window is not None)
+        form.addRow(self.window_checkbox)
+        self.start_spin = QDoubleSpinBox()
+        self.end_spin = QDoubleSpinBox()
+        for spin, value in ((self.start_spin, start), (self.end_spin, end)):
+            spin.setDecimals(3)
+            spin.setRange(start, end)
+            spin.setValue(value)
+            spin.setSuffix(" ns")
+            spin.setEnabled(False)
+            self.window_checkbox.toggled.connect(spin.setEnabled)
+        form.addRow("From:", self.start_spin)
+        form.addRow("To:", self.end_spin)
+        layout.addLayout(form)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+        
+        self.setLayout(layout)
+    
+    def get_format(self):
+        return self.format_combo.currentText()
+    
+    def get_window(self):
+        if not self.window_checkbox.isChecked():
+            return None
+        return self.start_spin.value(), self.end_spin.value()
+
+
 class Analisis_Gromacs(QtWidgets.QWidget):
-    def __init__(self, path_folder_kerja):
+    # Emitted whenever the main figure shows every selected sample
+    view_ready = pyqtSignal()
+
+    def __init__(self, path_folder_kerja, session=None):
         super().__init__()
         self.path_folder_kerja = path_folder_kerja
         self.path_icon = os.path.dirname(os.path.realpath(__file__))
         self.setObjectName("self")
         self.resize(804, 655)
         
-        # Set up a nicer plotting style
-        plt.style.use('ggplot')
-        
         # Create figure with higher DPI for better quality
         self.figure = plt.figure(figsize=(6, 4), dpi=120)
         self.canvas = FigureCanvas(self.figure)
@@ -259,6 +531,12 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         self.pushButton.setObjectName("pushButton")
         self.pushButton.clicked.connect(self.analisis)
         self.gridLayout.addWidget(self.pushButton, 0, 0, 1, 1)
+        
+        # Reduced-system mode: analyse a protein+ligand-only trajectory
+        self.reduced_checkbox = QtWidgets.QCheckBox("Protein-ligand only (reduced trajectory)", self)
+        self.reduced_checkbox.setChecked(settings.get("reduced_system"))
+        self.reduced_checkbox.setToolTip("Write one PBC-corrected protein+ligand trajectory and run every analysis on it")
+        self.gridLayout.addWidget(self.reduced_checkbox, 0, 1, 1, 3, QtCore.Qt.AlignLeft)
         self.pushButton_2 = QtWidgets.QPushButton(self)
         font = QtGui.QFont()
         font.setPointSize(14)
@@ -266,6 +544,14 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         self.pushButton_2.setObjectName("pushButton_2")
         self.pushButton_2.clicked.connect(self.save)
         self.gridLayout.addWidget(self.pushButton_2, 0, 1, 1, 1, QtCore.Qt.AlignLeft)
+
+        # Resume an interrupted run, or retry failed steps, next to the results
+        self.resume_button = QtWidgets.QPushButton(self)
+        font = QtGui.QFont()
+        font.setPointSize(14)
+        self.resume_button.setFont(font)
+        self.resume_button.clicked.connect(self.lanjutkan_analisis)
+        self.gridLayout.addWidget(self.resume_button, 0, 0, 1, 1)
         
         # Add customize button
         self.customize_button = QtWidgets.QPushButton(self)
@@ -285,6 +571,15 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         self.select_samples_button.clicked.connect(self.select_samples)
         self.gridLayout.addWidget(self.select_samples_button, 0, 3, 1, 1, QtCore.Qt.AlignLeft)
         
+        # Add grid view button (small multiples)
+        self.grid_button = QtWidgets.QPushButton(self)
+        font = QtGui.QFont()
+        font.setPointSize(14)
+        self.grid_button.setFont(font)
+        self.grid_button.setText("Grid View")
+        self.grid_button.clicked.connect(self.show_grid)
+        self.gridLayout.addWidget(self.grid_button, 0, 4, 1, 1, QtCore.Qt.AlignLeft)
+        
         self.label = QtWidgets.QLabel(self)
         font = QtGui.QFont()
         font.setPointSize(12)
@@ -292,7 +587,7 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         font.setWeight(75)
         self.label.setFont(font)
         self.label.setObjectName("label")
-        self.gridLayout.addWidget(self.label, 0, 4, 1, 1, QtCore.Qt.AlignRight)
+        self.gridLayout.addWidget(self.label, 0, 5, 1, 1, QtCore.Qt.AlignRight)
         self.comboBox = QtWidgets.QComboBox(self)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
         sizePolicy.setHorizontalStretch(0)
@@ -312,10 +607,64 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         self.comboBox.addItem("")
         self.comboBox.addItem("")
         self.comboBox.currentIndexChanged.connect(self.combo_berubah)
-        self.gridLayout.addWidget(self.comboBox, 0, 5, 1, 1)
+        self.gridLayout.addWidget(self.comboBox, 0, 6, 1, 1)
+        
+        # View mode row: plain lines or replica ensembles
+        self.view_widget = QtWidgets.QWidget(self)
+        view_layout = QtWidgets.QHBoxLayout(self.view_widget)
+        view_layout.setContentsMargins(0, 0, 0, 0)
+        view_layout.addWidget(QtWidgets.QLabel("View:"))
+        self.view_combo = QtWidgets.QComboBox(self.view_widget)
+        self.view_combo.addItems(VIEW_MODES)
+        self.view_combo.currentIndexChanged.connect(self.view_berubah)
+        view_layout.addWidget(self.view_combo)
+        self.pattern_label = QtWidgets.QLabel("Group pattern (regex):")
+        view_layout.addWidget(self.pattern_label)
+        self.pattern_edit = QtWidgets.QLineEdit(DEFAULT_PATTERN, self.view_widget)
+        self.pattern_edit.setToolTip("Samples whose first capture group is equal form one ensemble")
+        self.pattern_edit.editingFinished.connect(self.combo_berubah)
+        view_layout.addWidget(self.pattern_edit, 1)
+        
+        # Distribution views: bin count and equilibration cutoff
+        self.distribution_controls = QtWidgets.QWidget(self.view_widget)
+        distribution_layout = QtWidgets.QHBoxLayout(self.distribution_controls)
+        distribution_layout.setContentsMargins(0, 0, 0, 0)
+        distribution_layout.addWidget(QtWidgets.QLabel("Bins:"))
+        self.bins_spin = QtWidgets.QSpinBox(self.distribution_controls)
+        self.bins_spin.setRange(5, 2000)
+        self.bins_spin.setValue(DEFAULT_BINS)
+        self.bins_spin.editingFinished.connect(self.view_berubah)
+        distribution_layout.addWidget(self.bins_spin)
+        distribution_layout.addWidget(QtWidgets.QLabel("Equilibration cutoff:"))
+        self.cutoff_spin = QtWidgets.QDoubleSpinBox(self.distribution_controls)
+        self.cutoff_spin.setRange(0, 1e6)
+        self.cutoff_spin.setDecimals(2)
+        self.cutoff_spin.setSuffix(" ns")
+        self.cutoff_spin.setToolTip("Frames before this time are left out (time series only)")
+        self.cutoff_spin.editingFinished.connect(self.view_berubah)
+        distribution_layout.addWidget(self.cutoff_spin)
+        view_layout.addWidget(self.distribution_controls)
+
+        # Per-atom RMSF grouped through the structure written by the pipeline
+        self.topology_controls = QtWidgets.QWidget(self.view_widget)
+        topology_layout = QtWidgets.QHBoxLayout(self.topology_controls)
+        topology_layout.setContentsMargins(0, 0, 0, 0)
+        topology_layout.addWidget(QtWidgets.QLabel("Group by:"))
+        self.level_combo = QtWidgets.QComboBox(self.topology_controls)
+        self.level_combo.addItems(LEVELS)
+        self.level_combo.currentIndexChanged.connect(self.view_berubah)
+        topology_layout.addWidget(self.level_combo)
+        view_layout.addWidget(self.topology_controls)
+        view_layout.addStretch(1)
+        self.export_button = QtWidgets.QPushButton("Export Data", self.view_widget)
+        self.export_button.setToolTip("Write the numbers of all visible samples to CSV or Parquet")
+        self.export_button.clicked.connect(self.export_data)
+        view_layout.addWidget(self.export_button)
+        self.gridLayout.addWidget(self.view_widget, 1, 0, 1, 7)
+        
         self.widget = QtWidgets.QWidget(self)
         self.widget.setObjectName("widget")
-        self.gridLayout.addWidget(self.widget, 1, 0, 1, 6)
+        self.gridLayout.addWidget(self.widget, 2, 0, 1, 7)
 
         self.verticalLayout = QtWidgets.QVBoxLayout(self.widget)
         self.verticalLayout.setObjectName("verticalLayout")
@@ -361,27 +710,114 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         self.custom_styles = {}
         self.sample_visibility = {}
 
+        # Many sample files are read concurrently in the background; the
+        # plot is redrawn as they arrive
+        self.loader = None
+        self.loaded_count = 0
+        # Sample files that could not be read: {path: error message}
+        self.load_errors = {}
+        self.load_timer = QTimer(self)
+        self.load_timer.setInterval(250)
+        self.load_timer.timeout.connect(self.loading_tick)
+
+        # Dashboard of all analysis types: panels, their lines, and the
+        # panels still to be drawn (see plot_dashboard)
+        self.dashboard = None
+
+        # Mouse wheel zoom of the per-atom RMSF track, per canvas
+        self.track_zoom = {}
+
+        # Existing outputs are shown even if some steps failed or a run was
+        # interrupted; resuming or retrying is offered next to them
         if os.path.exists(self.path_folder_kerja + "/RMSD"):
-            self.pushButton.hide()
-            self.pushButton_2.show()
-            self.customize_button.show()
-            self.select_samples_button.show()
+            self.show_result_controls(True)
 
-            xvg_listawal = [self.path_folder_kerja + "/RMSD/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/RMSD") if data1.endswith(".xvg")]
-            self.current_xvg_files = xvg_listawal
-            
-            # Initialize all samples as visible
-            samples = [os.path.basename(xvg).split('.')[0] for xvg in xvg_listawal]
-            self.sample_visibility = {sample: True for sample in samples}
-            
-            self.plot_data(xvg_listawal)
+            if session:
+                # Reopened project: restore styles, visibility and the view
+                self.apply_session(session)
+            else:
+                xvg_listawal = dataset_files(self.path_folder_kerja, "RMSD")
+                self.current_xvg_files = xvg_listawal
+                
+                # Initialize all samples as visible
+                samples = [sample_name(xvg) for xvg in xvg_listawal]
+                self.sample_visibility = {sample: True for sample in samples}
+                
+                self.plot_data(xvg_listawal)
 
         else:
-            self.pushButton.show()
-            self.pushButton_2.hide()
-            self.customize_button.hide()
-            self.select_samples_button.hide()
+            self.show_result_controls(False)
             
+    def show_result_controls(self, available):
+        """Show the plot controls once results exist, or the Analisis controls before"""
+        self.pushButton.setVisible(not available)
+        self.reduced_checkbox.setVisible(not available)
+        self.update_resume_button(available)
+        for widget in (self.pushButton_2, self.customize_button, self.select_samples_button,
+                       self.grid_button, self.view_widget):
+            widget.setVisible(available)
+        self.view_berubah()
+
+    def update_resume_button(self, available=True):
+        """Offer to resume an interrupted run or retry failed steps of the folder"""
+        if needs_resume(self.path_folder_kerja):
+            self.resume_button.setText("Resume")
+            self.resume_button.setToolTip("Continue the interrupted analysis from its unfinished steps")
+        elif failed_steps(self.path_folder_kerja):
+            self.resume_button.setText("Retry failed")
+            self.resume_button.setToolTip("Run again: " + ", ".join(failed_steps(self.path_folder_kerja)))
+        else:
+            available = False
+        self.resume_button.setVisible(available)
+
+    def session_state(self):
+        """Window state saved in a project file"""
+        return {
+            "dataset": self.comboBox.currentText(),
+            "view": self.view_combo.currentText(),
+            "pattern": self.pattern_edit.text(),
+            "bins": self.bins_spin.value(),
+            "cutoff": self.cutoff_spin.value(),
+            "level": self.level_combo.currentText(),
+            "styles": self.custom_styles,
+            "visibility": self.sample_visibility,
+        }
+
+    def apply_session(self, state):
+        """Restore a saved window state and draw its view"""
+        self.custom_styles = dict(state.get("styles", {}))
+        self.sample_visibility = dict(state.get("visibility", {}))
+        for combo, key in ((self.comboBox, "dataset"), (self.view_combo, "view"), (self.level_combo, "level")):
+            index = combo.findText(state.get(key, ""))
+            if index >= 0:
+                combo.blockSignals(True)
+                combo.setCurrentIndex(index)
+                combo.blockSignals(False)
+        self.pattern_edit.setText(state.get("pattern", DEFAULT_PATTERN))
+        self.bins_spin.setValue(state.get("bins", DEFAULT_BINS))
+        self.cutoff_spin.setValue(state.get("cutoff", 0.0))
+        self.view_berubah()
+        self.combo_berubah()
+
+    def render_png(self):
+        """The main figure as PNG bytes (cached in project files)"""
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format="png", dpi=self.figure.dpi)
+        return buffer.getvalue()
+
+    def is_loading(self):
+        return self.loader is not None and not self.loader.done()
+
+    def view_berubah(self):
+        """Show the controls of the selected view, then replot"""
+        ensemble = self.view_combo.currentText() in ENSEMBLE_MODES
+        self.pattern_label.setVisible(ensemble)
+        self.pattern_edit.setVisible(ensemble)
+        self.distribution_controls.setVisible(self.view_combo.currentText() in DISTRIBUTION_MODES + LANDSCAPE_MODES)
+        self.topology_controls.setVisible(self.view_combo.currentText() == VIEW_RMSF_GROUPS)
+        if self.current_xvg_files:
+            self.plot_data(self.current_xvg_files)
+
     def select_samples(self):
         """Open dialog to select which samples to display"""
         if not self.current_xvg_files:
@@ -389,22 +825,14 @@ class Analisis_Gromacs(QtWidgets.QWidget):
             return
             
         # Extract compound names from file paths
-        compounds = [os.path.basename(xvg).split('.')[0] for xvg in self.current_xvg_files]
-        
-        # Show the sample selection dialog
-        dialog = SampleSelectionDialog(compounds, self)
+        compounds = [sample_name(xvg) for xvg in self.current_xvg_files]
         
-        # Pre-set the checkboxes based on current visibility
-        for i in range(dialog.layout().itemAt(1).widget().widget().layout().count() - 1):  # -1 for the buttons layout
-            item = dialog.layout().itemAt(1).widget().widget().layout().itemAt(i)
-            if isinstance(item.widget(), QCheckBox):
-                sample = item.widget().text()
-                if sample in self.sample_visibility:
-                    item.widget().setChecked(self.sample_visibility[sample])
+        # Show the sample selection dialog, pre-set from the current visibility
+        dialog = SampleSelectionDialog(compounds, self, self.sample_visibility)
         
         if dialog.exec_() == QDialog.Accepted:
-            # Get the visibility settings
-            self.sample_visibility = dialog.get_visibility()
+            # Get the visibility settings (keep samples of other data types)
+            self.sample_visibility.update(dialog.get_visibility())
             
             # Get the current plot type
             current_type = self.comboBox.currentText()
@@ -419,13 +847,13 @@ class Analisis_Gromacs(QtWidgets.QWidget):
             return
             
         # Extract compound names from file paths
-        compounds = [os.path.basename(xvg).split('.')[0] for xvg in self.current_xvg_files]
+        compounds = [sample_name(xvg) for xvg in self.current_xvg_files]
         
-        # Show the customization dialog
-        dialog = PlotStyleDialog(compounds, self)
+        # Show the customization dialog, starting from the current styles
+        dialog = PlotStyleDialog(compounds, self, self.custom_styles)
         if dialog.exec_() == QDialog.Accepted:
             # Get the custom styles
-            self.custom_styles = dialog.get_styles()
+            self.custom_styles.update(dialog.get_styles())
             # Replot with custom styles
             self.plot_data(self.current_xvg_files)
 
@@ -436,161 +864,233 @@ class Analisis_Gromacs(QtWidgets.QWidget):
             self.figure.savefig(path_simpan[0], dpi=500, bbox_inches='tight')
             QMessageBox.information(self, "Berhasil", f"Plot berhasil disimpan ke {path_simpan[0]}")
 
+    def export_data(self):
+        """Export every visible sample of all analysis types as a table"""
+        datasets = collect_datasets(self.path_folder_kerja, self.sample_visibility)
+        if not datasets:
+            QMessageBox.warning(self, "Export Data", "No visible samples to export.")
+            return
+        dialog = ExportDataDialog(len(datasets), time_range(datasets), self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        fmt = dialog.get_format()
+        file_filter = "Parquet (*.parquet)" if fmt == PARQUET else "CSV (*.csv)"
+        path_simpan = QtWidgets.QFileDialog.getSaveFileName(self, "Export Data", "", file_filter)[0]
+        if not path_simpan:
+            return
 
-    def plot_data(self, xvg_files):
-        """Enhanced plotting function with better styling and custom styles"""
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
+        progress = QProgressDialog("Menulis data...", "Batal", 0, 1000, self)
+        progress.setWindowTitle("Export Data")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.show()
+        QApplication.processEvents()
+
+        # Written in a worker thread; the GUI polls the row counter
+        status = {"rows": 0, "total": 0}
+        def on_progress(rows, total):
+            status.update(rows=rows, total=total)
+            return not status.get("cancel")
+        def run():
+            try:
+                status["files"] = export_data(datasets, path_simpan, fmt, dialog.get_window(), on_progress)
+            except Exception as e:
+                status["error"] = e
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        while worker.is_alive():
+            status["cancel"] = progress.wasCanceled()
+            if status["total"]:
+                progress.setValue(int(999 * status["rows"] / status["total"]))
+            QApplication.processEvents()
+            worker.join(0.05)
+        canceled = progress.wasCanceled()
+        progress.close()
+
+        if "error" in status:
+            print(f"Error exporting data: {status['error']}")
+            QMessageBox.warning(self, "Error", f"Export gagal: {status['error']}")
+        elif not canceled:
+            QMessageBox.information(self, "Berhasil", "Data berhasil disimpan ke\n" + "\n".join(status["files"]))
+
+
+    def series_style(self, label, i):
+        """Keyword arguments for ax.plot: the custom style if one is set, else the default cycle"""
+        if label in self.custom_styles:
+            style = self.custom_styles[label]
+            return {'linestyle': '' if style['line_style'] == 'None' else style['line_style'],
+                    'marker': '' if style['marker'] == 'None' else style['marker'],
+                    'color': style['color']}
+        return {'linestyle': self.line_styles[i % len(self.line_styles)],
+                'marker': self.markers[i % len(self.markers)]}
+
+    def plot_data(self, xvg_files, figure=None, canvas=None):
+        """Enhanced plotting function with better styling and custom styles
+
+        Draws into the main figure unless another figure/canvas pair is given
+        (used to open a single sample from the thumbnail grid).
+        """
+        own_figure = figure is None
+        if own_figure and self.view_combo.currentText() == VIEW_DASHBOARD:
+            return self.plot_dashboard(xvg_files)
+        if own_figure:
+            self.dashboard = None
+        loading = own_figure and self.prefetch(xvg_files)
+        if own_figure and not loading:
+            self.view_ready.emit()
+        if loading and self.view_combo.currentText() != VIEW_LINES:
+            # Aggregate views need every sample; they draw once loading is done
+            self.current_xvg_files = xvg_files
+            self.figure.clear()
+            return self.draw_message(self.figure.add_subplot(111), self.loading_text())
+        if own_figure and self.view_combo.currentText() in ENSEMBLE_MODES:
+            return self.plot_ensemble(xvg_files)
+        if own_figure and self.view_combo.currentText() in DISTRIBUTION_MODES:
+            return self.plot_distribution(xvg_files)
+        if own_figure and self.view_combo.currentText() in LANDSCAPE_MODES:
+            return self.plot_landscape(xvg_files)
+        if own_figure and self.view_combo.currentText() == VIEW_RMSF_GROUPS:
+            return self.plot_rmsf_groups(xvg_files)
+        figure = self.figure if own_figure else figure
+        canvas = self.canvas if own_figure else canvas
+        if is_atom_rmsf(xvg_files):
+            return self.plot_atom_track(xvg_files, figure, canvas, loading)
+        figure.clear()
+        ax = figure.add_subplot(111)
         
         # Apply the custom color cycle
         ax.set_prop_cycle(self.color_cycle)
         
         # Store the current xvg files
-        self.current_xvg_files = xvg_files
+        if own_figure:
+            self.current_xvg_files = xvg_files
         
         # Initialize sample visibility if needed
         if not self.sample_visibility:
-            samples = [os.path.basename(xvg).split('.')[0] for xvg in xvg_files]
-            self.sample_visibility = {sample: True for sample in samples}
+            self.sample_visibility = {sample_name(xvg): True for xvg in xvg_files}
         
         # Track plot data for statistics
         all_y_data = []
         
         # Track if any samples are visible
         visible_count = 0
+        title = ""
+        x_label = ""
+        y_label = ""
         
         for i, xvg in enumerate(xvg_files):
             if not os.path.exists(xvg):
                 continue
                 
             # Check if this sample should be visible
-            sample_name = os.path.basename(xvg).split('.')[0]
-            if sample_name in self.sample_visibility and not self.sample_visibility[sample_name]:
+            base_label = sample_name(xvg)
+            if base_label in self.sample_visibility and not self.sample_visibility[base_label]:
                 continue  # Skip this sample if it's set to be hidden
-                
-            visible_count += 1
+            if loading and not is_loaded(xvg):
+                continue  # Still being read; drawn on a later pass
 
-            # Read raw data and metadata
-            with open(xvg, "r") as f:
-                lines = f.readlines()
-
-            raw_data = []
-            title = ""
-            x_label = ""
-            y_label = ""
-
-            for line in lines:
-                if not line.startswith("@") and not line.startswith("#"):
-                    parts = line.split()
-                    raw_data.append((float(parts[0]), float(parts[1])))
-                else:
-                    # Detect plot type and labels
-                    if "Radius of gyration (total and around axes)" in line:
-                        title = "Radius of gyration (total and around axes)"
-                        x_label = "Time (ps)"
-                        y_label = "Radius of gyration/Rg (nm)"
-                    elif "Hydrogen bonds" in line:
-                        title = "Number of hydrogen bonds"
-                        x_label = "Time (ps)"
-                        y_label = "Hbonds"
-                    elif "Solvent Accessible Surface" in line:
-                        title = "Solvent Accessible Surface"
-                        x_label = "Time (ps)"
-                        y_label = "Area (nm²)"
-                    elif "rmsf_rec.xvg" in line:
-                        title = "RMS fluctuation Residue"
-                        x_label = "Residue"
-                        y_label = "RMSF (nm)"
-                    elif "rmsf_atom.xvg" in line:
-                        title = "RMS fluctuation Atom"
-                        x_label = "Atom"
-                        y_label = "RMSF (nm)"
-                    elif "rmsd_pro_lig.xvg" in line:
-                        title = "RMSD Protein-Ligand"
-                        x_label = "Time (ns)"
-                        y_label = "RMSD (nm)"
-                    elif "rmsd.xvg" in line:
-                        title = "RMSD"
-                        x_label = "Time (ns)"
-                        y_label = "RMSD (nm)"
+            # Parsed arrays and labels come from the shared (cached) data layer
+            data = self.read_sample(xvg)
+            if data is None:
+                continue
+            visible_count += 1
+            title, x_label, y_label = data.title, data.x_label, data.y_label
 
             # If no numerical data, skip
-            if not raw_data:
+            if not len(data.x):
                 continue
 
-            base_label = os.path.basename(xvg).split('.')[0]
+            style = self.series_style(base_label, i)
 
             # Handle RMS fluctuation Residue grouping
             if title == "RMS fluctuation Residue":
-                # Split into segments where residue number resets or decreases
-                segments = []
-                seg = []
-                prev_res = None
-                for res, val in raw_data:
-                    if prev_res is not None and res <= prev_res:
-                        segments.append(seg)
-                        seg = []
-                    seg.append((res, val))
-                    prev_res = res
-                if seg:
-                    segments.append(seg)
-
-                # Plot each segment with its own label (Residue A, B, ...)
-                for idx, seg in enumerate(segments):
-                    xs, ys = zip(*seg)
+                # Plot each segment (residue numbering restarts per chain) with its own label
+                for idx, (xs, ys) in enumerate(split_segments(data.x, data.y)):
                     seg_label = f"{base_label} - Residue {chr(ord('A') + idx)}"
-                    all_y_data.append(list(ys))
-
-                    # Use custom style if available
-                    if base_label in self.custom_styles:
-                        style = self.custom_styles[base_label]
-                        line_style = '' if style['line_style'] == 'None' else style['line_style']
-                        marker = '' if style['marker'] == 'None' else style['marker']
-                        color = style['color']
-                        ax.plot(xs, ys, label=seg_label, linewidth=1.5,
-                               linestyle=line_style, marker=marker, color=color,
-                               markevery=max(1, len(xs)//20), markersize=4)
-                    else:
-                        line_style = self.line_styles[i % len(self.line_styles)]
-                        marker = self.markers[i % len(self.markers)]
-                        ax.plot(xs, ys, label=seg_label, linewidth=1.5,
-                               linestyle=line_style, marker=marker,
-                               markevery=max(1, len(xs)//20), markersize=4)
-
-                # Skip default plotting for this file
+                    all_y_data.append(ys)
+                    ax.plot(xs, ys, label=seg_label, linewidth=1.5,
+                            markevery=max(1, len(xs)//20), markersize=4, **style)
                 continue
 
             # For all other plots
-            y_vals = [val for _, val in raw_data]
-            all_y_data.append(y_vals)
-            
-            # Plot single series
-            label = base_label
-            if label in self.custom_styles:
-                style = self.custom_styles[label]
-                line_style = '' if style['line_style'] == 'None' else style['line_style']
-                marker = '' if style['marker'] == 'None' else style['marker']
-                color = style['color']
-                xs, ys = zip(*raw_data)
-                ax.plot(xs, ys, label=label, linewidth=1.5,
-                       linestyle=line_style, marker=marker, color=color,
-                       markevery=max(1, len(xs)//20), markersize=4)
-            else:
-                xs, ys = zip(*raw_data)
-                line_style = self.line_styles[i % len(self.line_styles)]
-                marker = self.markers[i % len(self.markers)]
-                ax.plot(xs, ys, label=label, linewidth=1.5,
-                       linestyle=line_style, marker=marker,
-                       markevery=max(1, len(xs)//20), markersize=4)
+            all_y_data.append(data.y)
+            ax.plot(data.x, data.y, label=base_label, linewidth=1.5,
+                    markevery=max(1, len(data.x)//20), markersize=4, **style)
         
         # Display a message if no samples are visible
         if visible_count == 0:
-            ax.text(0.5, 0.5, "No samples selected for display", 
+            ax.text(0.5, 0.5, self.loading_text() if loading else "No samples selected for display", 
                    horizontalalignment='center', verticalalignment='center',
                    transform=ax.transAxes, fontsize=14)
-            self.canvas.draw()
+            self.show_load_errors(figure, xvg_files)
+            canvas.draw()
+            return
+
+        if loading:
+            title = f"{title} ({self.loading_text()})"
+        self.decorate_axes(ax, title, x_label, y_label, legend=visible_count > 1)
+        
+        # Tight layout to make sure everything fits
+        figure.tight_layout()
+        self.show_load_errors(figure, xvg_files)
+        
+        # Draw the canvas
+        canvas.draw()
+
+    def prefetch(self, xvg_files):
+        """Load unread sample files in the background; True while some are still loading"""
+        pending = [xvg for xvg in xvg_files if os.path.exists(xvg) and not is_loaded(xvg)]
+        if not pending:
+            return False
+        if self.loader is not None and self.loader.covers(pending):
+            return not self.loader.done()
+        if len(pending) < 2:
+            return False  # A single file is simply read while plotting
+        for xvg in pending:
+            self.load_errors.pop(xvg, None)
+        self.loader = BackgroundLoader(pending)
+        self.loaded_count = 0
+        self.load_timer.start()
+        return True
+
+    def loading_text(self):
+        return f"Loading {len(self.loader.loaded)}/{len(self.loader.paths)} samples..."
+
+    def loading_tick(self):
+        """Redraw when more samples have arrived, and a last time when all are loaded"""
+        if self.loader is None:
+            self.load_timer.stop()
             return
+        done = self.loader.done()
+        if done or len(self.loader.loaded) != self.loaded_count:
+            self.loaded_count = len(self.loader.loaded)
+            self.load_errors.update(self.loader.failed)
+            if done:
+                self.load_timer.stop()
+            self.plot_data(self.current_xvg_files)
 
+    def read_sample(self, xvg):
+        """Parsed data of a sample file, or None (remembered in load_errors) if it cannot be read"""
+        try:
+            data = load_xvg(xvg)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {xvg}: {e}")
+            self.load_errors[xvg] = str(e)
+            return None
+        self.load_errors.pop(xvg, None)
+        return data
+
+    def show_load_errors(self, figure, xvg_files):
+        """Name the files of the plot that could not be read below the figure"""
+        failed = [xvg for xvg in xvg_files if xvg in self.load_errors]
+        if failed:
+            names = ", ".join(os.path.relpath(xvg, self.path_folder_kerja) for xvg in failed[:5])
+            if len(failed) > 5:
+                names += f" and {len(failed) - 5} more"
+            figure.text(0.01, 0.005, f"Could not read: {names}", color='red', fontsize=8,
+                        horizontalalignment='left', verticalalignment='bottom')
+
+    def decorate_axes(self, ax, title, x_label, y_label, legend=False):
+        """Titles, grid, legend, background and border shared by all plot views"""
         # Set title and labels with enhanced styling
         ax.set_title(title, **self.title_font)
         ax.set_xlabel(x_label, **self.axis_font)
@@ -603,7 +1103,7 @@ class Analisis_Gromacs(QtWidgets.QWidget):
         ax.grid(True, linestyle='--', alpha=0.7)
         
         # Add legend with enhanced styling if multiple series
-        if visible_count > 1:
+        if legend:
             ax.legend(loc='best', frameon=True, fancybox=True, shadow=True, fontsize=12)
         
         # Add a light background color to the plot area
@@ -614,47 +1114,527 @@ class Analisis_Gromacs(QtWidgets.QWidget):
             spine.set_visible(True)
             spine.set_color('black')
             spine.set_linewidth(1.0)
-        
-        # Tight layout to make sure everything fits
+
+    def plot_ensemble(self, xvg_files):
+        """Replica ensemble view: one mean ± std (or percentile) band per sample group"""
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        self.current_xvg_files = xvg_files
+
+        visible = self.visible_files(xvg_files)
+        if not visible:
+            return self.draw_message(ax, "No samples selected for display")
+
+        by_name = {sample_name(xvg): xvg for xvg in visible}
+        groups = group_samples(list(by_name), self.pattern_edit.text())
+        mode = PERCENTILE if self.view_combo.currentText() == VIEW_ENSEMBLE_PERCENTILE else MEAN_STD
+        colors = self.color_cycle.by_key()['color']
+
+        for gi, (group, members) in enumerate(groups.items()):
+            grid, matrix = aligned_group([by_name[name] for name in members])
+            if not len(grid):
+                continue
+            centre, low, high = band(matrix, mode)
+            # A group's colour follows its first member's custom style, if any
+            color = self.custom_styles.get(members[0], {}).get('color', colors[gi % len(colors)])
+            if len(members) > 1:
+                ax.fill_between(grid, low, high, color=color, alpha=0.25, linewidth=0)
+            ax.plot(grid, centre, color=color, linewidth=1.5, label=f"{group} (n={len(members)})")
+
+        data = load_xvg(visible[-1])
+        x_label = data.x_label
+        if data.title.startswith("RMS fluctuation") and len(data.x) > 1 and (data.x[1:] <= data.x[:-1]).any():
+            x_label = "Index"
+        suffix = "mean ± std" if mode == MEAN_STD else "median, 10-90 percentile"
+        self.decorate_axes(ax, f"{data.title} ({suffix})", x_label, data.y_label, legend=True)
         self.figure.tight_layout()
-        
-        # Draw the canvas
+        self.show_load_errors(self.figure, xvg_files)
         self.canvas.draw()
 
+    def visible_files(self, xvg_files):
+        """Shown sample files, without the ones that could not be read"""
+        return [xvg for xvg in xvg_files
+                if os.path.exists(xvg) and self.sample_visibility.get(sample_name(xvg), True)
+                and self.read_sample(xvg) is not None]
 
+    def draw_message(self, ax, message):
+        """Show a message instead of a plot in the main figure"""
+        ax.text(0.5, 0.5, message,
+               horizontalalignment='center', verticalalignment='center',
+               transform=ax.transAxes, fontsize=14)
+        self.canvas.draw()
 
-    def combo_berubah(self):
+    def plot_distribution(self, xvg_files):
+        """Distribution view: histogram or KDE of every visible sample"""
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        ax.set_prop_cycle(self.color_cycle)
+        self.current_xvg_files = xvg_files
+
+        visible = self.visible_files(xvg_files)
+        if not visible:
+            return self.draw_message(ax, "No samples selected for display")
+
+        kind = KDE if self.view_combo.currentText() == VIEW_KDE else HISTOGRAM
+        bins = self.bins_spin.value()
+        cutoff = self.cutoff_spin.value() or None
+        # One bin range for every sample of this analysis type (visible or
+        # not), so toggling samples reuses the cached distributions
+        bin_range = value_range([xvg for xvg in xvg_files if os.path.exists(xvg)], cutoff)
+        if bin_range is None:
+            return self.draw_message(ax, "No data after the equilibration cutoff")
+
+        for xvg in visible:
+            label = sample_name(xvg)
+            x, density = distribution(xvg, kind, bins, bin_range, cutoff)
+            style = {'label': label, 'linewidth': 1.5}
+            if label in self.custom_styles:
+                style['color'] = self.custom_styles[label]['color']
+            if kind == KDE:
+                ax.plot(x, density, **style)
+            else:
+                ax.step(x, np.append(density, density[-1]), where='post', **style)
+
+        data = load_xvg(visible[-1])
+        title = f"{data.title} distribution"
+        if cutoff:
+            title += f" (t ≥ {cutoff:g} ns)"
+        self.decorate_axes(ax, title, data.y_label, "Probability density", legend=len(visible) > 1)
+        self.figure.tight_layout()
+        self.show_load_errors(self.figure, xvg_files)
+        self.canvas.draw()
+
+    def plot_landscape(self, xvg_files):
+        """Free energy landscape over RMSD and Rg, pooled or one panel per sample"""
+        self.figure.clear()
+        self.current_xvg_files = xvg_files
+
+        pairs = pair_files(dataset_files(self.path_folder_kerja, "RMSD"),
+                           dataset_files(self.path_folder_kerja, "gyration"))
+        pairs = [pair for pair in pairs if self.read_sample(pair[1]) is not None and self.read_sample(pair[2]) is not None]
+        visible = [pair for pair in pairs if self.sample_visibility.get(pair[0], True)]
+        if not visible:
+            return self.draw_message(self.figure.add_subplot(111), "No samples with both RMSD and Rg selected")
+
+        bins = self.bins_spin.value()
+        cutoff = self.cutoff_spin.value() or None
+        temperature = settings.get("fel_temperature")
+        # Shared ranges over all samples keep the cached count grids valid
+        # while samples are toggled
+        ranges = frame_ranges(pairs, cutoff)
+        if ranges is None:
+            return self.draw_message(self.figure.add_subplot(111), "No frames after the equilibration cutoff")
+        rmsd_centres = bin_centres(bins, *ranges[0])
+        rg_centres = bin_centres(bins, *ranges[1])
+
+        if self.view_combo.currentText() == VIEW_FEL_POOLED:
+            panels = [(f"{len(visible)} sample(s) pooled", visible)]
+        else:
+            panels = [(pair[0], [pair]) for pair in visible[:MAX_LANDSCAPE_PANELS]]
+        landscapes = [(title, free_energy(pooled_counts(members, bins, ranges, cutoff), temperature))
+                      for title, members in panels]
+        top = max(np.nanmax(g) if np.isfinite(g).any() else 0.0 for _, g in landscapes)
+        levels = np.linspace(0.0, max(top, 1e-6), 21)
+
+        cols = int(np.ceil(np.sqrt(len(landscapes))))
+        rows = int(np.ceil(len(landscapes) / cols))
+        axes = []
+        for i, (title, g) in enumerate(landscapes):
+            ax = self.figure.add_subplot(rows, cols, i + 1)
+            contours = ax.contourf(rmsd_centres, rg_centres, g.T, levels=levels, cmap='viridis')
+            if len(landscapes) == 1:
+                self.decorate_axes(ax, f"Free energy landscape ({title})", "RMSD (nm)", "Rg (nm)")
+            else:
+                ax.set_title(title, fontsize=10)
+                ax.tick_params(axis='both', which='major', labelsize=8)
+            axes.append(ax)
+        self.figure.colorbar(contours, ax=axes, label="ΔG (kJ/mol)")
+        if len(visible) > len(landscapes):
+            self.figure.suptitle(f"First {len(landscapes)} of {len(visible)} samples", fontsize=10)
+        self.show_load_errors(self.figure, sorted(self.load_errors))
+        self.canvas.draw()
+
+    def plot_rmsf_groups(self, xvg_files):
+        """Per-atom RMSF aggregated by residue, secondary structure or chain"""
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        self.current_xvg_files = xvg_files
+        if not is_atom_rmsf(xvg_files):
+            return self.draw_message(ax, "Select the RMSF atom data to group atoms\nby residue, secondary structure or chain")
+
+        visible = self.visible_files(xvg_files)
+        if not visible:
+            return self.draw_message(ax, "No samples selected for display")
+        samples = [(sample_name(xvg), xvg, structure_file(xvg)) for xvg in visible]
+        missing = [name for name, _, path in samples if path is None]
+        samples = [sample for sample in samples if sample[2] is not None]
+        if not samples:
+            return self.draw_message(ax, "No structure file found.\nRun Analisis again to write structure/structure.pdb")
+
+        level = self.level_combo.currentText()
+        colors = self.color_cycle.by_key()['color']
         try:
-            list_data_xvg = []
-            opsisekarang = self.comboBox.currentText()
-            if opsisekarang == "RMSD":
-                list_data_xvg = [self.path_folder_kerja + "/RMSD/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/RMSD") if data1.endswith(".xvg")]
+            if level == RESIDUE:
+                for i, (name, xvg, path) in enumerate(samples):
+                    stats = aggregate(xvg, path, level)
+                    structure = read_structure(path)
+                    color = self.custom_styles.get(name, {}).get('color', colors[i % len(colors)])
+                    numbers = structure.residue_numbers[stats.groups]
+                    chains = structure.residue_chain[stats.groups]
+                    # Residue numbering restarts per chain: one line (and min-max band) per chain
+                    for chain in np.unique(chains):
+                        rows = chains == chain
+                        label = name if len(np.unique(chains)) == 1 else f"{name} - Chain {structure.chains[chain]}"
+                        ax.fill_between(numbers[rows], stats.min[rows], stats.max[rows],
+                                        color=color, alpha=0.2, linewidth=0)
+                        ax.plot(numbers[rows], stats.mean[rows], color=color, linewidth=1.5, label=label)
+                x_label = "Residue"
+            else:
+                per_sample = [(name, aggregate(xvg, path, level)) for name, xvg, path in samples]
+                categories = list(dict.fromkeys(label for _, stats in per_sample for label in stats.labels))
+                width = 0.8 / len(per_sample)
+                for i, (name, stats) in enumerate(per_sample):
+                    positions = np.array([categories.index(label) for label in stats.labels])
+                    color = self.custom_styles.get(name, {}).get('color', colors[i % len(colors)])
+                    ax.bar(positions + (i - (len(per_sample) - 1) / 2) * width, stats.mean, width,
+                           yerr=stats.std, capsize=3, color=color, label=name)
+                ax.set_xticks(range(len(categories)))
+                ax.set_xticklabels(categories)
+                x_label = level
+        except (OSError, ValueError) as e:
+            print(f"Error reading structure: {e}")
+            self.figure.clear()
+            return self.draw_message(self.figure.add_subplot(111), f"Error reading structure: {e}")
+
+        title = f"RMSF by {level.lower()} (mean{' and min-max' if level == RESIDUE else ' ± std'} of atoms)"
+        if missing:
+            title += f"\n{len(missing)} sample(s) without structure not shown"
+        self.decorate_axes(ax, title, x_label, "RMSF (nm)", legend=True)
+        self.figure.tight_layout()
+        self.show_load_errors(self.figure, xvg_files)
+        self.canvas.draw()
+
+    def plot_atom_track(self, xvg_files, figure, canvas, loading=False):
+        """Per-atom RMSF as a zoomable track
+
+        Every sample is drawn for the visible atom range only, min/max
+        decimated to TRACK_POINTS, and drawn again from the full arrays when
+        the range changes (toolbar zoom, or the mouse wheel), so full atom
+        detail only exists for what is on screen. A strip under the plot
+        shows the secondary structure of the visible atoms.
+        """
+        figure.clear()
+        grid = figure.add_gridspec(2, 1, height_ratios=[14, 1], hspace=0.05)
+        ax = figure.add_subplot(grid[0])
+        strip = figure.add_subplot(grid[1], sharex=ax)
+        ax.set_prop_cycle(self.color_cycle)
+        if figure is self.figure:
+            self.current_xvg_files = xvg_files
+        if not self.sample_visibility:
+            self.sample_visibility = {sample_name(xvg): True for xvg in xvg_files}
+
+        lines = []
+        structure = None
+        data = None
+        for i, xvg in enumerate(xvg_files):
+            name = sample_name(xvg)
+            if not os.path.exists(xvg) or not self.sample_visibility.get(name, True):
+                continue
+            if loading and not is_loaded(xvg):
+                continue  # Still being read; drawn on a later pass
+            sample = self.read_sample(xvg)
+            if sample is None or not len(sample.x):
+                continue
+            data = sample
+            style = self.series_style(name, i)
+            line = ax.plot([], [], label=name, linewidth=1.0, markersize=4, **style)[0]
+            lines.append((line, data.x, data.y, style['marker']))
+            if structure is None and structure_file(xvg):
+                try:
+                    structure = read_structure(structure_file(xvg))
+                except (OSError, ValueError) as e:
+                    print(f"Error reading structure: {e}")
 
-            elif opsisekarang == "Radius of gyration (total and around axes)":
-                list_data_xvg = [self.path_folder_kerja + "/gyration/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/gyration") if data1.endswith(".xvg")]
+        if not lines:
+            figure.clear()
+            ax = figure.add_subplot(111)
+            ax.text(0.5, 0.5, self.loading_text() if loading else "No samples selected for display",
+                    horizontalalignment='center', verticalalignment='center',
+                    transform=ax.transAxes, fontsize=14)
+            self.show_load_errors(figure, xvg_files)
+            canvas.draw()
+            return
+
+        low = min(x[0] for _, x, _, _ in lines)
+        high = max(x[-1] for _, x, _, _ in lines)
+        top = max(y.max() for _, _, y, _ in lines)
+        ax.set_xlim(low, max(high, low + 1))
+        ax.set_ylim(min(0.0, min(y.min() for _, _, y, _ in lines)), top * 1.05 if top > 0 else 1.0)
+        ax.set_autoscale_on(False)
+        strip.set_autoscale_on(False)
+        strip.set_yticks([])
+        ax.tick_params(labelbottom=False)
+
+        track = {"ax": ax, "strip": strip, "canvas": canvas, "lines": lines, "structure": structure,
+                 "image": None, "range": (low, max(high, low + 1))}
+        self.update_track(track)
+        ax.callbacks.connect('xlim_changed', lambda _: self.update_track(track))
+        if canvas in self.track_zoom:
+            canvas.mpl_disconnect(self.track_zoom[canvas])
+        self.track_zoom[canvas] = canvas.mpl_connect('scroll_event', lambda event: self.zoom_track(event, track))
+
+        title = data.title
+        if loading:
+            title = f"{title} ({self.loading_text()})"
+        self.decorate_axes(ax, title, "", data.y_label)
+        strip.set_xlabel(data.x_label, **self.axis_font)
+        handles = [line for line, _, _, _ in lines]
+        if structure is not None:
+            handles += [Patch(color=color, label=label)
+                        for color, label in zip(SECONDARY_COLORS[:3], SECONDARY_NAMES[:3])]
+        else:
+            strip.text(0.5, 0.5, "No structure file", horizontalalignment='center',
+                       verticalalignment='center', transform=strip.transAxes, fontsize=8)
+        if len(handles) > 1:
+            ax.legend(handles=handles, loc='best', frameon=True, fancybox=True, shadow=True, fontsize=10)
+        figure.tight_layout()
+        self.show_load_errors(figure, xvg_files)
+        canvas.draw()
+
+    def update_track(self, track):
+        """Draw the track lines and structure strip for the visible atom range"""
+        low, high = track["ax"].get_xlim()
+        for line, x, y, marker in track["lines"]:
+            xs, ys = visible_points(x, y, low, high, TRACK_POINTS)
+            line.set_data(xs, ys)
+            # Markers only once zoomed in far enough to see single atoms
+            line.set_marker(marker if marker and len(xs) < TRACK_POINTS else 'None')
+            line.set_markevery(max(1, len(xs) // 20))
+        if track["structure"] is not None:
+            codes = atom_secondary(track["structure"], np.rint(np.linspace(low, high, TRACK_POINTS)))
+            if track["image"] is None:
+                track["image"] = track["strip"].imshow(codes[None, :], aspect='auto', interpolation='nearest',
+                                                       cmap=ListedColormap(SECONDARY_COLORS), vmin=0,
+                                                       vmax=len(SECONDARY_COLORS) - 1, extent=(low, high, 0, 1))
+            else:
+                track["image"].set_data(codes[None, :])
+                track["image"].set_extent((low, high, 0, 1))
+
+    def zoom_track(self, event, track):
+        """Mouse wheel zooms the track around the cursor"""
+        if event.inaxes not in (track["ax"], track["strip"]) or event.xdata is None:
+            return
+        low, high = track["ax"].get_xlim()
+        full_low, full_high = track["range"]
+        factor = 0.8 if event.button == 'up' else 1.25
+        low = max(full_low, event.xdata - (event.xdata - low) * factor)
+        high = min(full_high, event.xdata + (high - event.xdata) * factor)
+        if high - low >= 2:
+            track["ax"].set_xlim(low, high)
+            track["canvas"].draw_idle()
+
+    def plot_dashboard(self, xvg_files):
+        """All analysis types as panels, drawn one at a time, cheapest first
+
+        The figure is only rebuilt when the set of files changes; toggling
+        samples or changing styles updates the lines already drawn.
+        """
+        self.current_xvg_files = xvg_files
+        panels = []
+        for label, subfolder, _ in ANALYSIS_TYPES:
+            files = [xvg for xvg in sorted(dataset_files(self.path_folder_kerja, subfolder)) if os.path.exists(xvg)]
+            if files:
+                panels.append((label, files))
+        all_files = [xvg for _, files in panels for xvg in files]
+        key = tuple((xvg, os.path.getsize(xvg), os.path.getmtime(xvg)) for xvg in all_files)
+
+        if self.dashboard is None or self.dashboard["key"] != key:
+            self.figure.clear()
+            if not panels:
+                self.dashboard = None
+                return self.draw_message(self.figure.add_subplot(111), "No analysis results found")
+            cols = 2 if len(panels) > 1 else 1
+            rows = int(np.ceil(len(panels) / cols))
+            axes = {}
+            for i, (label, _) in enumerate(panels):
+                ax = self.figure.add_subplot(rows, cols, i + 1)
+                ax.set_title(label, fontsize=10)
+                ax.text(0.5, 0.5, "Loading...", horizontalalignment='center', verticalalignment='center',
+                        transform=ax.transAxes, fontsize=10, color='gray')
+                ax.tick_params(axis='both', which='major', labelsize=8)
+                axes[label] = ax
+            self.figure.tight_layout()
+            self.canvas.draw_idle()
+            # Small files (cheap panels) first, so most of the dashboard appears at once
+            queue = sorted(panels, key=lambda panel: sum(os.path.getsize(xvg) for xvg in panel[1]))
+            self.dashboard = {"key": key, "axes": axes, "lines": {}, "queue": queue,
+                              "scheduled": False, "styled": None}
+        else:
+            self.restyle_dashboard()
+
+        # Data comes from the shared layer, read in the background
+        self.prefetch(all_files)
+        self.schedule_dashboard_panel()
+
+    def schedule_dashboard_panel(self, delay=0):
+        if self.dashboard and self.dashboard["queue"] and not self.dashboard["scheduled"]:
+            self.dashboard["scheduled"] = True
+            QTimer.singleShot(delay, self.draw_dashboard_panel)
+
+    def draw_dashboard_panel(self):
+        """Draw the cheapest panel whose files are loaded; one panel per event loop turn"""
+        dashboard = self.dashboard
+        if dashboard is None:
+            return
+        dashboard["scheduled"] = False
+        ready = [panel for panel in dashboard["queue"] if all(is_loaded(xvg) for xvg in panel[1])]
+        if not ready:
+            if dashboard["queue"] and not self.is_loading():
+                # Files outside the loader (e.g. failed to parse) are read here
+                ready = dashboard["queue"][:1]
+            else:
+                return self.schedule_dashboard_panel(100)
+        label, files = ready[0]
+        dashboard["queue"].remove(ready[0])
 
-            elif opsisekarang == "Hydrogen Bonds":
-                list_data_xvg = [self.path_folder_kerja + "/hbond/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/hbond") if data1.endswith(".xvg")]
+        ax = dashboard["axes"][label]
+        ax.clear()
+        ax.set_prop_cycle(self.color_cycle)
+        lines = {}
+        data = None
+        for i, xvg in enumerate(files):
+            name = sample_name(xvg)
+            sample = self.read_sample(xvg)
+            if sample is None or not len(sample.x):
+                continue
+            data = sample
+            style = self.series_style(name, i)
+            segments = split_segments(data.x, data.y) if data.title == "RMS fluctuation Residue" else [(data.x, data.y)]
+            lines[name] = [ax.plot(xs, ys, label=name, linewidth=1.0, markevery=max(1, len(xs) // 20),
+                                   markersize=3, **style)[0] for xs, ys in segments]
+        dashboard["lines"][label] = lines
+        ax.set_title(label, fontsize=10)
+        if data is not None:
+            ax.set_xlabel(data.x_label, fontsize=8)
+            ax.set_ylabel(data.y_label, fontsize=8)
+        ax.tick_params(axis='both', which='major', labelsize=8)
+        ax.grid(True, linestyle='--', alpha=0.7)
+        self.restyle_panel(label)
+        self.canvas.draw_idle()
 
-            elif opsisekarang == "Solvent Accessible Surface Area (SASA)":
-                list_data_xvg = [self.path_folder_kerja + "/sasa/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/sasa") if data1.endswith(".xvg")]
+        if dashboard["queue"]:
+            self.schedule_dashboard_panel()
+        else:
+            self.figure.tight_layout()
+            self.show_load_errors(self.figure, sorted(self.load_errors))
+            self.canvas.draw_idle()
+            dashboard["styled"] = self.dashboard_style_key()
+            self.view_ready.emit()
+
+    def dashboard_style_key(self):
+        return repr((sorted(self.sample_visibility.items()), sorted(self.custom_styles.items())))
 
-            elif opsisekarang == "RMSD Protein-Ligand":
-                list_data_xvg = [self.path_folder_kerja + "/rmsd_pro_lig/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/rmsd_pro_lig") if data1.endswith(".xvg")]
+    def restyle_panel(self, label):
+        """Apply sample visibility and custom styles to the lines of one panel"""
+        ax = self.dashboard["axes"][label]
+        handles = []
+        for i, (name, artists) in enumerate(self.dashboard["lines"][label].items()):
+            visible = self.sample_visibility.get(name, True)
+            style = self.series_style(name, i)
+            for line in artists:
+                line.set_visible(visible)
+                line.set_linestyle(style['linestyle'] or 'None')
+                line.set_marker(style['marker'] or 'None')
+                if 'color' in style:
+                    line.set_color(style['color'])
+            if visible and artists:
+                handles.append(artists[0])
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if 1 < len(handles) <= 12:
+            ax.legend(handles=handles, loc='best', fontsize=7)
+
+    def restyle_dashboard(self):
+        """Incremental redraw after samples were toggled or restyled"""
+        key = self.dashboard_style_key()
+        if key == self.dashboard["styled"]:
+            return
+        for label in self.dashboard["lines"]:
+            self.restyle_panel(label)
+        self.dashboard["styled"] = key
+        self.canvas.draw_idle()
 
-            elif opsisekarang == "RMS fluctuation Atom (RMSF atom)":
-                list_data_xvg = [self.path_folder_kerja + "/rmsf_atom/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/rmsf_atom") if data1.endswith(".xvg")]
+    def thumbnail_style(self, label, i):
+        """Plain style dict (colour and line style) for rendering a thumbnail"""
+        if label in self.custom_styles:
+            return dict(self.custom_styles[label])
+        colors = self.color_cycle.by_key()['color']
+        return {'line_style': '-', 'color': colors[i % len(colors)]}
 
-            elif opsisekarang == "RMS fluctuation Residue (RMSF Residue)":
-                list_data_xvg = [self.path_folder_kerja + "/rmsf_rec/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/rmsf_rec") if data1.endswith(".xvg")]
+    def show_grid(self):
+        """Open the small-multiples grid for the visible samples
+
+        With several samples there is one panel per sample for the current
+        analysis type; with a single sample there is one panel per analysis type.
+        """
+        visible = [(i, xvg) for i, xvg in enumerate(self.current_xvg_files)
+                   if self.sample_visibility.get(sample_name(xvg), True)]
+        if not visible:
+            QMessageBox.warning(self, "No Data", "No samples selected for display")
+            return
+
+        if len(visible) > 1:
+            items = [(xvg, sample_name(xvg), self.thumbnail_style(sample_name(xvg), i)) for i, xvg in visible]
+            title = f"{self.comboBox.currentText()} - {len(items)} samples"
+        else:
+            i, xvg = visible[0]
+            sample = sample_name(xvg)
+            # In a single analysed folder the files are named after the
+            # analysis (rmsd.xvg, gyration.xvg), so each subfolder's one file
+            # is taken; in a comparison folder the sample's own files
+            single = os.path.basename(xvg) in {filename for _, _, filename in ANALYSIS_TYPES}
+            items = []
+            for type_label, subfolder, _ in ANALYSIS_TYPES:
+                files = dataset_files(self.path_folder_kerja, subfolder)
+                matches = [path for path in files if sample_name(path) == sample]
+                if single and not matches and len(files) == 1:
+                    matches = files
+                items.extend((path, type_label, self.thumbnail_style(sample, i)) for path in matches)
+            if single:
+                sample = os.path.basename(os.path.normpath(self.path_folder_kerja))
+            title = f"{sample} - all analyses"
+
+        self.grid_dialog = ThumbnailGridDialog(items, title, self)
+        self.grid_dialog.thumbnail_activated.connect(self.open_full_plot)
+        self.grid_dialog.show()
+
+    def open_full_plot(self, xvg):
+        """Open one sample in its own window with the interactive toolbar"""
+        window = QMainWindow(self)
+        window.setWindowTitle(f"{sample_name(xvg)} - {os.path.basename(os.path.dirname(xvg))}")
+        figure = Figure(figsize=(6, 4), dpi=120)
+        canvas = FigureCanvas(figure)
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        layout.addWidget(NavigationToolbar(canvas, window))
+        layout.addWidget(canvas)
+        window.setCentralWidget(central)
+        self.plot_data([xvg], figure=figure, canvas=canvas)
+        window.resize(900, 700)
+        window.show()
+
+    def combo_berubah(self):
+        try:
+            subfolder = subfolder_for(self.comboBox.currentText())
+            list_data_xvg = dataset_files(self.path_folder_kerja, subfolder) if subfolder else []
 
             # Store current xvg files before plotting
             self.current_xvg_files = list_data_xvg
             
             # Make sure sample visibility is maintained across different data types
             # by using the same sample names (folder names)
-            samples = [os.path.basename(xvg).split('.')[0] for xvg in list_data_xvg]
-            for sample in samples:
+            for sample in [sample_name(xvg) for xvg in list_data_xvg]:
                 if sample not in self.sample_visibility:
                     self.sample_visibility[sample] = True
             
@@ -665,125 +1645,62 @@ class Analisis_Gromacs(QtWidgets.QWidget):
             pass
 
     def analisis(self):
+        self.jalankan_analisis(self.reduced_checkbox.isChecked())
+
+    def lanjutkan_analisis(self):
+        """Resume or retry in the mode of the journaled run, not the (hidden) checkbox"""
+        reduced = journal_reduced(self.path_folder_kerja)
+        self.jalankan_analisis(self.reduced_checkbox.isChecked() if reduced is None else reduced)
+
+    def jalankan_analisis(self, reduced):
         path_gmx = f'{str(self.path_icon)}/gromacs/bin/gmx'
         path_kerja = f'{self.path_folder_kerja}'
 
-        try:
-            os.mkdir(f'{path_kerja}/RMSD')
-        except:
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/gyration')
-        except: 
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/hbond')
-        except:
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/sasa')
-        except:
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/rmsd_pro_lig')
-        except:
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/rmsf_atom')
-        except:
-            pass
-        try:
-            os.mkdir(f'{path_kerja}/rmsf_rec')
-        except:
-            pass
+        # Steps already finished by an earlier (interrupted) run are skipped
+        pipeline = AnalysisPipeline(path_kerja, path_gmx, reduced=reduced)
+        pipeline.prepare()
+        total = len(pipeline.steps)
 
         # Show a progress dialog
-        progress = QProgressDialog("Melakukan analisis...", "Batal", 0, 8, self)
+        progress = QProgressDialog("Melakukan analisis...", "Batal", 0, total, self)
         progress.setWindowTitle("Analisis GROMACS")
         progress.setWindowModality(Qt.WindowModal)
         progress.show()
         QApplication.processEvents()
 
-        # Buat Analisis
-        progress.setValue(1)
-        progress.setLabelText("Mengkonversi trajectory...")
-        QApplication.processEvents()
-        perintah_1 = [f'{path_gmx}', 'trjconv', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/step5_1.xtc', '-o', f'{path_kerja}/analisis.xtc', '-pbc', 'mol', '-ur', 'compact']
-        p1 = subprocess.Popen(perintah_1, stdin=subprocess.PIPE)
-        p1.communicate(input=b'0\n')
-
-        # Buat RMSD
-        progress.setValue(2)
-        progress.setLabelText("Menghitung RMSD...")
-        QApplication.processEvents()
-        perintah_2 = [f'{path_gmx}', 'rms', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/analisis.xtc', '-o', f'{path_kerja}/RMSD/rmsd.xvg', '-tu', 'ns']
-        p2 = subprocess.Popen(perintah_2, stdin=subprocess.PIPE)
-        p2.communicate(input=b'4\n4\n')
-
-        # Buat RMSD Protein-Ligan
-        progress.setValue(3)
-        progress.setLabelText("Menghitung RMSD Protein-Ligand...")
-        QApplication.processEvents()
-        perintah_3 = [f'{path_gmx}', 'rms', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/analisis.xtc', '-o', f'{path_kerja}/rmsd_pro_lig/rmsd_pro_lig.xvg', '-tu', 'ns']
-        p3 = subprocess.Popen(perintah_3, stdin=subprocess.PIPE)
-        p3.communicate(input=b'1\n13\n')
-
-        # Buat RMSF
-        progress.setValue(4)
-        progress.setLabelText("Menghitung RMSF Atom...")
-        QApplication.processEvents()
-        perintah_4 = [f'{path_gmx}', 'rmsf', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/analisis.xtc', '-o', f'{path_kerja}/rmsf_atom/rmsf_atom.xvg']
-        p4 = subprocess.Popen(perintah_4, stdin=subprocess.PIPE)
-        p4.communicate(input=b'4\n')
-
-        # Buat RMSF Reseptor
-        progress.setValue(5)
-        progress.setLabelText("Menghitung RMSF Residu...")
-        QApplication.processEvents()
-        perintah_5 = [f'{path_gmx}', 'rmsf', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/analisis.xtc', '-res', '-o', f'{path_kerja}/rmsf_rec/rmsf_rec.xvg']
-        p5 = subprocess.Popen(perintah_5, stdin=subprocess.PIPE)
-        p5.communicate(input=b'4\n')
-
-        # Buat Gyration
-        progress.setValue(6)
-        progress.setLabelText("Menghitung Radius of Gyration...")
-        QApplication.processEvents()
-        perintah_6 = [f'{path_gmx}', 'gyrate', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/step5_1.xtc', '-o', f'{path_kerja}/gyration/gyration.xvg']
-        p6 = subprocess.Popen(perintah_6, stdin=subprocess.PIPE)
-        p6.communicate(input=b'4\n')
-
-        # Buat SASA
-        progress.setValue(7)
-        progress.setLabelText("Menghitung SASA...")
-        QApplication.processEvents()
-        perintah_7 = [f'{path_gmx}', 'sasa', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/step5_1.xtc', '-o', f'{path_kerja}/sasa/sasa.xvg']
-        p7 = subprocess.Popen(perintah_7, stdin=subprocess.PIPE)
-        p7.communicate(input=b'4\n')
-
-        # Buat H-Bond
-        progress.setValue(8)
-        progress.setLabelText("Menghitung Hydrogen Bonds...")
-        QApplication.processEvents()
-        perintah_8 = [f'{path_gmx}', 'hbond', '-s', f'{path_kerja}/step5_1.tpr', '-f', f'{path_kerja}/step5_1.xtc', '-num', f'{path_kerja}/hbond/hbond.xvg']
-        p8 = subprocess.Popen(perintah_8, stdin=subprocess.PIPE)
-        p8.communicate(input=b'1\n13\n')
+        # Independent steps run concurrently in a worker thread (each gmx
+        # process gets its share of the cores); the GUI polls the journal.
+        hasil = {}
+        worker = threading.Thread(target=lambda: hasil.update(berhasil=pipeline.run()), daemon=True)
+        worker.start()
+        while worker.is_alive():
+            if progress.wasCanceled():
+                pipeline.cancel()
+            selesai = total - len(pipeline.pending_steps())
+            berjalan = pipeline.running_steps()
+            progress.setValue(min(selesai, total - 1))
+            if berjalan:
+                progress.setLabelText("\n".join(step.label for step in berjalan))
+            QApplication.processEvents()
+            worker.join(0.05)
+        berhasil = hasil.get("berhasil", False)
 
         progress.close()
 
-        if p1.returncode == 0 and p2.returncode == 0 and p3.returncode == 0 and p4.returncode == 0 and p5.returncode == 0 and p6.returncode == 0 and p7.returncode == 0 and p8.returncode == 0:
-            self.pushButton.hide()
-            self.pushButton_2.show()
-            self.customize_button.show()
-            self.select_samples_button.show()
+        if berhasil or os.path.exists(self.path_folder_kerja + "/RMSD"):
+            self.show_result_controls(True)
             
-            xvg_files = [self.path_folder_kerja + "/RMSD/" + data1 for data1 in os.listdir(self.path_folder_kerja + "/RMSD") if data1.endswith(".xvg")]
+            xvg_files = dataset_files(self.path_folder_kerja, "RMSD")
             self.current_xvg_files = xvg_files
             
             # Initialize all samples as visible
-            samples = [os.path.basename(xvg).split('.')[0] for xvg in xvg_files]
+            samples = [sample_name(xvg) for xvg in xvg_files]
             self.sample_visibility = {sample: True for sample in samples}
             
             self.plot_data(xvg_files)
+        if berhasil:
             QMessageBox.information(self, "Sukses", "Analisis selesai dan berhasil!")
         else:
-            QMessageBox.warning(self, "Error", "Terjadi kesalahan saat melakukan analisis!")
\ No newline at end of file
+            failed = [step.name for step in pipeline.pending_steps()]
+            QMessageBox.warning(self, "Error", "Terjadi kesalahan saat melakukan analisis!\n"
+                                f"Langkah belum selesai: {', '.join(failed)} (lihat folder logs)")
\ No newline at end of file
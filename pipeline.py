@@ -0,0 +1,620 @@
+"""GROMACS analysis pipeline with a per-step on-disk journal.
+
+`analisis` runs nine gmx steps. Each run records the state of every step
+(pending/running/done/failed/skipped, output, log, return code) in
+`analisis_journal.json` inside the working folder, so a run that was closed
+or crashed resumes from the first unfinished step.
+
+Outputs are written atomically: gmx writes into `.partial/` and the file is
+moved into place with os.replace only after the step succeeded. A partially
+written .xvg therefore never appears in the folders the plotter reads.
+
+In reduced-system mode (setting `reduced_system`) the trajectory is first
+written once as a PBC-corrected protein+ligand-only `reduced/reduced.xtc`
+with a matching `reduced/reduced.tpr` and index, and every analysis step
+reads those instead of the full solvated system. The reduced files are
+journaled like any other output, so re-runs reuse them.
+
+Step outputs are also stored in the content-addressed ResultCache, so a
+folder whose inputs are identical to an already analysed one (a duplicate
+or the same replica under another path) gets its results without running
+gmx.
+
+With a scratch directory configured (setting `scratch_dir`, see
+scratch.py) the intermediate trajectory written by `trjconv` goes there
+instead of the working folder and is removed once every step reading it
+has finished. A removed intermediate still counts as done; it is only
+written again when a step that reads it has to run again.
+
+With `trajectory_engine` set to "inprocess" (and mdtraj installed) the
+RMSD, RMSF and Rg steps are computed by trajectory.py in one pass over the
+trajectory instead of five gmx passes. They stay separate journal entries:
+the first of them to run computes every pending one, and the others pick
+up their outputs. Their atoms are the default index groups of the .tpr
+(written by `gmx make_ndx`) with the numbers the gmx steps select.
+"""
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import settings
+from resources import default_allocator, pin_to, thread_args, thread_env
+from result_cache import ResultCache
+from scratch import default_scratch
+from trajectory import ENGINE, ENGINE_VERSION, analyse, engine_available
+
+JOURNAL_NAME = "analisis_journal.json"
+JOURNAL_VERSION = 1
+PARTIAL_DIR = ".partial"
+LOG_DIR = "logs"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# Not run because a step producing one of its inputs failed
+SKIPPED = "skipped"
+
+# name: journal key; label: progress text; args: gmx arguments where {tpr},
+# {xtc} (trajectory), {traj} (PBC-corrected trajectory), {tpr_full},
+# {xtc_full} (the simulation inputs), {ndx}, {select} and {out} are filled
+# in; stdin: group selections; output: path relative to the folder
+Step = namedtuple("Step", ["name", "label", "args", "stdin", "output"])
+
+STEPS = [
+    Step("trjconv", "Mengkonversi trajectory...",
+         ['trjconv', '-s', '{tpr}', '-f', '{xtc}', '-o', '{out}', '-pbc', 'mol', '-ur', 'compact'],
+         b'0\n', "analisis.xtc"),
+    # Atom -> residue/chain mapping for the per-atom RMSF (see topology.py),
+    # also the reference structure of the in-process engine
+    Step("structure", "Menulis struktur (PDB)...",
+         ['editconf', '-f', '{tpr}', '-o', '{out}'],
+         None, "structure/structure.pdb"),
+    Step("rmsd", "Menghitung RMSD...",
+         ['rms', '-s', '{tpr}', '-f', '{traj}', '-o', '{out}', '-tu', 'ns'],
+         b'4\n4\n', "RMSD/rmsd.xvg"),
+    Step("rmsd_pro_lig", "Menghitung RMSD Protein-Ligand...",
+         ['rms', '-s', '{tpr}', '-f', '{traj}', '-o', '{out}', '-tu', 'ns'],
+         b'1\n13\n', "rmsd_pro_lig/rmsd_pro_lig.xvg"),
+    Step("rmsf_atom", "Menghitung RMSF Atom...",
+         ['rmsf', '-s', '{tpr}', '-f', '{traj}', '-o', '{out}'],
+         b'4\n', "rmsf_atom/rmsf_atom.xvg"),
+    Step("rmsf_rec", "Menghitung RMSF Residu...",
+         ['rmsf', '-s', '{tpr}', '-f', '{traj}', '-res', '-o', '{out}'],
+         b'4\n', "rmsf_rec/rmsf_rec.xvg"),
+    Step("gyration", "Menghitung Radius of Gyration...",
+         ['gyrate', '-s', '{tpr}', '-f', '{xtc}', '-o', '{out}'],
+         b'4\n', "gyration/gyration.xvg"),
+    Step("sasa", "Menghitung SASA...",
+         ['sasa', '-s', '{tpr}', '-f', '{xtc}', '-o', '{out}'],
+         b'4\n', "sasa/sasa.xvg"),
+    Step("hbond", "Menghitung Hydrogen Bonds...",
+         ['hbond', '-s', '{tpr}', '-f', '{xtc}', '-num', '{out}'],
+         b'1\n13\n', "hbond/hbond.xvg"),
+]
+
+
+# Reduced-system preprocessing; replaces the full-system trjconv step
+REDUCE_STEPS = [
+    Step("reduce_index", "Membuat index protein-ligand...",
+         ['select', '-s', '{tpr_full}', '-select', '{select}', '-on', '{out}'],
+         None, "reduced/reduced.ndx"),
+    Step("reduce_tpr", "Membuat tpr protein-ligand...",
+         ['convert-tpr', '-s', '{tpr_full}', '-n', '{ndx}', '-o', '{out}'],
+         b'0\n', "reduced/reduced.tpr"),
+    Step("trjconv", "Mengkonversi trajectory (protein-ligand)...",
+         ['trjconv', '-s', '{tpr_full}', '-f', '{xtc_full}', '-n', '{ndx}', '-o', '{out}', '-pbc', 'mol', '-ur', 'compact'],
+         b'0\n', "reduced/reduced.xtc"),
+]
+
+
+# Steps computed by the in-process engine instead of gmx (setting
+# `trajectory_engine`): all of them in one pass over {traj}, see trajectory.py
+ENGINE_STEPS = ("rmsd", "rmsd_pro_lig", "rmsf_atom", "rmsf_rec", "gyration")
+
+# The default index groups of {tpr}, so the engine selects the same atoms as
+# the stdin group numbers of the gmx steps it replaces
+ENGINE_INDEX = Step("engine_index", "Membuat index engine...",
+                    ['make_ndx', '-f', '{tpr}', '-o', '{out}'],
+                    b'q\n', "engine/engine.ndx")
+
+
+def stdin_groups(name):
+    """Group numbers a gmx step selects on stdin"""
+    step = next(step for step in STEPS if step.name == name)
+    return [int(group) for group in step.stdin.split()]
+
+
+# Engine group: default index group number, as selected by the gmx steps
+ENGINE_GROUPS = {
+    "backbone": stdin_groups("rmsd")[0],
+    "protein": stdin_groups("rmsd_pro_lig")[0],
+    "ligand": stdin_groups("rmsd_pro_lig")[1],
+}
+
+
+# Placeholders that name files a step reads (part of its cache key)
+INPUT_PLACEHOLDERS = ("tpr", "xtc", "traj", "tpr_full", "xtc_full", "ndx", "structure", "engine_ndx")
+
+# Steps whose output is an intermediate trajectory that only later steps read
+SCRATCH_STEPS = ("trjconv",)
+
+
+def placeholders(step):
+    """Names of the placeholders used in a step's arguments"""
+    return set(re.findall(r"{(\w+)}", " ".join(step.args)))
+
+
+def engine_step(step):
+    """The in-process engine version of a step: reads the trajectory, the structure and the index"""
+    return step._replace(args=[ENGINE, '-s', '{structure}', '-n', '{engine_ndx}', '-f', '{traj}', '-o', '{out}'],
+                         stdin=None)
+
+
+def build_steps(reduced=False, engine=False):
+    """Steps for a full-system run, or with the reduced-system preprocessing"""
+    steps = list(STEPS) if not reduced else REDUCE_STEPS + [step for step in STEPS if step.name != "trjconv"]
+    if engine:
+        steps = [engine_step(step) if step.name in ENGINE_STEPS else step for step in steps]
+        steps.insert(next(i for i, step in enumerate(steps) if step.name == "structure") + 1, ENGINE_INDEX)
+    return steps
+
+
+def write_atomic(path, text):
+    """Write a text file via a temporary file and rename"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def read_journal(path_kerja):
+    """The folder's journal as a dict, {} without a readable one"""
+    path = os.path.join(path_kerja, JOURNAL_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def journal_steps(path_kerja):
+    """{step name: journal entry} of the folder's journal, {} without one"""
+    return read_journal(path_kerja).get("steps", {})
+
+
+def journal_reduced(path_kerja):
+    """True/False if the journal's run was in reduced/full mode, None without a journal"""
+    mode = read_journal(path_kerja).get("inputs", {}).get("mode")
+    return None if mode is None else mode == "reduced"
+
+
+def needs_resume(path_kerja):
+    """True if an interrupted run left steps running or pending in the journal"""
+    return any(entry.get("state") in (RUNNING, PENDING) for entry in journal_steps(path_kerja).values())
+
+
+def failed_steps(path_kerja):
+    """Names of the steps whose last run failed"""
+    return [name for name, entry in journal_steps(path_kerja).items() if entry.get("state") == FAILED]
+
+
+def input_fingerprint(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Journal:
+    """Per-folder record of step states, rewritten atomically on every change"""
+
+    def __init__(self, path_kerja, steps):
+        self.path = os.path.join(path_kerja, JOURNAL_NAME)
+        self.lock = threading.RLock()
+        self.data = {"version": JOURNAL_VERSION, "inputs": {}, "steps": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == JOURNAL_VERSION:
+                    self.data = loaded
+            except (OSError, ValueError) as e:
+                print(f"Error reading journal {self.path}: {e}")
+        for step in steps:
+            self.data["steps"].setdefault(step.name, {"state": PENDING, "output": step.output})
+
+    def state(self, name):
+        return self.data["steps"][name]["state"]
+
+    def update(self, name, **fields):
+        with self.lock:
+            self.data["steps"][name].update(fields)
+            self.save()
+
+    def reset(self, inputs, steps):
+        """Mark every step pending (the simulation inputs changed)"""
+        with self.lock:
+            self.data["inputs"] = inputs
+            self.data["steps"] = {step.name: {"state": PENDING, "output": step.output} for step in steps}
+            self.save()
+
+    def save(self):
+        with self.lock:
+            write_atomic(self.path, json.dumps(self.data, indent=2))
+
+
+class AnalysisPipeline:
+    """Runs the gmx steps for one working folder, resuming from the journal"""
+
+    def __init__(self, path_kerja, path_gmx, reduced=None, cache=None, allocator=None, scratch=None, engine=None):
+        self.path_kerja = path_kerja
+        self.path_gmx = path_gmx
+        self.allocator = allocator or default_allocator()
+        self.scratch = scratch or default_scratch()
+        self.cancelled = False
+        self.reduced = settings.get("reduced_system") if reduced is None else reduced
+        self.engine = settings.get("trajectory_engine") == "inprocess" if engine is None else engine
+        if self.engine and not engine_available():
+            print("Error: the in-process engine needs mdtraj (pip install mdtraj); using gmx")
+            self.engine = False
+        # Outputs of the engine's single pass, waiting to be claimed by their steps
+        self.engine_lock = threading.Lock()
+        self.engine_outputs = {}
+        self.engine_log = None
+        if cache is None and settings.get("result_cache"):
+            try:
+                cache = ResultCache()
+            except OSError as e:
+                print(f"Error opening result cache: {e}")
+        self.cache = cache
+        self.steps = build_steps(self.reduced, self.engine)
+        self.journal = Journal(path_kerja, self.steps)
+
+    def prepare(self):
+        """Create output folders and invalidate the journal if the inputs changed"""
+        for step in self.steps:
+            os.makedirs(os.path.dirname(os.path.join(self.path_kerja, step.output)), exist_ok=True)
+        os.makedirs(os.path.join(self.path_kerja, PARTIAL_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.path_kerja, LOG_DIR), exist_ok=True)
+
+        inputs = {name: input_fingerprint(os.path.join(self.path_kerja, name))
+                  for name in ("step5_1.tpr", "step5_1.xtc")}
+        # Switching between full and reduced mode (or to the engine) changes every step's inputs
+        inputs["mode"] = "reduced" if self.reduced else "full"
+        if self.engine:
+            inputs["engine"] = ENGINE
+        if self.journal.data.get("inputs") != inputs:
+            self.journal.reset(inputs, self.steps)
+
+    def step_named(self, name):
+        return next(step for step in self.steps if step.name == name)
+
+    def output_path(self, step):
+        """Where a step's output is (once done) or will be written"""
+        entry = self.journal.data["steps"][step.name]
+        if entry["state"] == DONE:
+            return entry.get("path") or os.path.join(self.path_kerja, step.output)
+        if self.scratch is not None and step.name in SCRATCH_STEPS:
+            return self.scratch.path_for(self.path_kerja, step.output)
+        return os.path.join(self.path_kerja, step.output)
+
+    def in_scratch(self, path):
+        return (self.scratch is not None
+                and os.path.abspath(path).startswith(os.path.abspath(self.scratch.root) + os.sep))
+
+    def is_done(self, step):
+        """Recorded as done with its output in place; a consumed intermediate may be gone"""
+        entry = self.journal.data["steps"][step.name]
+        return (entry["state"] == DONE and entry.get("output") == step.output
+                and (step.name in SCRATCH_STEPS or os.path.exists(self.output_path(step))))
+
+    def pending_steps(self):
+        """Steps whose output is not recorded as done (or has since been deleted)
+
+        An intermediate that was already cleaned up is pending again when a
+        step reading it has to run.
+        """
+        pending = {step.name for step in self.steps if not self.is_done(step)}
+        deps = self.dependencies()
+        needed = set()
+        for name in pending:
+            needed |= deps[name]
+        return [step for step in self.steps
+                if step.name in pending or (step.name in needed and not os.path.exists(self.output_path(step)))]
+
+    def paths(self):
+        """Input paths used to fill in the step arguments"""
+        folder = self.path_kerja
+        paths = {
+            "tpr_full": os.path.join(folder, "step5_1.tpr"),
+            "xtc_full": os.path.join(folder, "step5_1.xtc"),
+            "ndx": os.path.join(folder, "reduced", "reduced.ndx"),
+            "select": " or ".join(f"group {group}" for group in settings.get("reduced_groups")),
+            "structure": self.output_path(self.step_named("structure")),
+            "engine_ndx": os.path.join(folder, ENGINE_INDEX.output),
+        }
+        if self.reduced:
+            # Default groups of the reduced .tpr keep their numbers (Protein,
+            # Backbone, then the ligand) because only water and ions after
+            # them are removed, so the stdin selections stay valid.
+            traj = self.output_path(self.step_named("trjconv"))
+            paths.update(tpr=os.path.join(folder, "reduced", "reduced.tpr"), xtc=traj, traj=traj)
+        else:
+            paths.update(tpr=paths["tpr_full"], xtc=paths["xtc_full"],
+                         traj=self.output_path(self.step_named("trjconv")))
+        return paths
+
+    def command(self, step, out_path):
+        paths = dict(self.paths(), out=out_path)
+        return [self.path_gmx] + [arg.format(**paths) for arg in step.args]
+
+    def cache_key(self, step):
+        """Content hash of the step's inputs, arguments and stdin, or None if an input is missing"""
+        paths = self.paths()
+        used = placeholders(step)
+        inputs = {name: paths[name] for name in INPUT_PLACEHOLDERS if name in used}
+        if not all(os.path.exists(path) for path in inputs.values()):
+            return None
+        if step.args[0] == ENGINE:
+            # Every engine step has the same arguments; its name tells them apart
+            return self.cache.key(step.args, step.stdin, inputs,
+                                  {"engine": [ENGINE_VERSION, step.name], "groups": ENGINE_GROUPS})
+        gmx = os.stat(self.path_gmx) if os.path.exists(self.path_gmx) else None
+        extra = {
+            "select": paths["select"] if "select" in used else None,
+            "gmx": [os.path.basename(self.path_gmx), gmx.st_size if gmx else None],
+        }
+        return self.cache.key(step.args, step.stdin, inputs, extra)
+
+    def dependencies(self):
+        """{step name: names of the steps producing the files it reads}"""
+        paths = self.paths()
+        producers = {os.path.normpath(self.output_path(step)): step.name for step in self.steps}
+        deps = {}
+        for step in self.steps:
+            reads = {os.path.normpath(paths[name]) for name in placeholders(step) if name in INPUT_PLACEHOLDERS}
+            deps[step.name] = {producers[path] for path in reads if path in producers} - {step.name}
+        return deps
+
+    def running_steps(self):
+        return [step for step in self.steps if self.journal.state(step.name) == RUNNING]
+
+    def cancel(self):
+        """Start no new steps; steps already running finish normally"""
+        self.cancelled = True
+
+    def run_step(self, step):
+        """Run one step into .partial/ and move its output into place on success"""
+        try:
+            return self.execute_step(step)
+        finally:
+            self.release_intermediates()
+
+    def execute_step(self, step):
+        final_path = self.output_path(step)
+        filename = os.path.basename(step.output)
+        work_dir = self.path_kerja
+
+        in_scratch = self.in_scratch(final_path)
+        if in_scratch:
+            # The intermediate is at most as large as the input trajectory
+            xtc_full = self.paths()["xtc_full"]
+            expected = os.path.getsize(xtc_full) if os.path.exists(xtc_full) else 0
+            scratch_dir = self.scratch.folder(self.path_kerja)
+            if self.scratch.reserve(final_path, expected, os.path.join(scratch_dir, PARTIAL_DIR, filename)):
+                work_dir = scratch_dir
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.makedirs(os.path.join(work_dir, PARTIAL_DIR), exist_ok=True)
+            else:
+                print(f"Scratch budget exceeded, writing {step.output} to {self.path_kerja}")
+                final_path = os.path.join(self.path_kerja, step.output)
+                in_scratch = False
+
+        key = None
+        # Intermediates in scratch are not copied back into the shared cache
+        if self.cache is not None and not in_scratch:
+            try:
+                key = self.cache_key(step)
+                if key and self.cache.fetch(key, filename, final_path):
+                    self.journal.update(step.name, state=DONE, output=step.output, returncode=0,
+                                        cached=key, path=None, finished=time.time())
+                    return True
+            except OSError as e:
+                print(f"Error reading result cache for {step.name}: {e}")
+                key = None
+
+        partial_path = os.path.join(work_dir, PARTIAL_DIR, filename)
+        log_path = os.path.join(self.path_kerja, LOG_DIR, f"{step.name}.log")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+        if step.args[0] == ENGINE:
+            returncode = self.run_engine(step, partial_path, log_path)
+        else:
+            returncode = self.run_gmx(step, partial_path, log_path)
+
+        if returncode == 0 and os.path.exists(partial_path):
+            os.replace(partial_path, final_path)
+            if in_scratch:
+                self.scratch.finish(final_path)
+            self.journal.update(step.name, state=DONE, returncode=0, cached=None,
+                                path=final_path if in_scratch else None, finished=time.time())
+            if key:
+                try:
+                    self.cache.store(key, final_path, filename)
+                except OSError as e:
+                    print(f"Error storing {step.name} in result cache: {e}")
+            return True
+
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        if in_scratch:
+            self.scratch.release(final_path)
+        self.journal.update(step.name, state=FAILED, returncode=returncode, finished=time.time())
+        return False
+
+    def run_gmx(self, step, partial_path, log_path):
+        """Run the step's gmx command; returns its exit code"""
+        # Blocks until the shared allocator has a free core for this process
+        grant = self.allocator.acquire(step.name)
+        self.journal.update(step.name, state=RUNNING, output=step.output, started=time.time(),
+                            threads=grant.threads, log=os.path.relpath(log_path, self.path_kerja))
+        env = thread_env(grant, dict(os.environ, GMX_MAXBACKUP="-1"))
+        try:
+            with open(log_path, "wb") as log:
+                command = pin_to(grant) + self.command(step, partial_path) + thread_args(step.name, grant)
+                result = subprocess.run(command, input=step.stdin, stdout=log, stderr=subprocess.STDOUT,
+                                        env=env)
+            return result.returncode
+        except OSError as e:
+            print(f"Error running {step.name}: {e}")
+            return -1
+        finally:
+            self.allocator.release(grant)
+
+    def run_engine(self, step, partial_path, log_path):
+        """Produce an engine step's output; the first engine step computes all of them
+
+        The single pass writes the outputs of every pending engine step into
+        .partial/engine/; each step then moves its own file to `partial_path`.
+        """
+        self.journal.update(step.name, state=RUNNING, output=step.output, started=time.time(),
+                            threads=1, log=os.path.relpath(log_path, self.path_kerja))
+        with self.engine_lock:
+            if step.name not in self.engine_outputs:
+                names = {s.name for s in self.pending_steps() if s.args[0] == ENGINE} | {step.name}
+                engine_dir = os.path.join(self.path_kerja, PARTIAL_DIR, ENGINE)
+                os.makedirs(engine_dir, exist_ok=True)
+                outputs = {name: os.path.join(engine_dir, os.path.basename(self.step_named(name).output))
+                           for name in names}
+                paths = self.paths()
+                grant = self.allocator.acquire(ENGINE)
+                try:
+                    with open(log_path, "w") as log:
+                        written = analyse(paths["structure"], paths["engine_ndx"], ENGINE_GROUPS, paths["traj"],
+                                          outputs, log=log)
+                    self.engine_outputs.update({name: outputs[name] for name in written})
+                except Exception as e:
+                    print(f"Error running {ENGINE}: {e}")
+                    with open(log_path, "a") as log:
+                        log.write(f"Error: {e}\n")
+                finally:
+                    self.allocator.release(grant)
+                # Steps without an output (e.g. no ligand) fail instead of recomputing
+                for name in names:
+                    self.engine_outputs.setdefault(name, None)
+                self.engine_log = log_path
+            elif self.engine_log != log_path:
+                with open(log_path, "w") as log:
+                    log.write(f"Computed in the engine pass logged in {os.path.relpath(self.engine_log, self.path_kerja)}\n")
+            source = self.engine_outputs.pop(step.name)
+        if source is None or not os.path.exists(source):
+            return 1
+        os.replace(source, partial_path)
+        return 0
+
+    def release_intermediates(self, final=False):
+        """Remove intermediates in scratch once every step reading them is done
+
+        With `final` (the run is over) unfinished readers no longer hold the
+        intermediate either; it stays on disk for resuming but may be evicted.
+        """
+        if self.scratch is None:
+            return
+        deps = self.dependencies()
+        for step in self.steps:
+            path = self.output_path(step)
+            if step.name not in SCRATCH_STEPS or not self.in_scratch(path) or not self.is_done(step):
+                continue
+            readers = [self.step_named(name) for name, reads in deps.items() if step.name in reads]
+            if all(self.is_done(reader) for reader in readers):
+                try:
+                    self.scratch.release(path, delete=True)
+                except OSError as e:
+                    print(f"Error removing intermediate {path}: {e}")
+            elif final:
+                self.scratch.release(path)
+
+    def run(self, on_step=None, parallel=None):
+        """Run all unfinished steps
+
+        Steps whose inputs are ready run concurrently (setting
+        `parallel_steps`), each with the cores granted by the allocator;
+        otherwise they run one after another in order. `on_step(index, step)`
+        is called before a step starts; returning False (or calling cancel())
+        stops starting new steps while the journal keeps what finished.
+        Returns True when every step is done.
+        """
+        self.prepare()
+        self.cancelled = False
+        if self.scratch is not None:
+            # Intermediates kept from an earlier run must not be evicted while read
+            for step in self.steps:
+                path = self.output_path(step)
+                if step.name in SCRATCH_STEPS and self.in_scratch(path) and os.path.exists(path):
+                    self.scratch.use(path)
+        try:
+            return self.run_steps(on_step, parallel)
+        finally:
+            self.release_intermediates(final=True)
+
+    def run_steps(self, on_step, parallel):
+        if parallel is None:
+            parallel = settings.get("parallel_steps")
+
+        def start(step):
+            if self.cancelled:
+                return False
+            if on_step is not None and on_step(self.steps.index(step), step) is False:
+                self.cancelled = True
+                return False
+            return True
+
+        if not parallel:
+            for step in self.pending_steps():
+                if not start(step):
+                    return False
+                self.run_step(step)
+            return not self.pending_steps()
+
+        deps = self.dependencies()
+        waiting = self.pending_steps()
+        running = {}
+        failed = set()
+        with ThreadPoolExecutor(max_workers=max(1, len(waiting))) as pool:
+            while waiting or running:
+                busy = {step.name for step in waiting} | {step.name for step in running.values()}
+                for step in list(waiting):
+                    if self.cancelled:
+                        break
+                    if deps[step.name] & failed:
+                        # An input could not be produced; do not run it
+                        waiting.remove(step)
+                        failed.add(step.name)
+                        self.journal.update(step.name, state=SKIPPED, output=step.output,
+                                            reason=f"input from {', '.join(sorted(deps[step.name] & failed))} failed",
+                                            finished=time.time())
+                    elif not deps[step.name] & busy and start(step):
+                        waiting.remove(step)
+                        running[pool.submit(self.run_step, step)] = step
+                if self.cancelled:
+                    waiting = []
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        print(f"Error running {step.name}: {e}")
+                        ok = False
+                    if not ok:
+                        failed.add(step.name)
+        return not self.cancelled and not self.pending_steps()
@@ -0,0 +1,111 @@
+"""Core-aware thread allocation for concurrent gmx subprocesses.
+
+Every gmx process started by the pipeline asks the process-wide
+ThreadAllocator for cores. The grant is capped by how well the tool scales
+(STEP_PROFILES), so several steps and several folders can run at the same
+time without oversubscribing the machine. The grant is passed to gmx as
+OMP_NUM_THREADS (plus a thread flag where configured), and the process can
+optionally be pinned to the granted cores.
+"""
+import os
+import shutil
+import threading
+from collections import namedtuple
+
+import settings
+
+# max_threads: threads beyond this barely speed the tool up
+STEP_PROFILES = {
+    "reduce_index": {"max_threads": 1},
+    "reduce_tpr": {"max_threads": 1},
+    "trjconv": {"max_threads": 1},
+    "rmsd": {"max_threads": 1},
+    "rmsd_pro_lig": {"max_threads": 1},
+    "rmsf_atom": {"max_threads": 1},
+    "rmsf_rec": {"max_threads": 1},
+    "gyration": {"max_threads": 2},
+    "sasa": {"max_threads": 8},
+    "hbond": {"max_threads": 8},
+    # In-process engine (NumPy, one pass for rmsd, rmsf and gyration)
+    "engine": {"max_threads": 1},
+}
+DEFAULT_PROFILE = {"max_threads": 1}
+
+Grant = namedtuple("Grant", ["threads", "cores"])
+
+
+def available_cores():
+    """Core ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadAllocator:
+    """Hands out cores to subprocesses; blocks while the machine is fully booked"""
+
+    def __init__(self, cores=None):
+        cores = available_cores() if cores is None else list(cores)
+        limit = settings.get("max_cores")
+        if limit:
+            cores = cores[:limit]
+        self.total = len(cores)
+        self.free = list(cores)
+        self.condition = threading.Condition()
+
+    def threads_for(self, step_name):
+        profile = STEP_PROFILES.get(step_name, DEFAULT_PROFILE)
+        return max(1, min(profile["max_threads"], self.total))
+
+    def acquire(self, step_name):
+        """Wait for at least one free core and grant up to the step's useful maximum"""
+        wanted = self.threads_for(step_name)
+        with self.condition:
+            while not self.free:
+                self.condition.wait()
+            cores = self.free[:wanted]
+            del self.free[:len(cores)]
+            return Grant(len(cores), cores)
+
+    def release(self, grant):
+        with self.condition:
+            self.free.extend(grant.cores)
+            self.free.sort()
+            self.condition.notify_all()
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def default_allocator():
+    """Allocator shared by every pipeline in this process"""
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = ThreadAllocator()
+        return _allocator
+
+
+def thread_args(step_name, grant):
+    """Extra gmx arguments for the granted thread count (only for tools configured to take one)"""
+    flag = settings.get("gmx_thread_flags").get(step_name)
+    return [flag, str(grant.threads)] if flag else []
+
+
+def thread_env(grant, env=None):
+    env = dict(os.environ if env is None else env)
+    env["OMP_NUM_THREADS"] = str(grant.threads)
+    return env
+
+
+def pin_to(grant):
+    """Command prefix that pins the child process to the granted cores, if supported and enabled
+
+    taskset sets the affinity before gmx starts, so every thread it creates
+    inherits it; a preexec_fn would run Python in the forked child of a
+    multi-threaded process, which can deadlock.
+    """
+    if not settings.get("cpu_pinning") or shutil.which("taskset") is None:
+        return []
+    return ["taskset", "-c", ",".join(str(core) for core in sorted(grant.cores))]
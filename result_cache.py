@@ -0,0 +1,165 @@
+"""Content-addressed cache of gmx step outputs.
+
+A step's cache key is a SHA-256 over the digests of the files it reads
+(step5_1.tpr, step5_1.xtc, analisis.xtc, ...), its argument template, the
+stdin group selections and the gmx executable. Folder paths are not part of
+the key, so a duplicated folder or a replica re-added under another path
+gets its results straight from the cache.
+
+Entries live in `<cache_dir>/objects/<key[:2]>/<key>/` and are linked into
+working folders (hard link when possible, copy otherwise). The cache is
+trimmed to `cache_max_gb` by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import settings
+
+CACHE_VERSION = 1
+CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "result_cache")
+
+
+def link_or_copy(src, dst, allow_symlink=False):
+    """Place `src` at `dst` without copying data if the filesystem allows it
+
+    Tries a hard link, then (optionally) a symbolic link, then a copy. The
+    file appears at `dst` atomically.
+    """
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        try:
+            if not allow_symlink:
+                raise OSError("symlinks not allowed")
+            os.symlink(os.path.abspath(src), tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ResultCache:
+    def __init__(self, root=None, max_bytes=None):
+        if root is None:
+            root = settings.get("cache_dir") or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = int(settings.get("cache_max_gb") * 1024 ** 3)
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects = os.path.join(root, "objects")
+        self.digests_path = os.path.join(root, "digests.json")
+        self.lock = threading.Lock()
+        # One lock per file being hashed: concurrent steps reading the same
+        # trajectory wait for one hash instead of reading it again
+        self.hash_locks = {}
+        os.makedirs(self.objects, exist_ok=True)
+        self.digests = self._load_digests()
+
+    def _load_digests(self):
+        try:
+            with open(self.digests_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_digests(self):
+        tmp = f"{self.digests_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.digests, f)
+        os.replace(tmp, self.digests_path)
+
+    def file_digest(self, path):
+        """SHA-256 of a file's content, remembered per (path, size, mtime)"""
+        path = os.path.abspath(path)
+        with self.lock:
+            hash_lock = self.hash_locks.setdefault(path, threading.Lock())
+        with hash_lock:
+            st = os.stat(path)
+            with self.lock:
+                known = self.digests.get(path)
+            if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                return known[2]
+
+            sha = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self.lock:
+                self.digests[path] = [st.st_size, st.st_mtime_ns, digest]
+                self._save_digests()
+        return digest
+
+    def key(self, args, stdin, inputs, extra=None):
+        """Cache key from the argument template, stdin and {name: input path}"""
+        payload = {
+            "version": CACHE_VERSION,
+            "args": list(args),
+            "stdin": stdin.decode("utf-8") if stdin else "",
+            "inputs": {name: self.file_digest(path) for name, path in sorted(inputs.items())},
+            "extra": extra,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.objects, key[:2], key)
+
+    def lookup(self, key, filename):
+        """Path of the cached output, or None; a hit marks the entry as recently used"""
+        path = os.path.join(self.entry_dir(key), filename)
+        if not os.path.exists(path):
+            return None
+        now = time.time()
+        try:
+            os.utime(self.entry_dir(key), (now, now))
+        except OSError:
+            pass
+        return path
+
+    def fetch(self, key, filename, dst):
+        """Link a cached output to `dst`; returns False on a miss"""
+        cached = self.lookup(key, filename)
+        if cached is None:
+            return False
+        link_or_copy(cached, dst)
+        return True
+
+    def store(self, key, src, filename):
+        """Add an output to the cache (linked, not copied, when possible)"""
+        entry = self.entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        link_or_copy(src, os.path.join(entry, filename))
+        self.evict()
+
+    def entries(self):
+        """(last used, size in bytes, path) for every cache entry"""
+        result = []
+        for prefix in os.listdir(self.objects):
+            prefix_dir = os.path.join(self.objects, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, key)
+                try:
+                    size = sum(os.stat(os.path.join(entry, name)).st_size for name in os.listdir(entry))
+                    result.append((os.stat(entry).st_mtime, size, entry))
+                except OSError:
+                    continue
+        return result
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
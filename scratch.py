@@ -0,0 +1,146 @@
+"""Scratch space for intermediate trajectories.
+
+The PBC-corrected trajectory written by `trjconv` (`analisis.xtc`, or
+`reduced/reduced.xtc` in reduced-system mode) is as large as the input
+trajectory and only read by the analysis steps that follow it. With a
+`scratch_dir` configured (local SSD or tmpfs) it is written there instead of
+next to the inputs on shared storage:
+
+    <scratch_dir>/<folder name>-<hash of folder path>/<output>
+
+The scratch space has a disk budget (`scratch_max_gb`). An intermediate is
+deleted as soon as every step reading it has finished, unless
+`scratch_keep` is set; kept intermediates are reused by later runs of the
+same folder and evicted least recently used first when a new one needs the
+space. If an intermediate does not fit the budget even after eviction, it is
+written to the working folder as before.
+"""
+import hashlib
+import os
+import threading
+
+import settings
+
+
+def folder_key(path_kerja):
+    """Scratch subfolder name for a working folder"""
+    path = os.path.abspath(path_kerja)
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    return f"{os.path.basename(os.path.normpath(path))}-{digest}"
+
+
+class ScratchSpace:
+    """Budgeted scratch directory shared by every pipeline in this process"""
+
+    def __init__(self, root, max_bytes=0, keep=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.lock = threading.Lock()
+        # Files being written or read by a running pipeline, and the space
+        # reserved for intermediates that are still being written:
+        # {path: (bytes, files the bytes are written to)}
+        self.active = set()
+        self.reserved = {}
+        os.makedirs(root, exist_ok=True)
+
+    def folder(self, path_kerja):
+        return os.path.join(self.root, folder_key(path_kerja))
+
+    def path_for(self, path_kerja, output):
+        return os.path.join(self.folder(path_kerja), output)
+
+    def files(self):
+        """(last used, size in bytes, path) for every file in the scratch space"""
+        result = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+        return result
+
+    def usage(self):
+        return sum(size for _, size, _ in self.files())
+
+    def unwritten(self, sizes):
+        """Reserved bytes not yet on disk, given {path: size} of the files on disk"""
+        return sum(max(size - sum(sizes.get(p, 0) for p in paths), 0) for size, paths in self.reserved.values())
+
+    def reserve(self, path, size, partial=None):
+        """Make room for `size` bytes at `path`; False if it cannot fit the budget
+
+        `partial` is where the file is written before it is moved to `path`.
+        Bytes already written count as usage once, not also as reservation.
+        Kept intermediates that no running pipeline uses are evicted, least
+        recently used first.
+        """
+        with self.lock:
+            if self.max_bytes:
+                files = sorted(self.files())
+                sizes = {file_path: file_size for _, file_size, file_path in files}
+                used = sum(sizes.values()) + self.unwritten(sizes)
+                writing = {p for _, paths in self.reserved.values() for p in paths}
+                for _, file_size, file_path in files:
+                    if used + size <= self.max_bytes:
+                        break
+                    if file_path in self.active or file_path in writing or file_path == path:
+                        continue
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        continue
+                    used -= file_size
+                if used + size > self.max_bytes:
+                    return False
+            self.reserved[path] = (size, (path, partial) if partial else (path,))
+            self.active.add(path)
+            return True
+
+    def finish(self, path):
+        """The intermediate at `path` is written; its reservation is now real usage"""
+        with self.lock:
+            self.reserved.pop(path, None)
+
+    def use(self, path):
+        with self.lock:
+            self.active.add(path)
+
+    def release(self, path, delete=False):
+        """No running step needs `path` any more; delete it unless kept for reuse
+
+        Concurrent releases of the same file are safe: the removal happens
+        under the lock and a file another step already removed is ignored.
+        """
+        with self.lock:
+            self.reserved.pop(path, None)
+            self.active.discard(path)
+            if delete and not self.keep:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_scratch = None
+_scratch_lock = threading.Lock()
+
+
+def default_scratch():
+    """Scratch space from the settings, or None if `scratch_dir` is not set"""
+    global _scratch
+    root = settings.get("scratch_dir")
+    if not root:
+        return None
+    with _scratch_lock:
+        if _scratch is None or _scratch.root != root:
+            try:
+                _scratch = ScratchSpace(root, int(settings.get("scratch_max_gb") * 1024 ** 3),
+                                        settings.get("scratch_keep"))
+            except OSError as e:
+                print(f"Error creating scratch directory {root}: {e}")
+                return None
+        return _scratch
@@ -0,0 +1,84 @@
+"""Project files: a saved analysis session.
+
+A project (`*.gaproj`, JSON) holds the folder list, the state of the
+analysis window (dataset, view and its settings, custom styles, sample
+visibility), the last rendered figure as PNG, and the fingerprints (size,
+mtime) of every .xvg file in the folders when it was saved.
+
+Reopening a project shows the saved figure at once if none of those files
+changed, while the window is built behind it. Parsed data is reused from the
+on-disk parse cache (see xvg.py), so only changed files are read again.
+
+Only the standard library is used here so the folder picker can open
+projects without loading the plotting stack.
+"""
+import base64
+import json
+import os
+
+PROJECT_VERSION = 1
+PROJECT_FILTER = "Gromacs-Analysis project (*.gaproj)"
+
+
+def source_files(folders):
+    """The .xvg files in the analysis subfolders of every folder"""
+    files = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for sub in sorted(os.listdir(folder)):
+            subfolder = os.path.join(folder, sub)
+            if sub.startswith(".") or not os.path.isdir(subfolder):
+                continue
+            files.extend(os.path.join(subfolder, name) for name in sorted(os.listdir(subfolder))
+                         if name.endswith(".xvg"))
+    return files
+
+
+def source_fingerprints(folders):
+    """{path: [size, mtime in ns]} of every source file"""
+    fingerprints = {}
+    for path in source_files(folders):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        fingerprints[path] = [st.st_size, st.st_mtime_ns]
+    return fingerprints
+
+
+def changed_sources(project):
+    """Source files added, removed or modified since the project was saved"""
+    saved = project.get("fingerprints", {})
+    current = source_fingerprints(project.get("folders", []))
+    return sorted(path for path in set(saved) | set(current) if saved.get(path) != current.get(path))
+
+
+def save_project(path, folders, state=None, figure_png=None):
+    """Write a project file atomically"""
+    project = {
+        "version": PROJECT_VERSION,
+        "folders": list(folders),
+        "state": state or {},
+        "fingerprints": source_fingerprints(folders),
+        "figure_png": base64.b64encode(figure_png).decode("ascii") if figure_png else None,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(project, f)
+    os.replace(tmp_path, path)
+
+
+def load_project(path):
+    """Read a project file; raises ValueError for files this version cannot read"""
+    with open(path) as f:
+        project = json.load(f)
+    if project.get("version") != PROJECT_VERSION:
+        raise ValueError(f"Unsupported project version {project.get('version')}")
+    return project
+
+
+def figure_png(project):
+    """The saved figure as PNG bytes, or None"""
+    encoded = project.get("figure_png")
+    return base64.b64decode(encoded) if encoded else None
@@ -0,0 +1,114 @@
+"""Application settings.
+
+Defaults can be overridden in `settings.json` next to the code, and any key
+can be overridden per process with an environment variable named
+`GROMACS_ANALYSIS_<KEY>` (upper case), e.g.
+`GROMACS_ANALYSIS_REDUCED_SYSTEM=1`.
+
+Settings are read once per process; call `reload()` after changing
+settings.json or the environment.
+"""
+import json
+import os
+import threading
+
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "settings.json")
+
+DEFAULTS = {
+    # Write one PBC-corrected protein+ligand trajectory (plus matching .tpr
+    # and index) and run every analysis step on it instead of the full system
+    "reduced_system": False,
+    # Index groups kept in the reduced system (default groups of the .tpr)
+    "reduced_groups": [1, 13],
+    # Content-addressed cache of step outputs shared by all folders
+    "result_cache": True,
+    # Cache location ("" = result_cache/ next to the code) and size budget
+    "cache_dir": "",
+    "cache_max_gb": 50.0,
+    # Run independent gmx steps at the same time, sharing the machine's cores
+    "parallel_steps": True,
+    # Cores the launcher may hand out (0 = all cores available to the process)
+    "max_cores": 0,
+    # Pin each gmx process to the cores it was granted (Linux only)
+    "cpu_pinning": False,
+    # Per-step gmx thread-count flag, e.g. {"sasa": "-nt"}; OMP_NUM_THREADS is always set
+    "gmx_thread_flags": {},
+    # How folders are fanned out: "local" (this machine) or "batch" (job scripts)
+    "executor": "local",
+    # Folders analysed at once by the local executor
+    "max_parallel_folders": 4,
+    # Batch backend: shared job directory ("" = jobs/ next to the code),
+    # submit command (the job script path is appended), poll interval, and
+    # hours after submission a job without a result counts as failed (0 = never)
+    "batch_job_dir": "",
+    "batch_submit_command": ["sbatch"],
+    "batch_poll_seconds": 10.0,
+    "batch_timeout_hours": 48.0,
+    # Intermediate trajectories (analisis.xtc, reduced.xtc) on local SSD or
+    # tmpfs ("" = in the working folder), its budget, and whether to keep
+    # them for later runs instead of deleting them once consumed
+    "scratch_dir": "",
+    "scratch_max_gb": 100.0,
+    "scratch_keep": False,
+    # Sample files read at the same time when many are loaded at once
+    "load_workers": 16,
+    # Keep parsed .xvg arrays on disk ("" = parsed_cache/ next to the code)
+    "parsed_cache": True,
+    "parsed_cache_dir": "",
+    "parsed_cache_max_gb": 2.0,
+    # Temperature (K) of the -kT ln P free energy landscape
+    "fel_temperature": 300.0,
+    # "gmx", or "inprocess": compute RMSD, RMSF and Rg in one pass over the
+    # trajectory (needs mdtraj), decoding this many frames per batch
+    "trajectory_engine": "gmx",
+    "engine_batch_frames": 200,
+}
+
+
+def _coerce(value, default):
+    """Convert an environment string to the type of the default value"""
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    if isinstance(default, (list, dict)):
+        return json.loads(value)
+    return value
+
+
+def load_settings():
+    settings = dict(DEFAULTS)
+    if os.path.exists(SETTINGS_PATH):
+        try:
+            with open(SETTINGS_PATH) as f:
+                settings.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {SETTINGS_PATH}: {e}")
+    for key, default in DEFAULTS.items():
+        value = os.environ.get(f"GROMACS_ANALYSIS_{key.upper()}")
+        if value is not None:
+            try:
+                settings[key] = _coerce(value, default)
+            except ValueError as e:
+                print(f"Error in environment setting {key}: {e}")
+    return settings
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def reload():
+    """Read settings.json and the environment again"""
+    global _settings
+    loaded = load_settings()
+    with _settings_lock:
+        _settings = loaded
+
+
+def get(key):
+    if _settings is None:
+        reload()
+    return _settings[key]
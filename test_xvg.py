@@ -0,0 +1,66 @@
+import numpy as np
+
+import settings
+import xvg
+from xvg import decimate, visible_points
+
+
+def test_decimate_keeps_both_ends_when_length_is_not_a_multiple_of_bins():
+    x = np.arange(1001.0)
+    y = np.sin(x / 30.0)
+    xs, ys = decimate(x, y, 220)
+    assert xs[0] == x[0]
+    assert xs[-1] == x[-1]
+    assert len(xs) <= 2 * 220 + 2
+
+
+def test_decimate_keeps_extremes_of_every_bin():
+    rng = np.random.default_rng(0)
+    x = np.arange(1003.0)
+    y = rng.normal(size=len(x))
+    xs, ys = decimate(x, y, 100)
+    assert ys.max() == y.max()
+    assert ys.min() == y.min()
+    assert np.all(np.diff(xs) > 0)
+
+
+def test_visible_points_span_the_requested_window():
+    x = np.arange(1000.0)
+    xs, _ = visible_points(x, np.cos(x), 100, 900, 300)
+    assert xs[0] <= 100
+    assert xs[-1] >= 900
+
+
+def test_parse_cache_is_trimmed_once_per_batch(tmp_path, monkeypatch):
+    paths = []
+    for i in range(8):
+        path = tmp_path / f"sample{i}.xvg"
+        path.write_text("@ title \"RMSD\"\n" + "".join(f"{t} {t * i}\n" for t in range(50)))
+        paths.append(str(path))
+    overrides = {"parsed_cache": True, "parsed_cache_dir": str(tmp_path / "cache")}
+    get = settings.get
+    monkeypatch.setattr(settings, "get", lambda key: overrides.get(key, get(key)))
+    trims = []
+    trim = xvg.trim_parsed_cache
+    monkeypatch.setattr(xvg, "trim_parsed_cache", lambda: trims.append(1) or trim())
+    xvg.clear_cache()
+    loaded = dict(xvg.load_concurrently(paths, max_workers=4))
+    assert all(loaded[path] is not None for path in paths)
+    assert len(list((tmp_path / "cache").glob("*.npz"))) == len(paths)
+    assert len(trims) == 1
+
+
+def test_loaded_files_are_bounded_and_least_recently_used_go_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(xvg, "_cache", xvg.LruCache(2))
+    get = settings.get
+    monkeypatch.setattr(settings, "get", lambda key: False if key == "parsed_cache" else get(key))
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"sample{i}.xvg"
+        path.write_text(f"0 {i}\n1 {i}\n")
+        paths.append(str(path))
+    xvg.load_xvg(paths[0])
+    xvg.load_xvg(paths[1])
+    xvg.load_xvg(paths[0])
+    xvg.load_xvg(paths[2])
+    assert [xvg.is_loaded(path) for path in paths] == [True, False, True]
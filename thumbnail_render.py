@@ -0,0 +1,61 @@
+"""Off-screen rendering of sample thumbnails (the thumbnail worker processes).
+
+The worker processes are spawned (not forked) by thumbnails.py and run
+render_thumbnail from here, away from the Qt widgets: it needs only NumPy,
+the xvg data layer and matplotlib's Agg canvas.
+"""
+import hashlib
+import json
+import os
+
+from xvg import decimate, fingerprint, load_xvg, sample_name, split_segments
+
+THUMBNAIL_VERSION = 1
+THUMBNAIL_SIZE = (220, 160)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "thumbnail_cache")
+
+
+def thumbnail_key(path, style, size=THUMBNAIL_SIZE):
+    """Cache key for one thumbnail: the data file's identity plus the style used"""
+    payload = json.dumps([THUMBNAIL_VERSION, fingerprint(path), style, list(size)], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def thumbnail_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".png")
+
+
+def render_thumbnail(path, style, out_path, size=THUMBNAIL_SIZE, title=""):
+    """Render one sample to a PNG (runs inside a worker process)"""
+    # Import lazily and use the Agg canvas directly: worker processes never
+    # touch pyplot or Qt.
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    data = load_xvg(path)
+    dpi = 100
+    fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.02, 0.02, 0.96, 0.82])
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_facecolor('#f8f9fa')
+
+    kwargs = {'linewidth': 0.8, 'color': style.get('color', '#1f77b4')}
+    if style.get('line_style') not in (None, 'None'):
+        kwargs['linestyle'] = style['line_style']
+    if len(data.x):
+        segments = split_segments(data.x, data.y) if data.title == "RMS fluctuation Residue" else [(data.x, data.y)]
+        for xs, ys in segments:
+            # One min/max pair per horizontal pixel is all a thumbnail can show
+            xs, ys = decimate(xs, ys, size[0])
+            ax.plot(xs, ys, **kwargs)
+    else:
+        ax.text(0.5, 0.5, "No data", ha='center', va='center', transform=ax.transAxes, fontsize=8)
+    fig.suptitle(title or sample_name(path), fontsize=8, y=0.97)
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, dpi=dpi, format="png")
+    os.replace(tmp_path, out_path)
+    return out_path
@@ -0,0 +1,162 @@
+"""Small-multiples thumbnail grid for comparing many samples.
+
+Thumbnails are rendered off-screen with the Agg backend in a process pool
+(see thumbnail_render.py) and cached as PNG files keyed by the source data
+and the plot style, so reopening the grid (or re-styling only some samples) re-renders only what
+changed. The grid itself is a QListView in icon mode backed by a list
+model, so only the visible thumbnails are ever requested or painted.
+"""
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from thumbnail_render import THUMBNAIL_SIZE, render_thumbnail, thumbnail_key, thumbnail_path
+
+
+class ThumbnailModel(QtCore.QAbstractListModel):
+    """List model of (xvg path, label, style); pixmaps are produced on demand"""
+
+    PathRole = QtCore.Qt.UserRole + 1
+    MAX_PIXMAPS = 400
+
+    def __init__(self, items, parent=None):
+        super().__init__(parent)
+        self.items = items
+        self.pixmaps = {}
+        self.pending = {}
+        self.failed = set()
+        self.finished = queue.Queue()
+        self.placeholder = QtGui.QPixmap(*THUMBNAIL_SIZE)
+        self.placeholder.fill(QtGui.QColor('#e9ecef'))
+        self.executor = None
+
+        # Results arrive from the pool's callback thread; hand them over to
+        # the GUI thread through a queue polled by a timer.
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(50)
+        self.timer.timeout.connect(self.collect_finished)
+        self.timer.start()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path, label, style = self.items[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return label
+        if role == QtCore.Qt.ToolTipRole:
+            return path
+        if role == self.PathRole:
+            return path
+        if role == QtCore.Qt.DecorationRole:
+            return self.pixmap_for(index.row())
+        return None
+
+    def pixmap_for(self, row):
+        if row in self.pixmaps:
+            return self.pixmaps[row]
+        if row in self.failed:
+            return self.placeholder
+        path, label, style = self.items[row]
+        try:
+            key = thumbnail_key(path, style)
+        except OSError:
+            return self.placeholder
+        out_path = thumbnail_path(key)
+        if os.path.exists(out_path):
+            return self.remember(row, QtGui.QPixmap(out_path))
+        if row not in self.pending:
+            future = self.pool().submit(render_thumbnail, path, style, out_path, THUMBNAIL_SIZE, label)
+            self.pending[row] = future
+            future.add_done_callback(lambda f, r=row: self.finished.put((r, f)))
+        return self.placeholder
+
+    def remember(self, row, pixmap):
+        if len(self.pixmaps) >= self.MAX_PIXMAPS:
+            # Drop the oldest pixmap; it is re-read from the disk cache if scrolled back
+            self.pixmaps.pop(next(iter(self.pixmaps)))
+        self.pixmaps[row] = pixmap
+        return pixmap
+
+    def pool(self):
+        if self.executor is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+            # Spawned, not forked: forking this multi-threaded Qt process could
+            # copy a lock held by another thread into the worker
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def collect_finished(self):
+        while True:
+            try:
+                row, future = self.finished.get_nowait()
+            except queue.Empty:
+                return
+            self.pending.pop(row, None)
+            if future.cancelled():
+                continue
+            try:
+                out_path = future.result()
+            except Exception as e:
+                print(f"Error rendering thumbnail for {self.items[row][0]}: {e}")
+                self.failed.add(row)
+                continue
+            self.remember(row, QtGui.QPixmap(out_path))
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+    def shutdown(self):
+        self.timer.stop()
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+class ThumbnailGridDialog(QtWidgets.QDialog):
+    """Scrollable grid with one small panel per item; clicking opens the full plot"""
+
+    thumbnail_activated = QtCore.pyqtSignal(str)
+
+    def __init__(self, items, title="Thumbnail Grid", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(980, 700)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        instruction = QtWidgets.QLabel(f"{len(items)} panel(s) - click a thumbnail to open the interactive plot")
+        instruction.setStyleSheet("font-weight: bold;")
+        layout.addWidget(instruction)
+
+        self.model = ThumbnailModel(items, self)
+        self.view = QtWidgets.QListView(self)
+        self.view.setViewMode(QtWidgets.QListView.IconMode)
+        self.view.setResizeMode(QtWidgets.QListView.Adjust)
+        self.view.setMovement(QtWidgets.QListView.Static)
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QtWidgets.QListView.Batched)
+        self.view.setBatchSize(100)
+        self.view.setIconSize(QtCore.QSize(*THUMBNAIL_SIZE))
+        self.view.setGridSize(QtCore.QSize(THUMBNAIL_SIZE[0] + 16, THUMBNAIL_SIZE[1] + 32))
+        self.view.setSpacing(4)
+        self.view.setModel(self.model)
+        self.view.clicked.connect(self.open_item)
+        layout.addWidget(self.view)
+
+        button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def open_item(self, index):
+        self.thumbnail_activated.emit(self.model.data(index, ThumbnailModel.PathRole))
+
+    def done(self, result):
+        self.model.shutdown()
+        super().done(result)
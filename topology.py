@@ -0,0 +1,282 @@
+"""Residue, chain and secondary-structure mapping of atoms for RMSF.
+
+`rmsf_atom.xvg` has one row per atom (x is the atom number). The pipeline
+writes the structure of the analysed system to `structure/structure.pdb`
+(`gmx editconf` from the same .tpr the analysis reads), so every atom can be
+mapped to its residue, chain and secondary structure.
+
+PDB atom numbers wrap at 100000, so the n-th ATOM/HETATM record is taken to
+be atom n. Chains come from the chain column, or start wherever the residue
+number decreases if it is blank. Secondary structure is read from
+HELIX/SHEET records when the file has them; otherwise it is assigned from
+Cα distances (P-SEA criteria), which is approximate but needs no external
+program.
+
+Per-atom values are aggregated with one stable sort and one np.*.reduceat
+per statistic. Structures and aggregates are cached by file fingerprint.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from xvg import LruCache, fingerprint, load_xvg, sample_name
+
+STRUCTURE_DIR = "structure"
+STRUCTURE_FILE = "structure.pdb"
+
+RESIDUE = "Residue"
+SECONDARY = "Secondary structure"
+CHAIN = "Chain"
+LEVELS = [RESIDUE, SECONDARY, CHAIN]
+
+HELIX = 0
+STRAND = 1
+COIL = 2
+OTHER = 3
+SECONDARY_NAMES = np.array(["Helix", "Strand", "Coil", "Other"])
+
+# P-SEA Cα distance criteria (Å) for residues i+2, i+3, i+4: (target, tolerance)
+HELIX_DISTANCES = ((5.5, 0.5), (5.3, 0.5), (6.4, 0.6))
+STRAND_DISTANCES = ((6.7, 0.6), (9.9, 0.9), (12.4, 1.1))
+
+# atom_residue: residue index of every atom; the residue_* arrays have one
+# entry per residue; chains: chain names indexed by residue_chain
+Structure = namedtuple("Structure", ["path", "atom_residue", "residue_numbers", "residue_names",
+                                     "residue_chain", "chains", "residue_secondary"])
+
+# Per-atom names, residue names, masses (u) and reference positions (nm)
+Atoms = namedtuple("Atoms", ["names", "residue_names", "masses", "positions"])
+
+# Atomic masses (u) by element; other elements count as carbon
+MASSES = {"H": 1.008, "C": 12.011, "N": 14.007, "O": 15.999, "S": 32.06, "P": 30.974, "F": 18.998,
+          "CL": 35.45, "BR": 79.904, "I": 126.90, "NA": 22.990, "K": 39.098, "MG": 24.305,
+          "CA": 40.078, "ZN": 65.38, "FE": 55.845}
+
+# One entry per group that has atoms: the group index, its label and statistics
+GroupStats = namedtuple("GroupStats", ["groups", "labels", "mean", "std", "min", "max", "count"])
+
+MAX_CACHED = 256
+_cache = LruCache(MAX_CACHED)
+
+
+def structure_file(xvg_path):
+    """Structure file of the sample an .xvg file belongs to, or None
+
+    A comparison folder holds `structure/<sample>.pdb`; an analysed folder
+    holds `structure/structure.pdb`.
+    """
+    folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(xvg_path))), STRUCTURE_DIR)
+    for name in (f"{sample_name(xvg_path)}.pdb", STRUCTURE_FILE):
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def field(chars, start, stop):
+    """Fixed-width PDB column of every record as a bytes array"""
+    return np.ascontiguousarray(chars[:, start:stop]).view(f"S{stop - start}").ravel()
+
+
+def record_chars(lines, prefixes):
+    """(records, 80) character matrix of the lines starting with one of the prefixes"""
+    records = [line[:80].ljust(80) for line in lines if line.startswith(prefixes)]
+    return np.frombuffer(b"".join(records), dtype="S1").reshape(len(records), 80)
+
+
+def spread(starts, width):
+    """Mark residues i..i+width-1 for every i where `starts` is set"""
+    covered = np.zeros(len(starts) + width - 1, dtype=bool)
+    for k in range(width):
+        covered[k:k + len(starts)] |= starts
+    return covered[:len(starts)]
+
+
+def secondary_from_ca(ca, chain):
+    """HELIX/STRAND/COIL for consecutive Cα positions (Å) by P-SEA distance criteria"""
+    n = len(ca)
+
+    def distance(k):
+        d = np.full(n, np.nan)
+        if n > k:
+            d[:-k] = np.linalg.norm(ca[k:] - ca[:-k], axis=1)
+            d[:-k][chain[k:] != chain[:-k]] = np.nan
+        return d
+
+    d = [distance(k) for k in (2, 3, 4)]
+    with np.errstate(invalid="ignore"):
+        helix = np.logical_and.reduce([np.abs(dk - t) <= tol for dk, (t, tol) in zip(d, HELIX_DISTANCES)])
+        strand = np.logical_and.reduce([np.abs(dk - t) <= tol for dk, (t, tol) in zip(d, STRAND_DISTANCES)])
+    result = np.full(n, COIL)
+    result[spread(strand, 3)] = STRAND
+    result[spread(helix, 5)] = HELIX
+    return result
+
+
+def secondary_from_records(records, residue_chars, residue_numbers, has_ca):
+    """Secondary structure from HELIX/SHEET records, or None if there are none"""
+    ranges = []
+    for line in records:
+        if line.startswith(b"HELIX "):
+            ranges.append((HELIX, line[19:20], int(line[21:25]), int(line[33:37])))
+        elif line.startswith(b"SHEET "):
+            ranges.append((STRAND, line[21:22], int(line[22:26]), int(line[33:37])))
+    if not ranges:
+        return None
+    result = np.where(has_ca, COIL, OTHER)
+    for code, chain, first, last in ranges:
+        result[has_ca & (residue_chars == chain) & (residue_numbers >= first) & (residue_numbers <= last)] = code
+    return result
+
+
+def parse_pdb(raw, path=""):
+    """Parse the bytes of a PDB file into a Structure"""
+    lines = raw.splitlines()
+    chars = record_chars(lines, (b"ATOM", b"HETATM"))
+    if not len(chars):
+        raise ValueError(f"No atoms in {path}")
+
+    # Up to 4 characters: gmx writes e.g. TIP3 into column 21
+    res_name = np.char.strip(field(chars, 17, 21))
+    chain_id = field(chars, 21, 22)
+    res_seq = field(chars, 22, 26)
+    insertion = field(chars, 26, 27)
+    new = np.ones(len(chars), dtype=bool)
+    new[1:] = ((res_seq[1:] != res_seq[:-1]) | (insertion[1:] != insertion[:-1])
+               | (chain_id[1:] != chain_id[:-1]) | (res_name[1:] != res_name[:-1]))
+    atom_residue = np.cumsum(new) - 1
+    starts = np.flatnonzero(new)
+    residue_numbers = res_seq[starts].astype(np.int64)
+    residue_names = res_name[starts].astype(str)
+
+    # Named chains; without any chain names a new chain starts wherever the
+    # residue numbering goes back, and unnamed residues next to named chains
+    # (solvent, ions) form chain "-"
+    residue_chars = chain_id[starts]
+    if (residue_chars == b" ").all():
+        segment = np.zeros(len(starts), dtype=np.intp)
+        segment[1:] = np.cumsum(np.diff(residue_numbers) < 0)
+        names = np.array([chr(ord("A") + i) if i < 26 else str(i + 1) for i in range(segment[-1] + 1)])[segment]
+    else:
+        names = np.where(residue_chars == b" ", b"-", residue_chars).astype(str)
+    chains, first, residue_chain = np.unique(names, return_index=True, return_inverse=True)
+    # Chains in the order they appear in the file
+    order = np.argsort(first)
+    chains = chains[order]
+    residue_chain = np.argsort(order)[residue_chain]
+
+    # Cα of protein residues (not calcium ions, also named CA)
+    atom_name = field(chars, 12, 16)
+    is_ca = ((atom_name == b" CA ") | (atom_name == b"CA  ")) & (res_name != b"CA")
+    ca_residue, first_ca = np.unique(atom_residue[is_ca], return_index=True)
+    has_ca = np.zeros(len(starts), dtype=bool)
+    has_ca[ca_residue] = True
+
+    records = ([line for line in lines if line.startswith((b"HELIX ", b"SHEET "))]
+               if b"HELIX " in raw or b"SHEET " in raw else [])
+    residue_secondary = secondary_from_records(records, residue_chars, residue_numbers, has_ca)
+    if residue_secondary is None:
+        residue_secondary = np.full(len(starts), OTHER)
+        if len(ca_residue):
+            ca_chars = chars[np.flatnonzero(is_ca)[first_ca]]
+            ca = np.column_stack([field(ca_chars, start, start + 8).astype(float) for start in (30, 38, 46)])
+            residue_secondary[ca_residue] = secondary_from_ca(ca, residue_chain[ca_residue])
+    return Structure(path, atom_residue, residue_numbers, residue_names, residue_chain, chains, residue_secondary)
+
+
+def read_structure(path):
+    """Cached Structure of a PDB file"""
+    def compute():
+        with open(path, "rb") as f:
+            return parse_pdb(f.read(), path)
+
+    return _cache.get((fingerprint(path), "structure"), compute)
+
+
+def parse_atoms(raw):
+    """Atoms of the ATOM/HETATM records of a PDB file"""
+    chars = record_chars(raw.splitlines(), (b"ATOM", b"HETATM"))
+    names = np.char.strip(field(chars, 12, 16)).astype(str)
+    # Residue names of up to 4 characters (gmx writes e.g. TIP3 into column 21)
+    residue_names = np.char.strip(field(chars, 17, 21)).astype(str)
+    # Element column; where it is blank, monatomic ions (name = residue name,
+    # e.g. CA, CL) are their own element, anything else the name's first letter
+    elements = np.char.upper(np.char.strip(field(chars, 76, 78)).astype(str)).astype("U2")
+    blank = elements == ""
+    ion = blank & (names == residue_names)
+    elements[ion] = np.char.upper(names[ion])
+    blank &= ~ion
+    elements[blank] = np.char.lstrip(names[blank], "0123456789").astype("U1")
+    unique, inverse = np.unique(elements, return_inverse=True)
+    masses = np.array([MASSES.get(element, MASSES["C"]) for element in unique])[inverse]
+    # Å in the PDB, nm like the trajectory
+    positions = np.column_stack([field(chars, start, start + 8).astype(float) for start in (30, 38, 46)]) / 10.0
+    return Atoms(names, residue_names, masses, positions)
+
+
+def read_atoms(path):
+    """Cached Atoms of a PDB file"""
+    def compute():
+        with open(path, "rb") as f:
+            return parse_atoms(f.read())
+
+    return _cache.get((fingerprint(path), "atoms"), compute)
+
+
+def residue_labels(structure):
+    chains = structure.chains[structure.residue_chain]
+    return np.char.add(np.char.add(np.char.add(chains, ":"), structure.residue_names),
+                       structure.residue_numbers.astype(str))
+
+
+def atom_groups(structure, atom_numbers, level):
+    """(valid rows, group index per valid row, group labels) for 1-based atom numbers"""
+    atoms = atom_numbers.astype(np.int64) - 1
+    valid = (atoms >= 0) & (atoms < len(structure.atom_residue))
+    residue = structure.atom_residue[atoms[valid]]
+    if level == CHAIN:
+        return valid, structure.residue_chain[residue], structure.chains
+    if level == SECONDARY:
+        return valid, structure.residue_secondary[residue], SECONDARY_NAMES
+    return valid, residue, residue_labels(structure)
+
+
+def group_stats(values, groups, labels):
+    """Mean, std, min, max and count of `values` per group"""
+    if not len(values):
+        empty = np.empty(0)
+        return GroupStats(np.empty(0, dtype=np.intp), labels[:0], empty, empty, empty, empty,
+                          np.empty(0, dtype=np.int64))
+    order = np.argsort(groups, kind="stable")
+    groups, values = groups[order], values[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    count = np.diff(np.r_[starts, len(groups)])
+    mean = np.add.reduceat(values, starts) / count
+    variance = np.add.reduceat(values * values, starts) / count - mean * mean
+    return GroupStats(groups[starts], labels[groups[starts]], mean, np.sqrt(np.maximum(variance, 0.0)),
+                      np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts), count)
+
+
+def aggregate(rmsf_path, structure_path, level):
+    """Cached GroupStats of a per-atom RMSF file at RESIDUE, SECONDARY or CHAIN level"""
+    key = (fingerprint(rmsf_path), fingerprint(structure_path), level)
+
+    def compute():
+        data = load_xvg(rmsf_path)
+        valid, groups, labels = atom_groups(read_structure(structure_path), data.x, level)
+        return group_stats(data.y[valid], groups, labels)
+
+    return _cache.get(key, compute)
+
+
+def atom_secondary(structure, atom_numbers):
+    """Secondary structure code of each atom number; OTHER outside the structure"""
+    codes = np.full(len(atom_numbers), OTHER)
+    valid, groups, _ = atom_groups(structure, atom_numbers, SECONDARY)
+    codes[valid] = groups
+    return codes
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,409 @@
+"""In-process trajectory engine for RMSD, radius of gyration and RMSF.
+
+With the gmx engine `rms` (twice), `rmsf` (twice) and `gyrate` each read
+the whole trajectory. This engine reads the PBC-corrected trajectory once,
+in batches of frames (setting `engine_batch_frames`), and computes in that
+single pass, vectorized over the frames of a batch:
+
+* RMSD of the backbone after a mass-weighted optimal superposition (Kabsch,
+  one batched 3x3 SVD per batch) on the reference structure, as `gmx rms`
+  with groups Backbone/Backbone;
+* RMSD of the ligand after superposing the protein (Protein/ligand);
+* radius of gyration of the backbone, total and around the x, y and z axes,
+  as `gmx gyrate`;
+* RMSF of the backbone atoms around their mean position after the same
+  fit as the RMSD, per atom and averaged per residue (`gmx rmsf`, `-res`).
+
+The reference structure and atom masses come from `structure/structure.pdb`
+(written from the same .tpr by the pipeline, see topology.py), the Backbone,
+Protein and ligand atoms from the default index groups of that .tpr
+(`gmx make_ndx`) with the group numbers the gmx steps select. The outputs
+are written in the layout of the gmx files they replace, so every view
+reads them unchanged; `python trajectory.py validate <folder>` compares them
+with gmx outputs already in a folder.
+
+XTC frames are located through a frame-offset index built from the frame
+headers alone, so a time window is read without decoding the frames before
+it. Decoding the compressed coordinates needs the optional `mdtraj` package;
+XTC compression does not allow skipping atoms, so every atom of a frame is
+decoded, but only the analysed atoms are kept.
+"""
+import argparse
+import os
+import struct
+import subprocess
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+import settings
+from topology import group_stats, read_atoms, read_structure
+from xvg import LruCache, fingerprint, load_xvg
+
+ENGINE = "engine"
+# Part of the result cache key of engine outputs; bump when they change
+ENGINE_VERSION = 1
+
+XTC_MAGIC = 1995
+# magic, natoms, step, time, box (3x3), natoms again
+XTC_HEADER = struct.Struct(">iiif9fi")
+# precision, minint[3], maxint[3], smallidx, compressed byte count
+XTC_COMPRESSED = struct.Struct(">f7ii")
+
+# step name: (title, x label, y label) of its output; the command line
+# comment names the gmx output file, which is what xvg.detect_labels keys on
+OUTPUTS = {
+    "rmsd": ("RMSD", "Time (ns)", "RMSD (nm)"),
+    "rmsd_pro_lig": ("RMSD Protein-Ligand", "Time (ns)", "RMSD (nm)"),
+    "rmsf_atom": ("RMS fluctuation", "Atom", "(nm)"),
+    "rmsf_rec": ("RMS fluctuation", "Residue", "(nm)"),
+    "gyration": ("Radius of gyration (total and around axes)", "Time (ps)", "Rg (nm)"),
+}
+
+FrameIndex = namedtuple("FrameIndex", ["natoms", "offsets", "times"])
+
+MAX_CACHED = 16
+_cache = LruCache(MAX_CACHED)
+
+
+def engine_available():
+    """True if the optional XTC reader (mdtraj) can be imported"""
+    try:
+        import mdtraj.formats  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def scan_xtc(path):
+    """FrameIndex from the frame headers of an XTC file (no coordinates are decoded)"""
+    offsets = []
+    times = []
+    natoms = None
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset + XTC_HEADER.size <= size:
+            f.seek(offset)
+            header = f.read(XTC_HEADER.size)
+            magic, frame_atoms, _, time, *_ = XTC_HEADER.unpack(header)
+            if magic != XTC_MAGIC:
+                raise ValueError(f"{path}: no XTC frame at byte {offset}")
+            natoms = frame_atoms if natoms is None else natoms
+            if frame_atoms <= 9:
+                # Small systems are stored uncompressed
+                length = XTC_HEADER.size + 12 * frame_atoms
+            else:
+                byte_count = XTC_COMPRESSED.unpack(f.read(XTC_COMPRESSED.size))[-1]
+                length = XTC_HEADER.size + XTC_COMPRESSED.size + (byte_count + 3) // 4 * 4
+            if offset + length > size:
+                break  # Truncated last frame (trajectory still being written)
+            offsets.append(offset)
+            times.append(time)
+            offset += length
+    return FrameIndex(natoms or 0, np.array(offsets, dtype=np.int64), np.array(times))
+
+
+def frame_index(path):
+    """Cached FrameIndex of a trajectory"""
+    return _cache.get((fingerprint(path), "index"), lambda: scan_xtc(path))
+
+
+def frame_range(index, window=None):
+    """(first, stop) frames inside a (start, end) window in ps"""
+    if window is None:
+        return 0, len(index.times)
+    start, end = window
+    return int(np.searchsorted(index.times, start)), int(np.searchsorted(index.times, end, side="right"))
+
+
+def read_frames(path, atom_indices, batch_frames, first=0, stop=None, offsets=None):
+    """(times in ps, positions in nm of shape (frames, atoms, 3)) in batches"""
+    try:
+        from mdtraj.formats import XTCTrajectoryFile
+    except ImportError:
+        raise RuntimeError("The in-process engine needs mdtraj (pip install mdtraj)")
+
+    with XTCTrajectoryFile(path, "r") as f:
+        if offsets is not None:
+            try:
+                # Reuse the index instead of letting the reader scan the file again
+                f.offsets = offsets
+            except AttributeError:
+                pass
+        if first:
+            f.seek(first)
+        frame = first
+        while stop is None or frame < stop:
+            n = batch_frames if stop is None else min(batch_frames, stop - frame)
+            xyz, time, _, _ = f.read(n_frames=n, atom_indices=atom_indices)
+            if not len(xyz):
+                break
+            frame += len(xyz)
+            yield time.astype(np.float64), xyz.astype(np.float64)
+
+
+def parse_index(text):
+    """[(group name, 0-based atom indices)] of a gmx .ndx file, in file order"""
+    groups = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            groups.append((line.strip("[] "), []))
+        elif line and groups:
+            groups[-1][1].append(line)
+    return [(name, np.array(" ".join(numbers).split(), dtype=np.intp) - 1) for name, numbers in groups]
+
+
+def read_index(path):
+    """Cached groups of a .ndx file"""
+    def compute():
+        with open(path) as f:
+            return parse_index(f.read())
+
+    return _cache.get((fingerprint(path), "ndx"), compute)
+
+
+def atom_groups(index_path, group_numbers):
+    """{group: sorted atom indices} for {group: index group number}; a missing ligand group is empty"""
+    index = read_index(index_path)
+    groups = {}
+    for name, number in group_numbers.items():
+        if number < len(index):
+            groups[name] = np.unique(index[number][1])
+        elif name == "ligand":
+            groups[name] = np.empty(0, dtype=np.intp)
+        else:
+            raise ValueError(f"{index_path} has no group {number} ({name})")
+    return groups
+
+
+def superpose(frames, reference, weights):
+    """(rotation, centre) that superpose each frame on the reference, as `(x - centre) @ rotation + ref centre`
+
+    frames: (batch, atoms, 3); reference: (atoms, 3); weights: (atoms,).
+    """
+    w = weights / weights.sum()
+    centre = np.einsum("n,bnk->bk", w, frames)
+    covariance = np.einsum("n,bni,nj->bij", w, frames - centre[:, None, :], reference - w @ reference)
+    u, _, vt = np.linalg.svd(covariance)
+    # No reflections: flip the last singular vector where det < 0
+    u[:, :, 2] *= np.sign(np.linalg.det(u @ vt))[:, None]
+    return u @ vt, centre
+
+
+def apply_fit(positions, rotation, centre, reference_centre):
+    return np.einsum("bni,bij->bnj", positions - centre[:, None, :], rotation) + reference_centre
+
+
+def weighted_rmsd(positions, reference, weights):
+    """Per-frame mass-weighted RMSD of (batch, atoms, 3) positions from the reference"""
+    squared = ((positions - reference) ** 2).sum(axis=2)
+    return np.sqrt(squared @ weights / weights.sum())
+
+
+def gyration_radii(positions, weights):
+    """(batch, 4): Rg and the radii around the x, y and z axes"""
+    w = weights / weights.sum()
+    centred = positions - np.einsum("n,bnk->bk", w, positions)[:, None, :]
+    squared = np.einsum("n,bnk->bk", w, centred ** 2)
+    around = squared.sum(axis=1, keepdims=True) - squared
+    return np.sqrt(np.column_stack((squared.sum(axis=1), around)))
+
+
+class Analysis:
+    """Single-pass accumulation of RMSD, Rg and RMSF over batches of frames"""
+
+    def __init__(self, atoms, groups, selection):
+        # Positions of each group within the atoms read from the trajectory
+        self.rows = {name: np.searchsorted(selection, idx) for name, idx in groups.items()}
+        self.groups = groups
+        self.masses = {name: atoms.masses[idx] for name, idx in groups.items()}
+        self.reference = {name: atoms.positions[idx] for name, idx in groups.items()}
+        self.times = []
+        self.rmsd = []
+        self.rmsd_ligand = []
+        self.gyration = []
+        self.frames = 0
+        # Sums of the fitted backbone displacement from the reference, for RMSF
+        self.displacement = np.zeros((len(groups["backbone"]), 3))
+        self.displacement_sq = np.zeros((len(groups["backbone"]), 3))
+
+    def add(self, times, positions):
+        """Accumulate one batch: times (batch,) in ps, positions (batch, selected atoms, 3) in nm"""
+        backbone = positions[:, self.rows["backbone"]]
+        weights = self.masses["backbone"]
+        reference = self.reference["backbone"]
+        rotation, centre = superpose(backbone, reference, weights)
+        fitted = apply_fit(backbone, rotation, centre, weights @ reference / weights.sum())
+        self.times.append(times)
+        self.rmsd.append(weighted_rmsd(fitted, reference, weights))
+        self.gyration.append(gyration_radii(backbone, weights))
+        displacement = fitted - reference
+        self.displacement += displacement.sum(axis=0)
+        self.displacement_sq += (displacement ** 2).sum(axis=0)
+        self.frames += len(times)
+
+        if len(self.groups["ligand"]) and len(self.groups["protein"]):
+            protein = positions[:, self.rows["protein"]]
+            weights = self.masses["protein"]
+            reference = self.reference["protein"]
+            rotation, centre = superpose(protein, reference, weights)
+            ligand = apply_fit(positions[:, self.rows["ligand"]], rotation, centre,
+                               weights @ reference / weights.sum())
+            self.rmsd_ligand.append(weighted_rmsd(ligand, self.reference["ligand"], self.masses["ligand"]))
+
+    def rmsf(self):
+        """Per-atom RMSF (nm) of the backbone around its mean fitted position"""
+        mean = self.displacement / self.frames
+        return np.sqrt(np.maximum(self.displacement_sq / self.frames - mean ** 2, 0.0).sum(axis=1))
+
+    def columns(self, structure):
+        """{step name: columns as in the gmx output}"""
+        times = np.concatenate(self.times)
+        result = {
+            "rmsd": np.column_stack((times / 1000.0, np.concatenate(self.rmsd))),
+            "gyration": np.column_stack((times, np.concatenate(self.gyration))),
+        }
+        if self.rmsd_ligand:
+            result["rmsd_pro_lig"] = np.column_stack((times / 1000.0, np.concatenate(self.rmsd_ligand)))
+        rmsf = self.rmsf()
+        backbone = self.groups["backbone"]
+        result["rmsf_atom"] = np.column_stack((backbone + 1.0, rmsf))
+        residues = group_stats(rmsf, structure.atom_residue[backbone], structure.residue_numbers)
+        result["rmsf_rec"] = np.column_stack((residues.labels.astype(float), residues.mean))
+        return result
+
+
+def write_xvg(path, name, columns):
+    """Write columns in the layout of the gmx output of step `name`"""
+    title, x_label, y_label = OUTPUTS[name]
+    filename = os.path.basename(path)
+    header = [
+        "# This file was created by the in-process trajectory engine",
+        "# Command line:",
+        f"#   trajectory.py {name} -o {filename}",
+        f'@    title "{title}"',
+        f'@    xaxis  label "{x_label}"',
+        f'@    yaxis  label "{y_label}"',
+        "@TYPE xy",
+    ]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(header) + "\n")
+        np.savetxt(f, columns, fmt="%12.7f")
+    os.replace(tmp_path, path)
+
+
+def analyse(structure_path, index_path, group_numbers, traj_path, outputs, window=None, batch_frames=None,
+            log=None):
+    """Compute the analyses in one pass over the trajectory and write `outputs` {step name: path}
+
+    `group_numbers` maps "backbone", "protein" and "ligand" to groups of the
+    index file. `window` is a (start, end) time range in ps. Returns the step
+    names written.
+    """
+    batch_frames = batch_frames or settings.get("engine_batch_frames")
+    atoms = read_atoms(structure_path)
+    structure = read_structure(structure_path)
+    index = frame_index(traj_path)
+    if index.natoms != len(atoms.names):
+        raise ValueError(f"{traj_path} has {index.natoms} atoms, {structure_path} has {len(atoms.names)}")
+    groups = atom_groups(index_path, group_numbers)
+    if not len(groups["backbone"]):
+        raise ValueError(f"No backbone atoms in group {group_numbers['backbone']} of {index_path}")
+    if np.concatenate(list(groups.values())).max() >= len(atoms.names):
+        raise ValueError(f"{index_path} does not match {structure_path}")
+
+    # Only the atoms some analysis uses are kept from the decoded frames
+    selection = np.unique(np.concatenate(list(groups.values())))
+    analysis = Analysis(atoms, groups, selection)
+    first, stop = frame_range(index, window)
+    for times, positions in read_frames(traj_path, selection, batch_frames, first, stop, index.offsets):
+        analysis.add(times, positions)
+        if log is not None:
+            log.write(f"Frame {first + analysis.frames}/{stop}, t = {times[-1]:g} ps\n")
+            log.flush()
+    if not analysis.frames:
+        raise ValueError(f"No frames in {traj_path}" + (f" between {window[0]} and {window[1]} ps" if window else ""))
+
+    written = []
+    for name, columns in analysis.columns(structure).items():
+        if name in outputs:
+            write_xvg(outputs[name], name, columns)
+            written.append(name)
+    return written
+
+
+def compare(engine_path, gmx_path):
+    """(rows compared, largest absolute difference) between two outputs on shared x values"""
+    ours = load_xvg(engine_path).columns
+    theirs = load_xvg(gmx_path).columns
+    width = min(ours.shape[1], theirs.shape[1])
+    if ours.shape[0] == theirs.shape[0] and np.allclose(ours[:, 0], theirs[:, 0], atol=1e-3):
+        rows_a, rows_b = np.arange(len(ours)), np.arange(len(theirs))
+    else:
+        _, rows_a, rows_b = np.intersect1d(np.round(ours[:, 0], 3), np.round(theirs[:, 0], 3), return_indices=True)
+    if not len(rows_a):
+        return 0, float("nan")
+    return len(rows_a), float(np.abs(ours[rows_a, 1:width] - theirs[rows_b, 1:width]).max())
+
+
+def validate(structure_path, index_path, group_numbers, traj_path, gmx_outputs, window=None, batch_frames=None):
+    """Run the engine and compare with gmx outputs {step name: path}; {step name: (rows, max difference)}"""
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {name: os.path.join(tmp, os.path.basename(path)) for name, path in gmx_outputs.items()}
+        written = analyse(structure_path, index_path, group_numbers, traj_path, outputs, window, batch_frames)
+        return {name: compare(outputs[name], gmx_outputs[name]) for name in written}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("command", choices=["run", "validate"],
+                        help="run: write the outputs into the folder; validate: compare with its gmx outputs")
+    parser.add_argument("folder", help="Analysed simulation folder")
+    parser.add_argument("--reduced", action="store_true", help="Use the reduced-system trajectory")
+    parser.add_argument("--start", type=float, help="First time (ps)")
+    parser.add_argument("--end", type=float, help="Last time (ps)")
+    parser.add_argument("--batch-frames", type=int, help="Frames decoded per batch")
+    parser.add_argument("--gmx", default="gmx", help="gmx executable, to write the index if it is missing")
+    args = parser.parse_args(argv)
+
+    from pipeline import ENGINE_GROUPS, ENGINE_INDEX, AnalysisPipeline
+
+    pipeline = AnalysisPipeline(args.folder, "gmx", reduced=args.reduced, cache=False, engine=False)
+    paths = pipeline.paths()
+    window = None
+    if args.start is not None or args.end is not None:
+        window = (args.start if args.start is not None else -np.inf, args.end if args.end is not None else np.inf)
+    outputs = {name: os.path.join(args.folder, pipeline.step_named(name).output) for name in OUTPUTS}
+    try:
+        if not os.path.exists(paths["engine_ndx"]):
+            os.makedirs(os.path.dirname(paths["engine_ndx"]), exist_ok=True)
+            command = [args.gmx] + [arg.format(**dict(paths, out=paths["engine_ndx"])) for arg in ENGINE_INDEX.args]
+            subprocess.run(command, input=ENGINE_INDEX.stdin, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           check=True)
+        if args.command == "run":
+            for path in outputs.values():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            written = analyse(paths["structure"], paths["engine_ndx"], ENGINE_GROUPS, paths["traj"], outputs,
+                              window, args.batch_frames)
+            print("Written: " + ", ".join(outputs[name] for name in written))
+            return 0
+
+        existing = {name: path for name, path in outputs.items() if os.path.exists(path)}
+        if not existing:
+            print(f"No gmx outputs to compare with in {args.folder}")
+            return 1
+        for name, (rows, difference) in validate(paths["structure"], paths["engine_ndx"], ENGINE_GROUPS,
+                                                 paths["traj"], existing, window, args.batch_frames).items():
+            print(f"{name:14s} {rows:8d} rows  max |difference| {difference:.4g} nm")
+        return 0
+    except (OSError, RuntimeError, ValueError, subprocess.CalledProcessError) as e:
+        print(f"Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,391 @@
+"""Reading GROMACS .xvg files into NumPy arrays.
+
+This is the data layer shared by the plots, the thumbnail grid and any
+other view that needs parsed samples. Parsed files are cached in memory
+(the MAX_CACHED most recently used) and invalidated when the file's size or
+modification time changes.
+
+Many files (a comparison of 100+ samples on a network filesystem) are
+loaded concurrently by a bounded thread pool (setting `load_workers`):
+opening and reading, where the latency is, release the GIL, and each body
+is parsed by a single NumPy call. BackgroundLoader delivers the files as
+they arrive, so a view can draw what is already there.
+
+Parsed arrays are also kept on disk (setting `parsed_cache`) keyed by the
+file's identity (device, inode, size, mtime), so a reopened project or a
+linked copy of a file in a comparison folder is loaded with np.load
+instead of being parsed again.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+import settings
+
+
+# Analysis types shown in the DATA combo box: (label, subfolder, gmx output file)
+ANALYSIS_TYPES = [
+    ("RMSD", "RMSD", "rmsd.xvg"),
+    ("Radius of gyration (total and around axes)", "gyration", "gyration.xvg"),
+    ("Hydrogen Bonds", "hbond", "hbond.xvg"),
+    ("Solvent Accessible Surface Area (SASA)", "sasa", "sasa.xvg"),
+    ("RMSD Protein-Ligand", "rmsd_pro_lig", "rmsd_pro_lig.xvg"),
+    ("RMS fluctuation Atom (RMSF atom)", "rmsf_atom", "rmsf_atom.xvg"),
+    ("RMS fluctuation Residue (RMSF Residue)", "rmsf_rec", "rmsf_rec.xvg"),
+]
+
+XvgData = namedtuple("XvgData", ["path", "columns", "x", "y", "title", "x_label", "y_label"])
+
+DEFAULT_PARSED_CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "parsed_cache")
+# The parse cache is trimmed once the bytes written since the last trim pass this share of its budget
+PARSED_TRIM_FRACTION = 0.1
+
+_parsed_written = 0
+_parsed_lock = threading.Lock()
+
+
+class LruCache:
+    """Thread-safe in-memory cache of computed results, least recently used evicted first"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """The cached result for `key`, computed (outside the lock) on a miss"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        result = compute()
+        with self.lock:
+            self.entries[key] = result
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return result
+
+    def peek(self, key, default=None):
+        """The cached result for `key` without computing it on a miss"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        return default
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Parsed files kept in memory, keyed by fingerprint; enough for a large comparison
+MAX_CACHED = 1024
+_cache = LruCache(MAX_CACHED)
+
+
+def sample_name(path):
+    """Sample label used throughout the UI (file name up to the first dot)"""
+    return os.path.basename(path).split('.')[0]
+
+
+def subfolder_for(label):
+    """Return the data subfolder for a combo box label, or None"""
+    for type_label, subfolder, _ in ANALYSIS_TYPES:
+        if type_label == label:
+            return subfolder
+    return None
+
+
+def dataset_files(path_folder_kerja, subfolder):
+    """List the .xvg files of one analysis type inside a working folder"""
+    folder = path_folder_kerja + "/" + subfolder
+    if not os.path.isdir(folder):
+        return []
+    return [folder + "/" + data1 for data1 in os.listdir(folder) if data1.endswith(".xvg")]
+
+
+def fingerprint(path):
+    """Cheap identity of a file on disk: (absolute path, size, mtime in ns)"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def detect_labels(header_lines):
+    """Derive (title, x_label, y_label) from the header lines of an .xvg file"""
+    title = ""
+    x_label = ""
+    y_label = ""
+    for line in header_lines:
+        if "Radius of gyration (total and around axes)" in line:
+            title = "Radius of gyration (total and around axes)"
+            x_label = "Time (ps)"
+            y_label = "Radius of gyration/Rg (nm)"
+        elif "Hydrogen bonds" in line:
+            title = "Number of hydrogen bonds"
+            x_label = "Time (ps)"
+            y_label = "Hbonds"
+        elif "Solvent Accessible Surface" in line:
+            title = "Solvent Accessible Surface"
+            x_label = "Time (ps)"
+            y_label = "Area (nm²)"
+        elif "rmsf_rec.xvg" in line:
+            title = "RMS fluctuation Residue"
+            x_label = "Residue"
+            y_label = "RMSF (nm)"
+        elif "rmsf_atom.xvg" in line:
+            title = "RMS fluctuation Atom"
+            x_label = "Atom"
+            y_label = "RMSF (nm)"
+        elif "rmsd_pro_lig.xvg" in line:
+            title = "RMSD Protein-Ligand"
+            x_label = "Time (ns)"
+            y_label = "RMSD (nm)"
+        elif "rmsd.xvg" in line:
+            title = "RMSD"
+            x_label = "Time (ns)"
+            y_label = "RMSD (nm)"
+    return title, x_label, y_label
+
+
+def parse_xvg(raw, path=""):
+    """Parse the bytes of an .xvg file into an XvgData"""
+    # gmx writes all '#'/'@' lines before the data, so only the header is
+    # walked line by line; the numeric body is handed to NumPy in one call.
+    header_lines = []
+    offset = 0
+    length = len(raw)
+    while offset < length:
+        end = raw.find(b"\n", offset)
+        if end == -1:
+            end = length
+        line = raw[offset:end]
+        stripped = line.strip()
+        if stripped and not stripped.startswith((b"@", b"#")):
+            break
+        if stripped:
+            header_lines.append(line.decode("utf-8", "replace"))
+        offset = end + 1
+
+    body = raw[offset:]
+    title, x_label, y_label = detect_labels(header_lines)
+
+    if not body.strip():
+        columns = np.empty((0, 2))
+    else:
+        first_line = body.split(b"\n", 1)[0]
+        ncols = len(first_line.split())
+        if b"@" in body or b"#" in body or b"&" in body:
+            # Rare: trailing comments or multiple data sets; filter line by line
+            rows = [l.split()[:ncols] for l in body.splitlines()
+                    if not l.lstrip().startswith((b"@", b"#", b"&"))]
+            columns = np.array([r for r in rows if len(r) == ncols], dtype=float)
+        else:
+            flat = np.fromstring(body.decode("ascii", "replace"), sep=" ")
+            if flat.size % ncols:
+                flat = flat[:flat.size - flat.size % ncols]
+            columns = flat.reshape(-1, ncols)
+
+    if columns.ndim != 2 or columns.shape[1] < 2:
+        columns = np.empty((0, 2))
+
+    return XvgData(path, columns, columns[:, 0], columns[:, 1], title, x_label, y_label)
+
+
+def cached_data(path, key=None):
+    """The cached XvgData of a file if it is still current, else None"""
+    return _cache.peek(key or fingerprint(path))
+
+
+def is_loaded(path):
+    try:
+        return cached_data(path) is not None
+    except OSError:
+        return False
+
+
+def load_xvg(path):
+    """Parse an .xvg file, reusing the cached arrays while the file is unchanged"""
+    return _cache.get(fingerprint(path), lambda: read_or_parse(path))
+
+
+def read_or_parse(path):
+    """XvgData from the parse cache, or parsed from the file (and written to the parse cache)"""
+    data = read_parsed(path) if settings.get("parsed_cache") else None
+    if data is None:
+        with open(path, "rb") as f:
+            data = parse_xvg(f.read(), path)
+        if settings.get("parsed_cache"):
+            try:
+                write_parsed(path, data)
+            except OSError as e:
+                print(f"Error writing parse cache for {path}: {e}")
+    return data
+
+
+def parsed_cache_dir():
+    return settings.get("parsed_cache_dir") or DEFAULT_PARSED_CACHE_DIR
+
+
+def parsed_cache_path(path):
+    """Parse cache entry of a file; links to the same file share it"""
+    st = os.stat(path)
+    identity = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+    return os.path.join(parsed_cache_dir(), hashlib.sha1(identity.encode("utf-8")).hexdigest() + ".npz")
+
+
+def read_parsed(path):
+    """XvgData from the parse cache, or None"""
+    try:
+        cache_path = parsed_cache_path(path)
+        with np.load(cache_path) as entry:
+            columns = entry["columns"]
+            title, x_label, y_label = (str(label) for label in entry["labels"])
+        os.utime(cache_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return XvgData(path, columns, columns[:, 0], columns[:, 1], title, x_label, y_label)
+
+
+def write_parsed(path, data):
+    cache_path = parsed_cache_path(path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, columns=data.columns, labels=np.array([data.title, data.x_label, data.y_label]))
+    os.replace(tmp_path, cache_path)
+    note_parsed_written(os.path.getsize(cache_path))
+
+
+def note_parsed_written(size):
+    """Count a new parse cache entry; trim the cache when enough has been written since the last trim"""
+    global _parsed_written
+    with _parsed_lock:
+        _parsed_written += size
+        due = _parsed_written > settings.get("parsed_cache_max_gb") * 1024 ** 3 * PARSED_TRIM_FRACTION
+    if due:
+        trim_parsed_cache()
+
+
+def trim_parsed_cache():
+    """Remove least recently used entries until the parse cache fits its budget"""
+    global _parsed_written
+    with _parsed_lock:
+        _parsed_written = 0
+    max_bytes = settings.get("parsed_cache_max_gb") * 1024 ** 3
+    try:
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(parsed_cache_dir())
+                   if e.name.endswith(".npz")]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            continue
+        total -= size
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def load_concurrently(paths, max_workers=None, errors=None):
+    """Yield (path, XvgData or None) in completion order, loading in a bounded thread pool
+
+    Files that cannot be read yield None; their error is stored in `errors`
+    ({path: message}) if given. The parse cache is trimmed once, after the
+    batch, if it received new entries.
+    """
+    paths = list(paths)
+    if not paths:
+        return
+    workers = max(1, min(max_workers or settings.get("load_workers"), len(paths)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xvg-load") as pool:
+            futures = {pool.submit(load_xvg, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    yield path, future.result()
+                except (OSError, ValueError) as e:
+                    print(f"Error reading {path}: {e}")
+                    if errors is not None:
+                        errors[path] = str(e)
+                    yield path, None
+    finally:
+        if _parsed_written:
+            trim_parsed_cache()
+
+
+class BackgroundLoader:
+    """Loads files concurrently in a background thread; poll `loaded` for progress
+
+    `failed` maps the files that could not be read to their error message.
+    """
+
+    def __init__(self, paths, max_workers=None):
+        self.paths = list(paths)
+        self.loaded = []
+        self.failed = {}
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(max_workers,), name="xvg-loader", daemon=True)
+        self.thread.start()
+
+    def run(self, max_workers):
+        try:
+            for path, _ in load_concurrently(self.paths, max_workers, self.failed):
+                self.loaded.append(path)
+        finally:
+            self.finished.set()
+
+    def covers(self, paths):
+        return set(paths) <= set(self.paths)
+
+    def done(self):
+        return self.finished.is_set()
+
+
+def time_scale(data):
+    """Factor from ns to the file's own time unit, or None if x is not time"""
+    if "(ps)" in data.x_label:
+        return 1000.0
+    if "(ns)" in data.x_label:
+        return 1.0
+    return None
+
+
+def split_segments(x, y):
+    """Split a per-residue series wherever the residue number resets or decreases"""
+    breaks = np.nonzero(np.diff(x) <= 0)[0] + 1
+    return list(zip(np.split(x, breaks), np.split(y, breaks)))
+
+
+def decimate(x, y, n_bins):
+    """Reduce a series to at most 2 * n_bins + 2 points: each bin's min and max, and both ends"""
+    n = len(x)
+    if n <= 2 * n_bins:
+        return x, y
+    # Bins of n // n_bins or one more points; every point is in one bin
+    edges = np.linspace(0, n, n_bins + 1).astype(np.intp)
+    width = int(np.diff(edges).max())
+    # Shorter bins repeat their last point, which changes neither min nor max
+    idx = np.minimum(edges[:-1, None] + np.arange(width), (edges[1:] - 1)[:, None])
+    rows = np.arange(n_bins)
+    lo = idx[rows, y[idx].argmin(axis=1)]
+    hi = idx[rows, y[idx].argmax(axis=1)]
+    keep = np.unique(np.concatenate(([0], lo, hi, [n - 1])))
+    return x[keep], y[keep]
+
+
+def visible_points(x, y, low, high, n_bins):
+    """Points of a series sorted by x inside [low, high] (plus one on each side), decimated"""
+    start = max(int(np.searchsorted(x, low)) - 1, 0)
+    stop = int(np.searchsorted(x, high, side="right")) + 1
+    return decimate(x[start:stop], y[start:stop], n_bins)